@@ -4,6 +4,10 @@ from .annotations import router as annotations_router
 from .analytics import router as analytics_router
 from .export import router as export_router
 from .progress import router as progress_router
+from .changes import router as changes_router
+from .search import router as search_router
+from .dispatch import router as dispatch_router
+from .admin import router as admin_router
 
 # Create main API router
 api_router = APIRouter()
@@ -13,4 +17,8 @@ api_router.include_router(upload_router, tags=["upload"])
 api_router.include_router(annotations_router, tags=["annotations"])
 api_router.include_router(analytics_router, tags=["analytics"])
 api_router.include_router(export_router, tags=["export"])
-api_router.include_router(progress_router, tags=["progress"])
\ No newline at end of file
+api_router.include_router(progress_router, tags=["progress"])
+api_router.include_router(changes_router, tags=["changes"])
+api_router.include_router(search_router, tags=["search"])
+api_router.include_router(dispatch_router, tags=["dispatch"])
+api_router.include_router(admin_router, tags=["admin"])
\ No newline at end of file
@@ -0,0 +1,209 @@
+"""
+Admin API endpoints
+"""
+import asyncio
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from app.core import db, log
+from app.services import ArchiveNotFound, BackupInProgress, MaintenanceInProgress, TaskChanged, TaskExists, backups, maintenance
+from app.storage import storage
+from config.settings import settings
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Reject the request unless an admin token is configured and matches (no token = admin API disabled)"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if not hmac.compare_digest(x_admin_token or "", settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+@router.get("/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(100, ge=1, le=1000, description="Maximum entries to return")
+):
+    """
+    Dump the slow query ring buffer, newest first
+    """
+    if db.slow_log is None:
+        raise HTTPException(status_code=404, detail="Slow query log is disabled (SLOW_QUERY_LOG_ENABLED)")
+    
+    entries = db.slow_log.snapshot()[:limit]
+    return {
+        "success": True,
+        "data": {
+            "thresholdMs": db.slow_log.threshold_ms,
+            "count": len(entries),
+            "entries": entries
+        }
+    }
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    """
+    Clear the slow query ring buffer and captured plans
+    """
+    if db.slow_log is None:
+        raise HTTPException(status_code=404, detail="Slow query log is disabled (SLOW_QUERY_LOG_ENABLED)")
+    
+    db.slow_log.clear()
+    log.info("Slow query log cleared")
+    return {"success": True}
+
+@router.get("/tasks")
+async def list_tasks():
+    """
+    List stored tasks with annotation counts (fans out over shards in sharded mode)
+    """
+    try:
+        rows = await storage.list_tasks()
+        
+        tasks = [
+            {
+                "fileHash": row["file_hash"],
+                "annotationCount": row["annotation_count"],
+                "dimensionCount": row["dimension_count"],
+                "lastUpdated": row["last_updated"]
+            }
+            for row in rows
+        ]
+        tasks.sort(key=lambda task: task["lastUpdated"] or "", reverse=True)
+        return {
+            "success": True,
+            "data": {
+                "storageMode": settings.STORAGE_MODE,
+                "storageBackend": storage.name,
+                "tasks": tasks,
+                "totalTasks": len(tasks)
+            }
+        }
+    except Exception as e:
+        log.error(f"Failed to list tasks: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/tasks/{file_hash}")
+async def retire_task(file_hash: str):
+    """
+    Permanently delete all annotations of a file (drops its shard in sharded mode)
+    """
+    try:
+        removed = await maintenance.retire_task(file_hash)
+        
+        if not removed:
+            raise HTTPException(status_code=404, detail="Task not found")
+        
+        log.info(f"Retired task for file: {file_hash}")
+        return {"success": True, "data": {"fileHash": file_hash}}
+        
+    except MaintenanceInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Failed to retire task: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/backups")
+async def list_backups():
+    """
+    List database snapshots, newest first
+    """
+    try:
+        snapshots = await asyncio.to_thread(backups.list_snapshots)
+        return {
+            "success": True,
+            "data": {
+                "running": backups.running,
+                "lastError": backups.last_error,
+                "intervalSeconds": backups.interval,
+                "retention": backups.retention,
+                "snapshots": snapshots
+            }
+        }
+    except Exception as e:
+        log.error(f"Failed to list backups: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/backups", status_code=202)
+async def create_backup():
+    """
+    Start an online snapshot in the background; poll GET /admin/backups for the result
+    """
+    try:
+        name = backups.start_snapshot()
+        log.info(f"Snapshot {name} started")
+        return {"success": True, "data": {"name": name}}
+    except BackupInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to start backup: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/maintenance")
+async def get_maintenance():
+    """
+    Maintenance schedule and the result of the latest run
+    """
+    return {"success": True, "data": maintenance.status()}
+
+@router.post("/maintenance", status_code=202)
+async def run_maintenance():
+    """
+    Start archival and compaction now, ignoring the window; poll GET /admin/maintenance for the result
+    """
+    try:
+        maintenance.start_run(force=True)
+        log.info("Maintenance run started")
+        return {"success": True, "data": maintenance.status()}
+    except MaintenanceInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to start maintenance: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/tasks/{file_hash}/archive")
+async def archive_task(file_hash: str):
+    """
+    Archive a task to a compressed columnar file, then remove it from the live database
+    """
+    try:
+        manifest = await maintenance.archive_task(file_hash)
+        if manifest is None:
+            raise HTTPException(status_code=404, detail="Task not found")
+        return {"success": True, "data": manifest}
+    except HTTPException:
+        raise
+    except (MaintenanceInProgress, TaskChanged) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to archive task: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/archives")
+async def list_archives():
+    """
+    List task archives, newest first
+    """
+    try:
+        archives = await asyncio.to_thread(maintenance.list_archives)
+        return {"success": True, "data": {"archives": archives, "totalArchives": len(archives)}}
+    except Exception as e:
+        log.error(f"Failed to list archives: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/archives/{name}/restore")
+async def restore_archive(name: str):
+    """
+    Load an archived task back into the live database (the archive is kept)
+    """
+    try:
+        result = await maintenance.restore_archive(name)
+        return {"success": True, "data": result}
+    except ArchiveNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (MaintenanceInProgress, TaskExists) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to restore archive: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,14 +1,56 @@
 """
 Analytics API endpoints
 """
+from datetime import datetime
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from typing import Dict, List, Optional
 from app.models import AnnotationStats
-from app.core import db, log
-from app.utils import calculate_task_hash
+from app.core import log
+from app.core.database import GAP_BIN_BOUNDS, GAP_BIN_COLUMNS
+from app.storage import storage
+from app.storage.base import THROUGHPUT_GROUP_BY
+from app.utils.json_codec import FastJSONResponse
 
 router = APIRouter()
 
+
+def parse_moment(value: Optional[str], name: str) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO date or datetime")
+
+
+def histogram_median(counts: List[int]) -> Optional[float]:
+    """Median gap in seconds, interpolated inside the GAP_BIN_BOUNDS bin holding it"""
+    total = sum(counts)
+    if not total:
+        return None
+    half = total / 2
+    seen = 0
+    for index, count in enumerate(counts):
+        if count and seen + count >= half:
+            lower = GAP_BIN_BOUNDS[index - 1] if index > 0 else 0
+            if index >= len(GAP_BIN_BOUNDS):
+                return float(lower)  # Open-ended bin: report its lower bound
+            upper = GAP_BIN_BOUNDS[index]
+            return round(lower + (upper - lower) * (half - seen) / count, 1)
+        seen += count
+    return None
+
+
+def group_fields(row: dict, group_by: list) -> dict:
+    fields = {}
+    if "annotator" in group_by:
+        fields["fingerprint"] = row["browser_fingerprint"]
+        if "account_name" in row:
+            fields["accountName"] = row["account_name"]
+    if "dimension" in group_by:
+        fields["dimension"] = row["dimension"] or None
+    return fields
+
 @router.get("/analytics/dimensions")
 async def get_file_dimensions(
     file_hash: str = Query(..., description="File hash")
@@ -17,22 +59,9 @@ async def get_file_dimensions(
     Get all dimensions available for a file hash
     """
     try:
-        log.info(f"Getting dimensions for file: {file_hash}")
+        log.debug("Getting dimensions for file: {}", file_hash)
         
-        # Query all unique dimensions for this file
-        sql = """
-        SELECT DISTINCT 
-            dimension,
-            COUNT(*) as annotation_count,
-            MIN(created_at) as first_annotation,
-            MAX(created_at) as last_annotation
-        FROM annotations
-        WHERE file_hash = ?
-        GROUP BY dimension
-        ORDER BY annotation_count DESC, dimension
-        """
-        
-        rows = await db.fetchall(sql, (file_hash,))
+        rows = await storage.get_dimensions(file_hash)
         
         dimensions = []
         for row in rows:
@@ -65,44 +94,10 @@ async def get_annotation_stats(
     Get annotation statistics for a task
     """
     try:
-        log.info(f"Getting stats for file_hash: {file_hash}, dimension: {dimension}")
-        
-        # Use file_hash based query instead of task_hash for better flexibility
-        if dimension:
-            # Specific dimension
-            where_clause = "WHERE file_hash = ? AND dimension = ?"
-            params = (file_hash, dimension)
-            log.info(f"Querying for specific dimension: {dimension}")
-        else:
-            # All dimensions for this file
-            where_clause = "WHERE file_hash = ?"
-            params = (file_hash,)
-            log.info(f"Querying for all dimensions")
+        log.debug("Getting stats for file_hash: {}, dimension: {}", file_hash, dimension)
         
-        # Get total unique cases for this file/dimension
-        total_cases_sql = f"""
-        SELECT COUNT(DISTINCT case_id) as total
-        FROM annotations
-        {where_clause}
-        """
-        total_result = await db.fetchone(total_cases_sql, params)
-        total_cases = total_result['total'] if total_result else 0
-        log.info(f"Total cases found: {total_cases}")
-        
-        # Get overall statistics
-        stats_sql = f"""
-        SELECT 
-            COUNT(*) as total_annotations,
-            COUNT(DISTINCT case_id) as annotated_cases,
-            COALESCE(SUM(CASE WHEN human_action = 'agree' THEN 1 ELSE 0 END), 0) as agreed,
-            COALESCE(SUM(CASE WHEN human_action = 'disagree' THEN 1 ELSE 0 END), 0) as disagreed,
-            COALESCE(SUM(CASE WHEN human_action = 'skip' THEN 1 ELSE 0 END), 0) as skipped
-        FROM annotations
-        {where_clause}
-        """
-        
-        stats_result = await db.fetchone(stats_sql, params)
-        log.info(f"Stats result: {stats_result}")
+        stats_result = await storage.get_stats(file_hash, dimension)
+        total_cases = stats_result['total_cases']
         
         if not stats_result or stats_result['total_annotations'] == 0:
             # Return empty stats
@@ -116,26 +111,9 @@ async def get_annotation_stats(
                 byAnnotator=[]
             )
         
-        # Get by-annotator statistics
-        annotator_sql = f"""
-        SELECT 
-            browser_fingerprint,
-            account_name,
-            COUNT(*) as total,
-            COALESCE(SUM(CASE WHEN human_action = 'agree' THEN 1 ELSE 0 END), 0) as agree,
-            COALESCE(SUM(CASE WHEN human_action = 'disagree' THEN 1 ELSE 0 END), 0) as disagree,
-            COALESCE(SUM(CASE WHEN human_action = 'skip' THEN 1 ELSE 0 END), 0) as skip
-        FROM annotations
-        {where_clause}
-        GROUP BY browser_fingerprint, account_name
-        ORDER BY total DESC
-        """
-        
-        annotator_results = await db.fetchall(annotator_sql, params)
-        
         # Format annotator data
         by_annotator = []
-        for row in annotator_results:
+        for row in stats_result['by_annotator']:
             annotator_data = {
                 "fingerprint": row['browser_fingerprint'],
                 "account": row['account_name'] or "未命名标注员",
@@ -152,18 +130,97 @@ async def get_annotation_stats(
         agreed = stats_result['agreed']
         agreement_rate = round((agreed / total_annotations * 100), 2) if total_annotations > 0 else 0.0
         
-        log.info(f"Final stats: total={total_cases}, completed={total_annotations}, agreed={agreed}, disagreed={stats_result['disagreed']}, skipped={stats_result['skipped']}")
-        
-        return AnnotationStats(
-            total=total_cases or stats_result['annotated_cases'],
-            completed=total_annotations,
-            agreed=agreed,
-            disagreed=stats_result['disagreed'],
-            skipped=stats_result['skipped'],
-            agreementRate=agreement_rate,
-            byAnnotator=by_annotator
+        log.debug(
+            "Final stats: total={}, completed={}, agreed={}, disagreed={}, skipped={}",
+            total_cases, total_annotations, agreed, stats_result['disagreed'], stats_result['skipped']
         )
         
+        # Built to the AnnotationStats shape directly instead of validating it twice
+        return FastJSONResponse({
+            "total": total_cases or stats_result['annotated_cases'],
+            "completed": total_annotations,
+            "agreed": agreed,
+            "disagreed": stats_result['disagreed'],
+            "skipped": stats_result['skipped'],
+            "agreementRate": float(agreement_rate),
+            "byAnnotator": by_annotator
+        })
+        
     except Exception as e:
         log.error(f"Failed to get annotation stats: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/analytics/throughput")
+async def get_throughput(
+    file_hash: str = Query(..., description="File hash"),
+    dimension: Optional[str] = Query(None, description="Dimension name"),
+    granularity: str = Query("day", pattern="^(hour|day)$", description="Bucket size: hour or day"),
+    start: Optional[str] = Query(None, description="Range start (ISO date/datetime, inclusive)"),
+    end: Optional[str] = Query(None, description="Range end (ISO date/datetime, exclusive)"),
+    group_by: str = Query("annotator", description="Comma-separated: annotator, dimension (empty for totals)")
+):
+    """
+    Submissions over time from the pre-aggregated rollups
+
+    Every bucket overlapping [start, end) is returned, per annotator and/or
+    dimension, with totals per group in the summary. Median times between an
+    annotator's consecutive submissions are estimated from the binned gaps
+    stored with each bucket.
+    """
+    groups = [group.strip() for group in group_by.split(",") if group.strip()]
+    unknown = [group for group in groups if group not in THROUGHPUT_GROUP_BY]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by: {', '.join(unknown)}")
+    groups = [group for group in THROUGHPUT_GROUP_BY if group in groups]
+    start_at = parse_moment(start, "start")
+    end_at = parse_moment(end, "end")
+    if start_at and end_at and start_at >= end_at:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    try:
+        rows = await storage.get_throughput(file_hash, dimension, granularity, start_at, end_at, groups)
+
+        series = []
+        summary: Dict[tuple, dict] = {}
+        for row in rows:
+            fields = group_fields(row, groups)
+            counts = {
+                "submissions": row["submissions"],
+                "newAnnotations": row["new_annotations"],
+                "revisions": row["submissions"] - row["new_annotations"],
+                "agree": row["agree"],
+                "disagree": row["disagree"],
+                "skip": row["skip"],
+            }
+            gaps = [row[column] for column in GAP_BIN_COLUMNS]
+            series.append({"bucket": row["bucket"], **fields, **counts, "medianGapSeconds": histogram_median(gaps)})
+
+            key = (fields.get("fingerprint"), fields.get("dimension"))
+            totals = summary.get(key)
+            if totals is None:
+                totals = summary[key] = {**fields, **dict.fromkeys(counts, 0), "gaps": [0] * len(gaps)}
+            for name, value in counts.items():
+                totals[name] += value
+            totals["gaps"] = [total + count for total, count in zip(totals["gaps"], gaps)]
+        for totals in summary.values():
+            gaps = totals.pop("gaps")
+            totals["medianGapSeconds"] = histogram_median(gaps)
+            totals["gapSamples"] = sum(gaps)
+
+        return FastJSONResponse({
+            "success": True,
+            "data": {
+                "fileHash": file_hash,
+                "dimension": dimension,
+                "granularity": granularity,
+                "start": start,
+                "end": end,
+                "groupBy": groups,
+                "series": series,
+                "summary": sorted(summary.values(), key=lambda item: -item["submissions"])
+            }
+        })
+
+    except Exception as e:
+        log.error(f"Failed to get throughput: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
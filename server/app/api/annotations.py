@@ -1,13 +1,20 @@
 """
 Annotation submission API endpoints
 """
-import json
+import hashlib
 import uuid
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Request
-from app.models import AnnotationSubmitRequest, AnnotationRecord
-from app.core import db, log
-from app.utils import calculate_task_hash
+from functools import lru_cache
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request, Response
+from app.models import AnnotationSubmitRequest, AnnotationRecord, CompleteDataRow, MultiDimensionSubmitRequest
+from app.core import log
+from app.storage import storage
+from app.core.dispatcher import dispatcher
+from app.core.idempotency import idempotency, IdempotencyConflict
+from app.core.logger import log_payload
+from app.core.metrics import submits_total
+from app.utils import calculate_task_hash, json_codec
 
 router = APIRouter()
 
@@ -16,138 +23,224 @@ def get_browser_fingerprint(request: Request) -> str:
     # In real implementation, this would be sent from frontend
     return request.headers.get("X-Browser-Fingerprint", "unknown")
 
+def payload_fingerprint(project_id: str, body: bytes) -> str:
+    """
+    Digest of a submission, used to detect an idempotency key reused for another request
+
+    Hashes the raw body FastAPI already read, instead of dumping the parsed
+    model again; a client retry resends the same bytes.
+    """
+    digest = hashlib.sha256(project_id.encode())
+    digest.update(b"\0")
+    digest.update(body)
+    return digest.hexdigest()
+
 @router.post("/projects/{project_id}/annotations")
 async def submit_annotation(
     project_id: str,
     submission: AnnotationSubmitRequest,
-    request: Request
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
     """
     Submit annotation for a data item
+
+    Retries carrying the same Idempotency-Key get the original result back
+    without writing again.
     """
     try:
-        # Log the received data for debugging
-        log.info(f"Received submission data: {submission.dict()}")
-        
-        # Extract data from submission
-        if not submission.completeDataRow:
-            raise HTTPException(status_code=400, detail="Missing completeDataRow")
-        
-        data_row = submission.completeDataRow
-        
-        # Log the complete data row
-        log.info(f"CompleteDataRow content: {data_row}")
-        
-        # Required fields
-        file_hash = data_row.get("file_hash")
-        filename = data_row.get("filename")
-        case_id = data_row.get("case_id")
-        account_name = data_row.get("account_name")
-        original_data = data_row.get("original_data", {})
-        
-        # Check which fields are missing
-        missing_fields = []
-        if not file_hash:
-            missing_fields.append("file_hash")
-        if not filename:
-            missing_fields.append("filename")
-        if case_id is None:  # case_id could be 0, so check for None specifically
-            missing_fields.append("case_id")
-        if not account_name or not account_name.strip():
-            missing_fields.append("account_name")
+        # Log the received data for debugging (only with LOG_PAYLOADS)
+        log_payload("submit", "Received submission data: {}", submission.model_dump)
         
-        if missing_fields:
-            log.error(f"Missing fields: {missing_fields}, received data: {data_row}")
-            raise HTTPException(
-                status_code=400,
-                detail=f"Missing required fields: {', '.join(missing_fields)}"
-            )
-        
-        # Calculate task hash
-        task_hash = calculate_task_hash(file_hash, submission.dimension)
-        
-        # Get browser fingerprint
         browser_fingerprint = get_browser_fingerprint(request)
+        if not idempotency_key:
+            return await save_annotation(project_id, submission, browser_fingerprint)
         
-        # Extract LLM judgement from original data
-        llm_judgement = None
-        llm_reasoning = None
-        
-        # Try to find judgement columns
-        for key, value in original_data.items():
-            key_lower = key.lower()
-            if any(keyword in key_lower for keyword in ['judgement', '判断', 'judgment']):
-                llm_judgement = str(value) if value is not None else None
-            elif any(keyword in key_lower for keyword in ['reasoning', '理由', 'reason']):
-                llm_reasoning = str(value) if value is not None else None
-        
-        # Create annotation record
-        annotation_id = str(uuid.uuid4())
-        
-        # Prepare SQL
-        sql = """
-        INSERT INTO annotations (
-            id, task_hash, file_hash, filename, dimension, case_id,
-            browser_fingerprint, account_name, original_data,
-            llm_judgement, llm_reasoning, human_action,
-            human_judgement, human_reasoning, annotation_type,
-            evaluation_type, labels, metadata, created_at, updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(task_hash, case_id, browser_fingerprint) DO UPDATE SET
-            human_action = excluded.human_action,
-            human_judgement = excluded.human_judgement,
-            human_reasoning = excluded.human_reasoning,
-            updated_at = excluded.updated_at
-        """
-        
-        # Account name is now validated as required field above
-        # account_name is already extracted from data_row
-        
-        # Prepare values
-        values = (
-            annotation_id,
-            task_hash,
-            file_hash,
-            filename,
-            submission.dimension,
-            case_id,
-            browser_fingerprint,
-            account_name,
-            json.dumps(original_data, ensure_ascii=False),
-            llm_judgement,
-            llm_reasoning,
-            submission.action,
-            submission.humanJudgement,
-            submission.humanReasoning,
-            data_row.get("annotation_type"),
-            data_row.get("evaluation_type"),
-            json.dumps(data_row.get("labels", []), ensure_ascii=False) if data_row.get("labels") else None,
-            json.dumps(data_row.get("metadata", {}), ensure_ascii=False) if data_row.get("metadata") else None,
-            datetime.now().isoformat(),
-            datetime.now().isoformat()
+        result, replayed = await idempotency.run(
+            (browser_fingerprint, idempotency_key),
+            payload_fingerprint(project_id, await request.body()),
+            lambda: save_annotation(project_id, submission, browser_fingerprint)
         )
+        if replayed:
+            log.info(f"Replayed idempotent submission: key={idempotency_key}")
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
         
-        # Execute insert
-        await db.execute(sql, values)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error(f"Failed to submit annotation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Keywords marking original-data columns that hold the model's verdict
+LLM_JUDGEMENT_KEYWORDS = ('judgement', '判断', 'judgment')
+LLM_REASONING_KEYWORDS = ('reasoning', '理由', 'reason')
+
+@lru_cache(maxsize=4096)
+def llm_column_role(key: str) -> Optional[str]:
+    """Role of an original-data column: judgement, reasoning or None (cached, every row of a file shares them)"""
+    key_lower = key.lower()
+    if any(keyword in key_lower for keyword in LLM_JUDGEMENT_KEYWORDS):
+        return "judgement"
+    if any(keyword in key_lower for keyword in LLM_REASONING_KEYWORDS):
+        return "reasoning"
+    return None
+
+class SubmittedCase:
+    """Fields of a validated completeDataRow shared by every dimension's record"""
+    __slots__ = ("file_hash", "filename", "case_id", "account_name", "original_data", "llm_judgement",
+                 "llm_reasoning", "annotation_type", "evaluation_type", "labels", "metadata")
+
+    def __init__(self, row: CompleteDataRow):
+        self.file_hash = row.file_hash
+        self.filename = row.filename
+        self.case_id = row.case_id
+        self.account_name = row.account_name
+        self.annotation_type = row.annotation_type
+        self.evaluation_type = row.evaluation_type
+        # Serialized once, however many dimensions are submitted
+        self.original_data = json_codec.dumps(row.original_data)
+        self.labels = json_codec.dumps(row.labels) if row.labels else None
+        self.metadata = json_codec.dumps(row.metadata) if row.metadata else None
+
+        # The last matching column wins
+        self.llm_judgement = None
+        self.llm_reasoning = None
+        for key, value in row.original_data.items():
+            role = llm_column_role(key)
+            if role == "judgement":
+                self.llm_judgement = str(value) if value is not None else None
+            elif role == "reasoning":
+                self.llm_reasoning = str(value) if value is not None else None
+
+def extract_case(data_row: Optional[CompleteDataRow]) -> SubmittedCase:
+    """Derive the fields shared by every dimension of the case (the row itself is validated by its schema)"""
+    if data_row is None:
+        raise HTTPException(status_code=400, detail="Missing completeDataRow")
+    return SubmittedCase(data_row)
+
+def build_record(case: SubmittedCase, dimension: Optional[str], action: str, human_judgement: Optional[str],
+                 human_reasoning: Optional[str], browser_fingerprint: str, now: str) -> AnnotationRecord:
+    """Annotation record of one dimension's verdict on an extracted case"""
+    return AnnotationRecord(
+        str(uuid.uuid4()), calculate_task_hash(case.file_hash, dimension), case.file_hash, case.filename,
+        dimension, case.case_id, browser_fingerprint, case.account_name, case.original_data,
+        case.llm_judgement, case.llm_reasoning, action, human_judgement, human_reasoning,
+        case.annotation_type, case.evaluation_type, case.labels, case.metadata, now, now
+    )
+
+async def save_annotation(project_id: str, submission: AnnotationSubmitRequest, browser_fingerprint: str) -> dict:
+    """Validate a submission and upsert its annotation record"""
+    case = extract_case(submission.completeDataRow)
+    action = submission.action.value
+    now = datetime.now().isoformat()
+    record = build_record(
+        case, submission.dimension, action, submission.humanJudgement,
+        submission.humanReasoning, browser_fingerprint, now
+    )
+    
+    # Insert, or update the verdict of an existing annotation
+    await storage.upsert_annotation(record)
+    dispatcher.complete(record.task_hash, browser_fingerprint, record.case_id)
+    submits_total.inc(action=action)
+    
+    log.info(f"Annotation submitted: task={record.task_hash}, case={record.case_id}, action={action}")
+    
+    # Return response compatible with frontend
+    return {
+        "success": True,
+        "data": {
+            "id": record.id,
+            "projectId": project_id,
+            "status": action,
+            "humanJudgement": submission.humanJudgement,
+            "humanReasoning": submission.humanReasoning,
+            "annotatedAt": now
+        },
+        "message": "标注提交成功"
+    }
+
+@router.post("/projects/{project_id}/annotations/batch")
+async def submit_multi_dimension(
+    project_id: str,
+    submission: MultiDimensionSubmitRequest,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """
+    Submit the verdicts of several dimensions for one case
+
+    All verdicts are stored in one transaction: either every dimension is
+    saved or none is. Supports Idempotency-Key like single submissions.
+    """
+    try:
+        log_payload("submit", "Received multi-dimension submission: {}", submission.model_dump)
         
-        log.info(f"Annotation submitted: task={task_hash}, case={case_id}, action={submission.action}")
+        browser_fingerprint = get_browser_fingerprint(request)
+        if not idempotency_key:
+            return await save_annotations(project_id, submission, browser_fingerprint)
         
-        # Return response compatible with frontend
-        return {
-            "success": True,
-            "data": {
-                "id": annotation_id,
-                "projectId": project_id,
-                "status": submission.action,
-                "humanJudgement": submission.humanJudgement,
-                "humanReasoning": submission.humanReasoning,
-                "annotatedAt": datetime.now().isoformat()
-            },
-            "message": "标注提交成功"
-        }
+        result, replayed = await idempotency.run(
+            (browser_fingerprint, idempotency_key),
+            payload_fingerprint(project_id, await request.body()),
+            lambda: save_annotations(project_id, submission, browser_fingerprint)
+        )
+        if replayed:
+            log.info(f"Replayed idempotent submission: key={idempotency_key}")
+            response.headers["Idempotent-Replayed"] = "true"
+        return result
         
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except HTTPException:
         raise
     except Exception as e:
-        log.error(f"Failed to submit annotation: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        log.error(f"Failed to submit multi-dimension annotation: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def save_annotations(project_id: str, submission: MultiDimensionSubmitRequest,
+                           browser_fingerprint: str) -> dict:
+    """Validate a multi-dimension submission and upsert all its records atomically"""
+    dimensions = [verdict.dimension for verdict in submission.verdicts]
+    if len(set(dimensions)) != len(dimensions):
+        raise HTTPException(status_code=400, detail="Each dimension may appear only once")
+    
+    # The case is validated and its original data serialized once for all dimensions
+    case = extract_case(submission.completeDataRow)
+    now = datetime.now().isoformat()
+    records = [
+        build_record(case, verdict.dimension, verdict.action.value, verdict.humanJudgement,
+                     verdict.humanReasoning, browser_fingerprint, now)
+        for verdict in submission.verdicts
+    ]
+    
+    await storage.upsert_annotations(records)
+    for record in records:
+        dispatcher.complete(record.task_hash, browser_fingerprint, record.case_id)
+        submits_total.inc(action=record.human_action)
+    
+    log.info(f"Annotations submitted: file={case.file_hash}, case={case.case_id}, dimensions={len(records)}")
+    
+    return {
+        "success": True,
+        "data": {
+            "projectId": project_id,
+            "caseId": case.case_id,
+            "results": [
+                {
+                    "id": record.id,
+                    "dimension": record.dimension,
+                    "status": record.human_action,
+                    "humanJudgement": record.human_judgement,
+                    "humanReasoning": record.human_reasoning,
+                    "annotatedAt": now
+                }
+                for record in records
+            ]
+        },
+        "message": "标注提交成功"
+    }
@@ -0,0 +1,77 @@
+"""
+Change feed API endpoints
+"""
+import asyncio
+import time
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.core import log
+from app.storage import storage
+from app.utils import json_codec
+
+router = APIRouter()
+
+PAGE_SIZE = 1000
+POLL_INTERVAL = 0.5  # Seconds between polls while waiting for new changes
+
+
+def format_change(row: dict) -> dict:
+    return {
+        "seq": row["seq"],
+        "op": row["op"],
+        "annotationId": row["annotation_id"],
+        "taskHash": row["task_hash"],
+        "fileHash": row["file_hash"],
+        "dimension": row["dimension"],
+        "caseId": row["case_id"],
+        "browserFingerprint": row["browser_fingerprint"],
+        "accountName": row["account_name"],
+        "humanAction": row["human_action"],
+        "humanJudgement": row["human_judgement"],
+        "humanReasoning": row["human_reasoning"],
+        "taskSeq": row["task_seq"],
+        "changedAt": row["changed_at"],
+    }
+
+
+@router.get("/changes")
+async def tail_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Return changes after this sequence number"),
+    file_hash: Optional[str] = Query(None, description="Only changes of this file (required in sharded mode)"),
+    limit: int = Query(10000, ge=1, le=100000, description="Maximum changes to return"),
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for new changes once caught up")
+):
+    """
+    Stream the annotation change log as NDJSON, one change per line in sequence order
+
+    Resume from the ``seq`` of the last line received.
+    """
+    try:
+        first_page = await storage.read_change_log(file_hash, since, min(limit, PAGE_SIZE))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to read change log: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def stream():
+        page = first_page
+        cursor = since
+        sent = 0
+        deadline = time.monotonic() + wait
+        while True:
+            if page:
+                yield b"".join(json_codec.dumps_bytes(format_change(row)) + b"\n" for row in page)
+                sent += len(page)
+                cursor = page[-1]["seq"]
+                if sent >= limit:
+                    return
+            elif time.monotonic() >= deadline or await request.is_disconnected():
+                return
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+            page = await storage.read_change_log(file_hash, cursor, min(PAGE_SIZE, limit - sent))
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,59 @@
+"""
+Case dispatch API endpoints
+"""
+from fastapi import APIRouter, HTTPException, Request
+from app.models import DispatchRequest, DispatchReleaseRequest
+from app.core import log
+from app.core.dispatcher import DispatchUnavailable, dispatcher
+from app.storage import storage
+from app.utils import calculate_task_hash
+from .annotations import get_browser_fingerprint
+
+router = APIRouter()
+
+@router.post("/dispatch/next")
+async def next_case(dispatch: DispatchRequest, request: Request):
+    """
+    Reserve the next case for this annotator
+
+    Returns the same case until it is submitted, released or its lease expires;
+    caseId is null once every case has its labels.
+    """
+    try:
+        browser_fingerprint = get_browser_fingerprint(request)
+        task_hash = calculate_task_hash(dispatch.fileHash, dispatch.dimension)
+        lease, remaining = await dispatcher.next_case(
+            task_hash,
+            browser_fingerprint,
+            dispatch.totalCases,
+            dispatch.redundancy,
+            lambda: storage.get_case_annotators(dispatch.fileHash, task_hash)
+        )
+        return {
+            "success": True,
+            "data": {
+                "caseId": lease.case_id if lease else None,
+                "leaseId": lease.lease_id if lease else None,
+                "leaseSeconds": dispatcher.lease_seconds if lease else None,
+                "remaining": remaining
+            }
+        }
+    except DispatchUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to dispatch next case: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/dispatch/release")
+async def release_case(release: DispatchReleaseRequest, request: Request):
+    """
+    Give a reserved case back without annotating it
+    """
+    task_hash = calculate_task_hash(release.fileHash, release.dimension)
+    try:
+        released = dispatcher.release(task_hash, get_browser_fingerprint(request), release.caseId)
+    except DispatchUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if not released:
+        raise HTTPException(status_code=404, detail="No active lease for this case")
+    return {"success": True, "data": {"caseId": release.caseId}}
@@ -2,200 +2,167 @@
 Export API endpoints
 """
 
-import csv
-import io
-import json
 import re
 from urllib.parse import quote
-from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from typing import Optional
-from app.core import db, log
-from app.utils import calculate_task_hash
-from fastapi.responses import StreamingResponse
-from io import BytesIO
+from app.core import log
+from app.services import export_jobs, ExportNotFound, render_changes
+from app.utils.file_response import range_file_response
+from config.settings import settings
 
 router = APIRouter()
 
 
-def safe_str(value):
-    """Convert value to safe string for CSV export"""
-    if value is None:
-        return ""
-    if isinstance(value, (dict, list)):
-        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
-    # Convert to string and replace problematic characters
-    text = str(value)
-    # Replace common problematic characters that might cause encoding issues
-    text = text.replace("\x00", "")  # Remove null bytes
-    text = text.replace("\r\n", "\n")  # Normalize line endings
-    text = text.replace("\r", "\n")
-    return text
+def content_disposition(file_hash: str, dimension: Optional[str]) -> str:
+    """Build an attachment header with an ASCII fallback and a UTF-8 filename"""
+    # Create completely safe ASCII-only filename for the basic 'filename' part
+    # and a UTF-8 encoded filename for 'filename*' part
+    base_name = f"annotations_{file_hash[:8]}"
+
+    # Ensure dimension is safely represented for filename
+    # Use a more robust approach to remove or replace invalid characters
+    # For the base filename, it's safer to stick to ASCII
+    if dimension:
+        # Transliterate or replace non-ASCII characters for basic filename part
+        # This is a simplification; a full solution might involve unicodedata.normalize
+        safe_dimension_ascii = re.sub(r"[^\w\-_\.]", "_", dimension)
+        # Limit length to avoid very long filenames
+        safe_dimension_ascii = safe_dimension_ascii[:20]
+        filename_for_header = f"{base_name}_{safe_dimension_ascii}.csv"
+    else:
+        filename_for_header = f"{base_name}.csv"
+
+    # For the UTF-8 filename part, use the original (potentially non-ASCII) dimension
+    # and ensure the full filename is URL-encoded
+    full_filename_utf8 = f"{base_name}"
+    if dimension:
+        full_filename_utf8 += f"_{dimension}"
+    full_filename_utf8 += ".csv"
+
+    # Quote the full UTF-8 filename for filename*
+    # RFC 5987: filename* = <charset>'<language>'<encoded_text>
+    # Here, charset is UTF-8, language is empty, encoded_text is URL-encoded filename
+    utf8_filename_encoded = quote(full_filename_utf8)
+
+    return f'attachment; filename="ascii_filename"; ' f"filename*=utf-8''{utf8_filename_encoded}"
+
+
+WATERMARK_HEADER = "X-Export-Watermark"
+EXPORT_ATTEMPTS = 3  # Renders per request when artifacts vanish before they are served
+
+
+def serve_artifact(request: Request, job):
+    """Serve a finished export artifact as a static file (with Range support)"""
+    headers = {
+        "Content-Disposition": content_disposition(job.file_hash, job.dimension),
+        WATERMARK_HEADER: str(job.watermark),
+    }
+    return range_file_response(request, str(job.path), "text/csv; charset=utf-8", headers=headers)
+
+
+def job_response(job) -> dict:
+    data = job.to_dict()
+    if job.status == "completed":
+        data["downloadUrl"] = f"{settings.API_PREFIX}/export/jobs/{job.id}/download"
+    return data
 
 
 @router.get("/export")
 async def export_annotations(
+    request: Request,
     file_hash: str = Query(..., description="File hash"),
     dimension: Optional[str] = Query(None, description="Dimension name"),
     format: str = Query("csv", description="Export format", pattern="^(csv|excel)$"),
+    since: Optional[int] = Query(None, ge=0, description="Only rows changed after this watermark"),
 ):
     """
     Export annotation data in CSV or Excel format
+
+    Unchanged tasks are served from the cached artifact of a previous export.
+    With ``since``, only rows inserted or updated after that watermark are
+    returned; the ``X-Export-Watermark`` response header carries the watermark
+    to pass on the next call.
     """
     if format != "csv":  # Only CSV is implemented in this example
         raise HTTPException(status_code=400, detail="Only CSV format is supported for now.")
 
     try:
-        task_hash = calculate_task_hash(file_hash, dimension)
-        log.info(f"Exporting annotations for task: {task_hash}, format: {format}")
-
-        # Query all annotations for this task
-        sql = """
-        SELECT 
-            id,
-            task_hash,
-            file_hash,
-            filename,
-            dimension,
-            case_id,
-            browser_fingerprint,
-            account_name,
-            original_data,
-            llm_judgement,
-            llm_reasoning,
-            human_action,
-            human_judgement,
-            human_reasoning,
-            annotation_type,
-            evaluation_type,
-            labels,
-            created_at,
-            updated_at
-        FROM annotations
-        WHERE task_hash = ?
-        ORDER BY case_id, created_at
-        """
-
-        rows = await db.fetchall(sql, (task_hash,))
-
-        if not rows:
-            raise HTTPException(status_code=404, detail="No annotations found for this task")
-
-        # Prepare CSV data with UTF-8 encoding
-        output = io.StringIO()
-
-        # Define CSV headers
-        fieldnames = [
-            "case_id",
-            "browser_fingerprint",
-            "account_name",
-            "human_action",
-            "human_judgement",
-            "human_reasoning",
-            "llm_judgement",
-            "llm_reasoning",
-            "annotation_type",
-            "evaluation_type",
-            "dimension",
-            "created_at",
-            "updated_at",
-        ]
-
-        # Get all unique keys from original_data
-        all_original_keys = set()
-        for row in rows:
-            try:
-                original_data = json.loads(row["original_data"])
-                all_original_keys.update(original_data.keys())
-            except json.JSONDecodeError:
-                log.warning(
-                    f"Could not parse original_data for row id: {row['id']}. Skipping original data keys for this row."
-                )
-                continue  # Continue to the next row if JSON parsing fails
-
-        # Add original data keys to fieldnames, ensure they are sorted for consistent column order
-        fieldnames.extend(sorted(all_original_keys))
-
-        # Use UTF-8 compatible CSV writer
-        # csv.writer automatically handles UTF-8 when using io.StringIO
-        writer = csv.DictWriter(output, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-        writer.writeheader()
-
-        # Write data rows
-        for row in rows:
-            # Parse JSON fields, handling potential errors
-            original_data = {}
-            try:
-                original_data = json.loads(row["original_data"])
-            except json.JSONDecodeError:
-                log.warning(f"Could not parse original_data for row id: {row['id']}. Using empty dict.")
-
-            # Create row dict with safe string handling for all fields
-            row_dict = {
-                "case_id": safe_str(row["case_id"]),
-                "browser_fingerprint": safe_str(row["browser_fingerprint"]),
-                "account_name": safe_str(row["account_name"]),
-                "human_action": safe_str(row["human_action"]),
-                "human_judgement": safe_str(row["human_judgement"]),
-                "human_reasoning": safe_str(row["human_reasoning"]),
-                "llm_judgement": safe_str(row["llm_judgement"]),
-                "llm_reasoning": safe_str(row["llm_reasoning"]),
-                "annotation_type": safe_str(row["annotation_type"]),
-                "evaluation_type": safe_str(row["evaluation_type"]),
-                "dimension": safe_str(row["dimension"]),
-                "created_at": safe_str(row["created_at"]),
-                "updated_at": safe_str(row["updated_at"]),
+        if since is not None:
+            log.info(f"Exporting changes for file: {file_hash}, dimension: {dimension}, since: {since}")
+            payload, watermark = await render_changes(file_hash, dimension, since)
+            headers = {
+                "Content-Disposition": content_disposition(file_hash, dimension),
+                WATERMARK_HEADER: str(watermark),
             }
+            return Response(payload, media_type="text/csv; charset=utf-8", headers=headers)
 
-            # Add original data fields with safe encoding
-            for key in all_original_keys:
-                value = original_data.get(key, "")
-                row_dict[key] = safe_str(value)
-
-            writer.writerow(row_dict)
-
-        # Get CSV content
-        csv_content = output.getvalue()
-        output.close()
-
-        # Create completely safe ASCII-only filename for the basic 'filename' part
-        # and a UTF-8 encoded filename for 'filename*' part
-        base_name = f"annotations_{file_hash[:8]}"
-
-        # Ensure dimension is safely represented for filename
-        # Use a more robust approach to remove or replace invalid characters
-        # For the base filename, it's safer to stick to ASCII
-        if dimension:
-            # Transliterate or replace non-ASCII characters for basic filename part
-            # This is a simplification; a full solution might involve unicodedata.normalize
-            safe_dimension_ascii = re.sub(r"[^\w\-_\.]", "_", dimension)
-            # Limit length to avoid very long filenames
-            safe_dimension_ascii = safe_dimension_ascii[:20]
-            filename_for_header = f"{base_name}_{safe_dimension_ascii}.csv"
-        else:
-            filename_for_header = f"{base_name}.csv"
-
-        # For the UTF-8 filename part, use the original (potentially non-ASCII) dimension
-        # and ensure the full filename is URL-encoded
-        full_filename_utf8 = f"{base_name}"
-        if dimension:
-            full_filename_utf8 += f"_{dimension}"
-        full_filename_utf8 += ".csv"
-
-        # Quote the full UTF-8 filename for filename*
-        # RFC 5987: filename* = <charset>'<language>'<encoded_text>
-        # Here, charset is UTF-8, language is empty, encoded_text is URL-encoded filename
-        utf8_filename_encoded = quote(full_filename_utf8)
-
-        buffer = BytesIO(csv_content.encode("utf-8-sig"))
-        headers = {
-            "Content-Disposition": (
-                f'attachment; filename="ascii_filename"; ' f"filename*=utf-8''{utf8_filename_encoded}"
-            )
-        }
-        return StreamingResponse(buffer, media_type="text/csv; charset=utf-8", headers=headers)
+        log.info(f"Exporting annotations for file: {file_hash}, dimension: {dimension}, format: {format}")
 
+        for _ in range(EXPORT_ATTEMPTS):
+            job = await export_jobs.wait(await export_jobs.submit(file_hash, dimension, format))
+            if job.status != "completed":
+                raise HTTPException(status_code=500, detail=f"Export failed: {job.error}")
+            try:
+                return serve_artifact(request, job)
+            except FileNotFoundError:
+                # Superseded by a newer version or evicted after rendering: a cache miss, so export again
+                log.info(f"Export artifact of job {job.id} is gone, exporting again")
+        raise HTTPException(status_code=503, detail="Task data kept changing during export, please retry")
+
+    except ExportNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except HTTPException:
         raise  # Re-raise FastAPI HTTPExceptions directly
     except Exception as e:
         log.error(f"Failed to export annotations: {e}", exc_info=True)  # Log full traceback
         raise HTTPException(status_code=500, detail=f"Internal server error: {e}")
+
+
+@router.post("/export/jobs", status_code=202)
+async def create_export_job(
+    file_hash: str = Query(..., description="File hash"),
+    dimension: Optional[str] = Query(None, description="Dimension name"),
+    format: str = Query("csv", description="Export format", pattern="^(csv|excel)$"),
+):
+    """
+    Start an export in the background and return its job
+    """
+    if format != "csv":
+        raise HTTPException(status_code=400, detail="Only CSV format is supported for now.")
+
+    try:
+        job = await export_jobs.submit(file_hash, dimension, format)
+        return {"success": True, "data": job_response(job)}
+    except ExportNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        log.error(f"Failed to create export job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/export/jobs/{job_id}")
+async def get_export_job(job_id: str):
+    """
+    Get the status of an export job
+    """
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return {"success": True, "data": job_response(job)}
+
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export_job(job_id: str, request: Request):
+    """
+    Download the artifact of a finished export job
+    """
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    try:
+        return serve_artifact(request, job)
+    except FileNotFoundError:
+        raise HTTPException(status_code=410, detail="Export artifact was evicted, please export again")
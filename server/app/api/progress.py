@@ -4,8 +4,10 @@ Progress tracking API endpoints
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
 from app.models import ProgressResponse
-from app.core import db, log
+from app.core import log
+from app.storage import storage
 from app.utils import calculate_task_hash
+from app.utils.json_codec import FastJSONResponse
 
 router = APIRouter()
 
@@ -20,51 +22,15 @@ async def get_annotation_progress(
     """
     try:
         task_hash = calculate_task_hash(file_hash, dimension)
-        log.info(f"Getting progress for task: {task_hash}, fingerprint: {fingerprint}")
+        log.debug("Getting progress for task: {}, fingerprint: {}", task_hash, fingerprint)
         
-        # Build SQL query
-        if fingerprint:
-            # Get progress for specific annotator
-            sql = """
-            SELECT 
-                COUNT(DISTINCT case_id) as annotated_rows,
-                GROUP_CONCAT(DISTINCT case_id) as case_ids
-            FROM annotations
-            WHERE task_hash = ? AND browser_fingerprint = ?
-            """
-            params = (task_hash, fingerprint)
-        else:
-            # Get overall progress
-            sql = """
-            SELECT 
-                COUNT(DISTINCT case_id) as annotated_rows,
-                GROUP_CONCAT(DISTINCT case_id) as case_ids
-            FROM annotations
-            WHERE task_hash = ?
-            """
-            params = (task_hash,)
-        
-        result = await db.fetchone(sql, params)
-        
-        annotated_rows = result['annotated_rows'] if result else 0
-        case_ids_str = result['case_ids'] if result and result['case_ids'] else ""
-        
-        # Parse case IDs
-        annotated_case_ids = []
-        if case_ids_str:
-            annotated_case_ids = sorted([int(id) for id in case_ids_str.split(',')])
-        
-        # Get total rows (we need to get max case_id + 1 as an estimate)
-        max_case_sql = """
-        SELECT MAX(case_id) as max_case_id
-        FROM annotations
-        WHERE task_hash = ?
-        """
-        max_result = await db.fetchone(max_case_sql, (task_hash,))
+        result = await storage.get_progress(file_hash, task_hash, fingerprint)
+        annotated_rows = result['annotated_rows']
+        annotated_case_ids = result['case_ids']
         
         # Estimate total rows (actual total should come from original file)
         # Here we use max case_id + 1 as estimate
-        total_rows = (max_result['max_case_id'] + 1) if max_result and max_result['max_case_id'] is not None else 0
+        total_rows = (result['max_case_id'] + 1) if result['max_case_id'] is not None else 0
         
         # If no annotations yet, we can't determine total rows
         if total_rows == 0:
@@ -72,12 +38,14 @@ async def get_annotation_progress(
         
         progress = (annotated_rows / total_rows * 100) if total_rows > 0 else 0.0
         
-        return ProgressResponse(
-            totalRows=total_rows,
-            annotatedRows=annotated_rows,
-            annotatedCaseIds=annotated_case_ids,
-            progress=round(progress, 2)
-        )
+        # Already matches ProgressResponse; returning a response skips re-validating
+        # a case ID list that can run to 100k entries
+        return FastJSONResponse({
+            "totalRows": total_rows,
+            "annotatedRows": annotated_rows,
+            "annotatedCaseIds": annotated_case_ids,
+            "progress": round(progress, 2)
+        })
         
     except Exception as e:
         log.error(f"Failed to get annotation progress: {e}")
@@ -0,0 +1,62 @@
+"""
+Full-text search API endpoints
+"""
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from app.core import log
+from app.storage import storage
+
+router = APIRouter()
+
+MAX_TERMS = 16
+
+
+def format_hit(row: dict) -> dict:
+    return {
+        "id": row["id"],
+        "taskHash": row["task_hash"],
+        "dimension": row["dimension"],
+        "caseId": row["case_id"],
+        "accountName": row["account_name"],
+        "humanAction": row["human_action"],
+        "humanJudgement": row["human_judgement"],
+        "updatedAt": row["updated_at"],
+        "snippet": row["snippet"],
+    }
+
+
+@router.get("/search")
+async def search_annotations(
+    file_hash: str = Query(..., description="File hash"),
+    q: str = Query(..., min_length=1, max_length=500, description="Whitespace-separated terms, all must match"),
+    dimension: Optional[str] = Query(None, description="Dimension name"),
+    limit: int = Query(20, ge=1, le=200, description="Hits per page"),
+    offset: int = Query(0, ge=0, le=10000, description="Hits to skip")
+):
+    """
+    Search the question/answer/dialog text, reasoning and judgements of a file's annotations
+
+    Hits are ranked by relevance and carry a snippet with matches in [brackets].
+    """
+    terms = q.split()
+    if not terms:
+        raise HTTPException(status_code=400, detail="Empty search query")
+    if len(terms) > MAX_TERMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_TERMS} search terms are allowed")
+
+    try:
+        # One extra row tells whether another page exists
+        rows = await storage.search_annotations(file_hash, dimension, terms, limit + 1, offset)
+        return {
+            "success": True,
+            "data": {
+                "fileHash": file_hash,
+                "query": q,
+                "hits": [format_hit(row) for row in rows[:limit]],
+                "offset": offset,
+                "hasMore": len(rows) > limit
+            }
+        }
+    except Exception as e:
+        log.error(f"Failed to search annotations: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
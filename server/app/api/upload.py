@@ -1,40 +1,140 @@
 """
 File upload API endpoints
 """
+import asyncio
 import os
 import tempfile
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.models import FileUploadResponse
-from app.utils import calculate_file_hash, parse_uploaded_file
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from app.models import AnnotationTypeEnum, FileUploadResponse, SheetInfo
+from app.utils import (
+    calculate_file_hash, detect_annotation_type, detect_evaluation_type, infer_column_roles, parse_workbook,
+    preview_csv, preview_xlsx, suggest_dimensions, validate_file_columns
+)
 from app.core.logger import log
+from app.core.metrics import upload_bytes_total, uploads_total
 from config.settings import settings
 
 router = APIRouter()
 
+# Task type of a workbook whose valid sheets are all of one type, one dimension per sheet
+MULTI_DIMENSION_TYPES = {
+    AnnotationTypeEnum.single_turn: AnnotationTypeEnum.multi_dimension_single,
+    AnnotationTypeEnum.multi_turn: AnnotationTypeEnum.multi_dimension_multi,
+}
+
+def sheet_info(name: str, data: list, columns: list) -> SheetInfo:
+    annotation_type = detect_annotation_type(columns)
+    if data:
+        is_valid, errors = validate_file_columns([str(column) for column in columns], annotation_type.value)
+    else:
+        is_valid, errors = False, ["Sheet is empty"]
+    return SheetInfo(
+        name=name,
+        annotationType=annotation_type,
+        totalRows=len(data),
+        columns=[str(column) for column in columns],
+        isValid=is_valid,
+        errors=errors or None
+    )
+
+def workbook_type(valid_sheet_types: List[AnnotationTypeEnum]) -> Optional[AnnotationTypeEnum]:
+    """Task type from the types of the valid sheets (None when they disagree)"""
+    types = set(valid_sheet_types)
+    if len(types) != 1:
+        return None
+    sheet_type = types.pop()
+    return MULTI_DIMENSION_TYPES[sheet_type] if len(valid_sheet_types) > 1 else sheet_type
+
+def check_upload(file: UploadFile):
+    """Reject disallowed extensions and oversized files; returns (extension, size)"""
+    file_ext = os.path.splitext(file.filename)[1].lower()
+    if file_ext not in settings.ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type not allowed. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+        )
+    
+    # Check file size
+    file.file.seek(0, 2)  # Seek to end
+    file_size = file.file.tell()
+    file.file.seek(0)  # Reset to beginning
+    
+    if file_size > settings.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
+        )
+    return file_ext, file_size
+
+def sheet_preview(name: str, columns: List[str], sample: list) -> dict:
+    annotation_type = detect_annotation_type(columns)
+    if columns:
+        is_valid, errors = validate_file_columns(columns, annotation_type.value)
+    else:
+        is_valid, errors = False, ["Sheet is empty"]
+    roles = infer_column_roles(columns)
+    return {
+        "name": name,
+        "columns": columns,
+        "annotationType": annotation_type.value,
+        "evaluationType": detect_evaluation_type(columns).value,
+        "isValid": is_valid,
+        "errors": errors or None,
+        "roles": roles,
+        "dimensions": suggest_dimensions(roles, name),
+        "sampleRows": sample
+    }
+
+@router.post("/upload/preview")
+async def preview_file(
+    file: UploadFile = File(...),
+    rows: int = Query(5, ge=1, le=50, description="Sample rows per sheet")
+):
+    """
+    Schema, inferred column roles and sample rows of a file, without parsing it fully
+    
+    Only the header and the first rows of each sheet are read, so the time
+    doesn't grow with the file. The full parse happens in /upload.
+    """
+    try:
+        file_ext, file_size = check_upload(file)
+        if file_ext == ".csv":
+            columns, sample = await asyncio.to_thread(preview_csv, file.file, rows)
+            sheets = [(os.path.splitext(file.filename)[0], columns, sample)]
+        else:
+            sheets = await asyncio.to_thread(preview_xlsx, file.file, rows)
+        previews = [sheet_preview(name, columns, sample) for name, columns, sample in sheets]
+        
+        return {
+            "success": True,
+            "data": {
+                "filename": file.filename,
+                "fileSize": file_size,
+                "annotationType": workbook_type(
+                    [AnnotationTypeEnum(sheet["annotationType"]) for sheet in previews if sheet["isValid"]]
+                ),
+                "dimensions": [sheet["name"] for sheet in previews if sheet["isValid"]] if len(previews) > 1 else [],
+                "sheets": previews
+            }
+        }
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        log.error(f"File preview failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     """
     Validate uploaded file and return file information
     """
     try:
-        # Validate file extension
-        file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in settings.ALLOWED_EXTENSIONS:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File type not allowed. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
-            )
-        
-        # Check file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
-        if file_size > settings.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Maximum size: {settings.MAX_FILE_SIZE / 1024 / 1024}MB"
-            )
+        file_ext, file_size = check_upload(file)
+        upload_bytes_total.inc(file_size)
         
         # Calculate file hash
         file_hash = calculate_file_hash(file.file)
@@ -49,18 +149,27 @@ async def upload_file(file: UploadFile = File(...)):
             tmp_file_path = tmp_file.name
         
         try:
-            # Parse file
-            data, columns = parse_uploaded_file(tmp_file_path, file.filename)
+            # Parse every sheet; each valid sheet becomes a dimension of the file
+            parsed = await parse_workbook(tmp_file_path, file.filename)
+            sheets = [sheet_info(name, data, columns) for name, data, columns in parsed]
+            errors = [f"{sheet.name}: {error}" for sheet in sheets for error in sheet.errors or []]
             
+            # Top-level rows and columns describe the first sheet, as before
             response = FileUploadResponse(
                 fileId=file_hash,
                 filename=file.filename,
-                totalRows=len(data),
-                columns=columns,
-                isValid=True
+                totalRows=sheets[0].totalRows if sheets else 0,
+                columns=sheets[0].columns if sheets else [],
+                isValid=any(sheet.isValid for sheet in sheets),
+                errors=errors or None,
+                annotationType=workbook_type([sheet.annotationType for sheet in sheets if sheet.isValid]),
+                sheets=sheets,
+                dimensions=[sheet.name for sheet in sheets if sheet.isValid] if len(sheets) > 1 else []
             )
             
-            log.info(f"File upload successful: {file.filename}, rows: {len(data)}")
+            log.info(f"File upload successful: {file.filename}, sheets: {len(sheets)}, "
+                     f"rows: {sum(sheet.totalRows for sheet in sheets)}")
+            uploads_total.inc(status="success")
             
             # Return response wrapped in success structure to match frontend expectations
             return {
@@ -73,7 +182,9 @@ async def upload_file(file: UploadFile = File(...)):
             os.unlink(tmp_file_path)
             
     except HTTPException:
+        uploads_total.inc(status="rejected")
         raise
     except Exception as e:
+        uploads_total.inc(status="error")
         log.error(f"File upload failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,4 +1,5 @@
 from .logger import log
 from .database import db
+from .metrics import metrics
 
-__all__ = ["log", "db"]
\ No newline at end of file
+__all__ = ["log", "db", "metrics"]
\ No newline at end of file
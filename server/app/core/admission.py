@@ -0,0 +1,227 @@
+"""
+Admission control and per-annotator rate limiting
+
+Requests are classified by path into submit, read, export and upload classes,
+each with its own concurrency budget, so a burst of exports or large uploads
+can't starve the submit path. When a budget is exhausted requests wait in a
+bounded FIFO queue; once the queue is full, or the wait exceeds the timeout,
+they are answered with 429 and a ``Retry-After`` estimate.
+
+Requests carrying an ``X-Browser-Fingerprint`` additionally draw from a token
+bucket per fingerprint, with per-class costs (an export costs more than a
+progress poll).
+"""
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from app.core.metrics import metrics
+
+admission_in_flight = metrics.gauge(
+    "admission_in_flight", "Requests currently admitted per class", ("request_class",)
+)
+admission_queue_depth = metrics.gauge(
+    "admission_queue_depth", "Requests waiting for a concurrency slot per class", ("request_class",)
+)
+admission_wait = metrics.histogram(
+    "admission_wait_seconds", "Time spent queued before admission", ("request_class",)
+)
+admission_rejections = metrics.counter(
+    "admission_rejections_total", "Requests rejected with 429", ("request_class", "reason")
+)
+
+REQUEST_CLASSES = ("submit", "read", "export", "upload")
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ConcurrencyBudget:
+    """Concurrency limit with a bounded FIFO wait queue"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._avg_duration = 1.0  # EWMA of service time, used for Retry-After
+
+    def retry_after(self) -> float:
+        backlog = (len(self._waiters) + 1) / self.limit
+        return max(1.0, self._avg_duration * backlog)
+
+    def _update_gauges(self):
+        admission_in_flight.set(self.in_flight, request_class=self.name)
+        admission_queue_depth.set(len(self._waiters), request_class=self.name)
+
+    async def acquire(self):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self._update_gauges()
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise AdmissionRejected("queue_full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self._update_gauges()
+        start = time.perf_counter()
+        try:
+            # A released slot is handed over by resolving the future
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise AdmissionRejected("queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(0.0)
+            raise
+        finally:
+            try:
+                self._waiters.remove(future)
+            except ValueError:
+                pass
+            self._update_gauges()
+        admission_wait.observe(time.perf_counter() - start, request_class=self.name)
+
+    def release(self, duration: float):
+        if duration:
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)  # Slot passes straight to the next waiter
+                self._update_gauges()
+                return
+        self.in_flight -= 1
+        self._update_gauges()
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class RateLimiter:
+    """Token bucket per client key, kept in a bounded LRU"""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def take(self, key: str, cost: float) -> float:
+        """Consume tokens; returns 0 when allowed, else seconds until enough tokens accrue"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.burst, now)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+
+        cost = min(cost, self.burst)
+        if bucket.tokens >= cost:
+            bucket.tokens -= cost
+            return 0.0
+        return (cost - bucket.tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(self, api_prefix: str, limits: Dict[str, int], queue_sizes: Dict[str, int],
+                 queue_timeout: float, rate: float, burst: float, costs: Dict[str, float]):
+        self.api_prefix = api_prefix.rstrip("/")
+        self.budgets = {
+            name: ConcurrencyBudget(name, limits.get(name, 16), queue_sizes.get(name, 64), queue_timeout)
+            for name in REQUEST_CLASSES
+        }
+        self.rate_limiter = RateLimiter(rate, burst) if rate > 0 else None
+        self.costs = costs
+
+    def classify(self, method: str, path: str) -> Optional[str]:
+        """Map a request to its admission class (None = not controlled)"""
+        if not path.startswith(self.api_prefix + "/"):
+            return None
+        route = path[len(self.api_prefix):]
+        if route.startswith(("/admin", "/docs", "/redoc", "/openapi.json")):
+            return None
+        if route.startswith("/export"):
+            return "export"
+        if method == "POST" and route.startswith("/upload"):
+            return "upload"
+        if method == "POST" and route.startswith("/projects/") and "/annotations" in route:
+            return "submit"
+        return "read"
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying class budgets and per-fingerprint rate limits"""
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def _reject(self, send, request_class: str, error: AdmissionRejected):
+        admission_rejections.inc(request_class=request_class, reason=error.reason)
+        body = b'{"detail":"Server is busy, please retry later"}'
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(math.ceil(error.retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_class = self.controller.classify(scope["method"], scope["path"])
+        if request_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.rate_limiter
+        if limiter is not None:
+            fingerprint = None
+            for name, value in scope["headers"]:
+                if name == b"x-browser-fingerprint":
+                    fingerprint = value.decode("latin-1")
+                    break
+            # Anonymous requests share no bucket; only class budgets apply to them
+            if fingerprint and fingerprint != "unknown":
+                wait = limiter.take(fingerprint, self.controller.costs.get(request_class, 1.0))
+                if wait > 0:
+                    await self._reject(send, request_class, AdmissionRejected("rate_limited", wait))
+                    return
+
+        budget = self.controller.budgets[request_class]
+        try:
+            await budget.acquire()
+        except AdmissionRejected as e:
+            await self._reject(send, request_class, e)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release(time.perf_counter() - start)
@@ -0,0 +1,35 @@
+"""
+Gzip compression for JSON API responses
+
+Starlette's GZipMiddleware compresses every response, including CSV exports
+that answer Range requests and the NDJSON change feed, where buffering inside
+the gzip stream would delay tailing clients. This variant only compresses
+``application/json`` bodies and passes everything else through untouched.
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class _JSONGZipResponder(GZipResponder):
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if not content_type.startswith("application/json"):
+                # The responder forwards bodies unchanged once an encoding is "already set"
+                self.content_encoding_set = True
+
+
+class JSONGZipMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and "gzip" in Headers(scope=scope).get("accept-encoding", ""):
+            responder = _JSONGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
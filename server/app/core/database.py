@@ -1,30 +1,220 @@
 """
 Database configuration and initialization
 """
+import asyncio
+import time
 import aiosqlite
 from pathlib import Path
 from contextlib import asynccontextmanager
 from config.settings import settings
 from app.core.logger import log
+from app.core.metrics import db_connection_wait, db_query_duration, db_rows
+from app.core.slow_query import SlowQueryLog
+from app.core.writer import GroupCommitWriter
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+def original_text_sql(column: str) -> str:
+    """SQL expression joining every string value of a JSON column (questions, answers, dialog turns)"""
+    return (
+        "(SELECT group_concat(value, char(10)) FROM json_tree("
+        f"CASE WHEN json_valid({column}) THEN {column} ELSE '[]' END) WHERE type = 'text')"
+    )
+
+# Upper bounds (seconds) of the inter-submission gap histogram bins; the last bin is open-ended
+GAP_BIN_BOUNDS = (1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+GAP_BIN_COLUMNS = [f"gap_{index}" for index in range(len(GAP_BIN_BOUNDS) + 1)]
+
+# Additive columns of annotation_rollups
+ROLLUP_COUNTERS = ["submissions", "new_annotations", "agree", "disagree", "skip"] + GAP_BIN_COLUMNS
+
+def gap_bin_sql(seconds: str) -> str:
+    """SQL expression mapping a gap in seconds to its bin index (NULL without a previous submit)"""
+    # Rounded to milliseconds: julianday differences carry float error (60s -> 59.99999...)
+    rounded = f"round({seconds}, 3)"
+    cases = " ".join(f"WHEN {rounded} < {bound} THEN {index}" for index, bound in enumerate(GAP_BIN_BOUNDS))
+    return f"(CASE WHEN {rounded} IS NULL OR {rounded} < 0 THEN NULL {cases} ELSE {len(GAP_BIN_BOUNDS)} END)"
+
+def rollup_bucket_sql(timestamp: str, granularity: str) -> str:
+    """SQL expression truncating an ISO timestamp to its hour ('YYYY-MM-DDTHH:00:00') or day bucket"""
+    if granularity == "hour":
+        return f"(replace(substr({timestamp}, 1, 13), ' ', 'T') || ':00:00')"
+    return f"substr({timestamp}, 1, 10)"
+
+def _rollup_upsert_sql(select_sql: str) -> str:
+    """Add the rows of a SELECT (key columns, account, ROLLUP_COUNTERS, last submit) to the rollups"""
+    updates = ",\n            ".join(f"{column} = {column} + excluded.{column}" for column in ROLLUP_COUNTERS)
+    return f"""
+        INSERT INTO annotation_rollups (
+            granularity, bucket, file_hash, dimension, browser_fingerprint, account_name,
+            {", ".join(ROLLUP_COUNTERS)}, last_submit_at
+        )
+        {select_sql}
+        ON CONFLICT(granularity, file_hash, bucket, dimension, browser_fingerprint) DO UPDATE SET
+            account_name = coalesce(excluded.account_name, account_name),
+            {updates},
+            last_submit_at = max(last_submit_at, excluded.last_submit_at);
+    """
+
+def _rollup_trigger_sql(new_annotation: bool) -> str:
+    """Trigger body adding the submission in ``new`` to its hour and day rollups"""
+    previous_submit = (
+        "(SELECT last_submit_at FROM annotator_activity WHERE file_hash = new.file_hash "
+        "AND dimension = coalesce(new.dimension, '') AND browser_fingerprint = new.browser_fingerprint)"
+    )
+    gap_bins = ", ".join(f"coalesce(bin = {index}, 0)" for index in range(len(GAP_BIN_COLUMNS)))
+    select_sql = f"""
+        SELECT granularity,
+               CASE granularity WHEN 'hour' THEN {rollup_bucket_sql('new.updated_at', 'hour')}
+                    ELSE {rollup_bucket_sql('new.updated_at', 'day')} END,
+               new.file_hash, coalesce(new.dimension, ''), new.browser_fingerprint, new.account_name,
+               1, {int(new_annotation)}, new.human_action = 'agree', new.human_action = 'disagree',
+               new.human_action = 'skip', {gap_bins}, new.updated_at
+        FROM (SELECT 'hour' AS granularity UNION ALL SELECT 'day'),
+             (SELECT {gap_bin_sql("gap")} AS bin
+              FROM (SELECT (julianday(new.updated_at) - julianday({previous_submit})) * 86400 AS gap))
+        WHERE true
+    """
+    return _rollup_upsert_sql(select_sql) + """
+        INSERT INTO annotator_activity (file_hash, dimension, browser_fingerprint, last_submit_at)
+        VALUES (new.file_hash, coalesce(new.dimension, ''), new.browser_fingerprint, new.updated_at)
+        ON CONFLICT(file_hash, dimension, browser_fingerprint) DO UPDATE SET
+            last_submit_at = max(last_submit_at, excluded.last_submit_at);
+    """
+
+def _rollup_backfill_sql(granularity: str) -> list:
+    """Statements building the rollups of existing annotations"""
+    # Only the latest verdict of a row is known, so a revised row counts as its first label
+    # (at created_at) plus one revision (at updated_at), both with that verdict
+    actions = "sum(human_action = 'agree'), sum(human_action = 'disagree'), sum(human_action = 'skip')"
+    no_gaps = ", ".join("0" for _ in GAP_BIN_COLUMNS)
+    statements = []
+    for column, new_annotations, condition in (
+        ("created_at", "count(*)", "true"),
+        ("updated_at", "0", "updated_at != created_at"),
+    ):
+        statements.append(_rollup_upsert_sql(f"""
+            SELECT '{granularity}', {rollup_bucket_sql(column, granularity)}, file_hash, coalesce(dimension, ''),
+                   browser_fingerprint, max(account_name), count(*), {new_annotations}, {actions},
+                   {no_gaps}, max({column})
+            FROM annotations
+            WHERE {condition}
+            GROUP BY 2, 3, 4, 5
+        """))
+    # Gaps between the latest submits of consecutive rows
+    gap_bins = ", ".join(f"sum(bin = {index})" for index in range(len(GAP_BIN_COLUMNS)))
+    statements.append(_rollup_upsert_sql(f"""
+        SELECT '{granularity}', {rollup_bucket_sql("updated_at", granularity)}, file_hash, dimension,
+               browser_fingerprint, max(account_name), 0, 0, 0, 0, 0, {gap_bins}, max(updated_at)
+        FROM (
+            SELECT file_hash, coalesce(dimension, '') AS dimension, browser_fingerprint, account_name, updated_at,
+                   {gap_bin_sql("(julianday(updated_at) - julianday(previous_at)) * 86400")} AS bin
+            FROM (
+                SELECT *, lag(updated_at) OVER (
+                    PARTITION BY file_hash, coalesce(dimension, ''), browser_fingerprint ORDER BY updated_at
+                ) AS previous_at
+                FROM annotations
+            )
+        )
+        WHERE bin IS NOT NULL
+        GROUP BY 2, 3, 4, 5
+    """))
+    return statements
 
 class Database:
-    def __init__(self):
-        self.db_path = settings.DATABASE_PATH
-        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+    def __init__(self, db_path: str = None, slow_log: SlowQueryLog = None):
+        self.db_path = db_path or settings.DATABASE_PATH
+        if slow_log is None and settings.SLOW_QUERY_LOG_ENABLED:
+            slow_log = SlowQueryLog(
+                threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+                max_entries=settings.SLOW_QUERY_LOG_SIZE
+            )
+        self.slow_log = slow_log
+        self.router = None  # ShardRouter in sharded storage mode
+        self.writer = GroupCommitWriter(
+            self,
+            batch_size=settings.DB_WRITE_BATCH_SIZE,
+            batch_wait_ms=settings.DB_WRITE_BATCH_WAIT_MS
+        )
+        self._read_pool = None
+        self._read_conns = []
+        self._pool_loop = None
+    
+    async def connect(self, read_only: bool = False, isolation_level: str = ""):
+        """Open a configured connection; the caller owns closing it"""
+        start = time.perf_counter()
+        conn = await aiosqlite.connect(self.db_path, isolation_level=isolation_level)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute("PRAGMA foreign_keys = ON")
+        await conn.execute(f"PRAGMA busy_timeout = {int(settings.DB_BUSY_TIMEOUT_MS)}")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        if read_only:
+            await conn.execute("PRAGMA query_only = ON")
+        db_connection_wait.observe(time.perf_counter() - start)
+        return conn
     
     @asynccontextmanager
     async def get_connection(self):
         """Get database connection context manager"""
-        conn = await aiosqlite.connect(self.db_path)
-        conn.row_factory = aiosqlite.Row
+        conn = await self.connect()
         try:
-            await conn.execute("PRAGMA foreign_keys = ON")
             yield conn
         finally:
             await conn.close()
     
-    async def init_tables(self):
-        """Initialize database tables"""
+    @asynccontextmanager
+    async def read_connection(self):
+        """Borrow a pooled read-only connection"""
+        loop = asyncio.get_running_loop()
+        if self._pool_loop is not loop:
+            # Pools are bound to the loop that created them
+            self._read_pool = asyncio.Queue()
+            self._read_conns = []
+            self._pool_loop = loop
+        
+        start = time.perf_counter()
+        if self._read_pool.empty() and len(self._read_conns) < settings.DB_READ_POOL_SIZE:
+            conn = await self.connect(read_only=True)
+            self._read_conns.append(conn)
+        else:
+            conn = await self._read_pool.get()
+            db_connection_wait.observe(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            self._read_pool.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def for_file(self, file_hash: str, create: bool = False):
+        """
+        Yield the database holding a file's annotations
+        
+        In sharded mode this is the file's shard; reads of unknown files fall
+        back to this (empty) database unless create is set.
+        """
+        if self.router is None:
+            yield self
+            return
+        async with self.router.acquire(file_hash, create=create) as shard_db:
+            yield shard_db or self
+    
+    async def close(self):
+        """Stop the writer and close pooled connections"""
+        if self.router is not None:
+            await self.router.close()
+        await self.writer.close()
+        if self._pool_loop is asyncio.get_running_loop():
+            for conn in self._read_conns:
+                await conn.close()
+        self._read_conns = []
+        self._read_pool = None
+        self._pool_loop = None
+    
+    def _migrations(self):
+        """Ordered schema migrations as (user_version, statements)"""
         create_table_sql = """
         CREATE TABLE IF NOT EXISTS annotations (
             id TEXT PRIMARY KEY,
@@ -66,7 +256,6 @@ class Database:
         );
         """
         
-        # Create indexes
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_task_hash ON annotations(task_hash);",
             "CREATE INDEX IF NOT EXISTS idx_file_hash ON annotations(file_hash);",
@@ -77,42 +266,225 @@ class Database:
             "CREATE UNIQUE INDEX IF NOT EXISTS idx_unique_annotation ON annotations(task_hash, case_id, browser_fingerprint);"
         ]
         
+        return [
+            (1, [create_table_sql] + indexes),
+            # Incremental sync of analytics replicas reads rows by modification time
+            (2, ["CREATE INDEX IF NOT EXISTS idx_updated ON annotations(updated_at, id);"]),
+            # Per-task change sequence for incremental exports (existing rows keep rowid order)
+            (3, [
+                "ALTER TABLE annotations ADD COLUMN seq INTEGER;",
+                "UPDATE annotations SET seq = rowid;",
+                "CREATE INDEX IF NOT EXISTS idx_task_seq ON annotations(task_hash, seq);",
+            ]),
+            # Append-only change log, written in the same transaction as each annotation write
+            (4, [
+                """
+                CREATE TABLE IF NOT EXISTS annotation_changes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    op TEXT NOT NULL CHECK(op IN ('insert', 'update', 'delete')),
+                    annotation_id TEXT,
+                    task_hash TEXT,
+                    file_hash TEXT NOT NULL,
+                    dimension TEXT,
+                    case_id INTEGER,
+                    browser_fingerprint TEXT,
+                    account_name TEXT,
+                    human_action TEXT,
+                    human_judgement TEXT,
+                    human_reasoning TEXT,
+                    task_seq INTEGER,
+                    changed_at TIMESTAMP NOT NULL
+                );
+                """,
+                "CREATE INDEX IF NOT EXISTS idx_changes_file ON annotation_changes(file_hash, seq);",
+            ]),
+            # Full-text index keyed by annotation rowid, kept in sync by triggers
+            (5, [
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS annotations_fts USING fts5(
+                    original_text, human_reasoning, llm_reasoning, human_judgement, llm_judgement,
+                    tokenize = 'trigram'
+                );
+                """,
+                f"""
+                INSERT INTO annotations_fts (
+                    rowid, original_text, human_reasoning, llm_reasoning, human_judgement, llm_judgement
+                )
+                SELECT rowid, {original_text_sql("original_data")},
+                       human_reasoning, llm_reasoning, human_judgement, llm_judgement
+                FROM annotations;
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS annotations_fts_insert AFTER INSERT ON annotations BEGIN
+                    INSERT INTO annotations_fts (
+                        rowid, original_text, human_reasoning, llm_reasoning, human_judgement, llm_judgement
+                    ) VALUES (
+                        new.rowid, {original_text_sql("new.original_data")},
+                        new.human_reasoning, new.llm_reasoning, new.human_judgement, new.llm_judgement
+                    );
+                END;
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS annotations_fts_update
+                AFTER UPDATE OF human_reasoning, human_judgement ON annotations BEGIN
+                    UPDATE annotations_fts
+                    SET human_reasoning = new.human_reasoning, human_judgement = new.human_judgement
+                    WHERE rowid = new.rowid;
+                END;
+                """,
+                """
+                CREATE TRIGGER IF NOT EXISTS annotations_fts_delete AFTER DELETE ON annotations BEGIN
+                    DELETE FROM annotations_fts WHERE rowid = old.rowid;
+                END;
+                """,
+            ]),
+            # Throughput rollups per hour/day, annotator and dimension ('' = no dimension), kept by triggers.
+            # Gaps between an annotator's consecutive submits are binned (GAP_BIN_BOUNDS) into the bucket
+            # of the later submit, so medians over any range come from the same pre-aggregated rows.
+            (6, [
+                f"""
+                CREATE TABLE IF NOT EXISTS annotation_rollups (
+                    granularity TEXT NOT NULL CHECK(granularity IN ('hour', 'day')),
+                    file_hash TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    browser_fingerprint TEXT NOT NULL,
+                    account_name TEXT,
+                    submissions INTEGER NOT NULL DEFAULT 0,  -- Every submit, revisions included
+                    new_annotations INTEGER NOT NULL DEFAULT 0,  -- First label of a case
+                    agree INTEGER NOT NULL DEFAULT 0,
+                    disagree INTEGER NOT NULL DEFAULT 0,
+                    skip INTEGER NOT NULL DEFAULT 0,
+                    {"".join(f"{column} INTEGER NOT NULL DEFAULT 0, " for column in GAP_BIN_COLUMNS)}
+                    last_submit_at TIMESTAMP,
+                    PRIMARY KEY (granularity, file_hash, bucket, dimension, browser_fingerprint)
+                ) WITHOUT ROWID;
+                """,
+                """
+                CREATE TABLE IF NOT EXISTS annotator_activity (
+                    file_hash TEXT NOT NULL,
+                    dimension TEXT NOT NULL,
+                    browser_fingerprint TEXT NOT NULL,
+                    last_submit_at TIMESTAMP NOT NULL,
+                    PRIMARY KEY (file_hash, dimension, browser_fingerprint)
+                ) WITHOUT ROWID;
+                """,
+                *_rollup_backfill_sql("hour"),
+                *_rollup_backfill_sql("day"),
+                """
+                INSERT INTO annotator_activity (file_hash, dimension, browser_fingerprint, last_submit_at)
+                SELECT file_hash, coalesce(dimension, ''), browser_fingerprint, max(updated_at)
+                FROM annotations
+                GROUP BY 1, 2, 3;
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS annotation_rollups_insert AFTER INSERT ON annotations BEGIN
+                    {_rollup_trigger_sql(new_annotation=True)}
+                END;
+                """,
+                f"""
+                CREATE TRIGGER IF NOT EXISTS annotation_rollups_update
+                AFTER UPDATE OF updated_at ON annotations WHEN new.updated_at IS NOT old.updated_at BEGIN
+                    {_rollup_trigger_sql(new_annotation=False)}
+                END;
+                """,
+            ]),
+        ]
+    
+    async def init_tables(self):
+        """Initialize database tables by applying pending migrations once"""
+        lock_file = None
         try:
+            # Created here rather than on construction, so importing the module touches no files
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            if fcntl is not None:
+                # Serialize initialization across worker processes
+                lock_file = open(f"{self.db_path}.init.lock", "w")
+                await asyncio.to_thread(fcntl.flock, lock_file.fileno(), fcntl.LOCK_EX)
+            
             async with self.get_connection() as conn:
-                # Create table
-                await conn.execute(create_table_sql)
-                log.info("Created annotations table")
-                
-                # Create indexes
-                for index_sql in indexes:
-                    await conn.execute(index_sql)
-                log.info("Created database indexes")
+                cursor = await conn.execute("PRAGMA user_version")
+                current_version = (await cursor.fetchone())[0]
+                if current_version == 0:
+                    # Only takes effect before the first table exists; lets maintenance reclaim pages in steps
+                    await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                await conn.execute("PRAGMA journal_mode = WAL")
+
+                for version, statements in self._migrations():
+                    if version <= current_version:
+                        continue
+                    await conn.execute("BEGIN IMMEDIATE")
+                    for sql in statements:
+                        await conn.execute(sql)
+                    await conn.execute(f"PRAGMA user_version = {version}")
+                    await conn.commit()
+                    log.info(f"Applied database migration {version}")
                 
-                await conn.commit()
                 log.info("Database initialization completed")
+            
+            if self.router is not None:
+                await self.router.init()
                 
         except Exception as e:
             log.error(f"Failed to initialize database: {e}")
             raise
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
     
-    async def execute(self, query: str, params: tuple = None):
-        """Execute a query"""
-        async with self.get_connection() as conn:
-            cursor = await conn.execute(query, params or ())
-            await conn.commit()
-            return cursor
+    async def observe(self, conn, op: str, query: str, params, name: str, duration: float, rows: int):
+        """Record timing metrics and feed the slow query log"""
+        db_query_duration.observe(duration, query=name, op=op)
+        if rows > 0:
+            db_rows.inc(rows, query=name, op=op)
+        
+        if self.slow_log is None or not self.slow_log.is_slow(duration):
+            return
+        self.slow_log.record(name, op, query, params, duration, rows)
+        if self.slow_log.needs_plan(query):
+            try:
+                cursor = await conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ())
+                plan = [row["detail"] for row in await cursor.fetchall()]
+                self.slow_log.record_plan(query, plan)
+            except Exception as e:
+                log.warning(f"Failed to capture query plan for {name}: {e}")
+        log.warning(f"Slow query {name} ({op}) took {duration * 1000:.1f}ms, rows={rows}")
+    
+    async def execute(self, query: str, params: tuple = None, name: str = "unnamed") -> int:
+        """Execute a write through the group-commit writer and return its rowcount"""
+        rowcounts = await self.writer.submit([(query, params, name)])
+        return rowcounts[0]
     
-    async def fetchone(self, query: str, params: tuple = None):
+    async def execute_many(self, statements) -> list:
+        """Execute (sql, params, name) statements atomically in one write unit"""
+        return await self.writer.submit(list(statements))
+    
+    async def fetchone(self, query: str, params: tuple = None, name: str = "unnamed"):
         """Fetch one row"""
-        async with self.get_connection() as conn:
+        async with self.read_connection() as conn:
+            start = time.perf_counter()
             cursor = await conn.execute(query, params or ())
-            return await cursor.fetchone()
+            row = await cursor.fetchone()
+            await cursor.close()
+            await self.observe(conn, "fetchone", query, params, name,
+                               time.perf_counter() - start, 0 if row is None else 1)
+            return row
     
-    async def fetchall(self, query: str, params: tuple = None):
+    async def fetchall(self, query: str, params: tuple = None, name: str = "unnamed"):
         """Fetch all rows"""
-        async with self.get_connection() as conn:
+        async with self.read_connection() as conn:
+            start = time.perf_counter()
             cursor = await conn.execute(query, params or ())
-            return await cursor.fetchall()
+            rows = await cursor.fetchall()
+            await cursor.close()
+            await self.observe(conn, "fetchall", query, params, name,
+                               time.perf_counter() - start, len(rows))
+            return rows
 
 # Create database instance
-db = Database()
\ No newline at end of file
+db = Database()
+
+if settings.STORAGE_MODE == "sharded":
+    from app.core.shards import ShardRouter
+    db.router = ShardRouter(settings.SHARD_DIR, settings.SHARD_MAX_OPEN, slow_log=db.slow_log)
\ No newline at end of file
@@ -0,0 +1,263 @@
+"""
+Server-side case dispatcher
+
+Instead of every annotator walking the file from the top, clients ask for their
+next case. Each task (``task_hash``) keeps an in-memory queue of cases that
+still need labels; a case needs ``redundancy`` labels from distinct annotators.
+Handing out a case reserves one of its slots with a lease. Submitting the case
+turns the lease into a label, and leases that are not submitted within
+``DISPATCH_LEASE_SECONDS`` go back to the front of the queue.
+
+An annotator holds at most one lease per task; asking again returns (and
+renews) the same case. Cases go out lowest case id first, so partly labelled
+cases are finished before new ones start; each annotator keeps a cursor into
+that order, so cases it already labelled are passed once rather than on every
+request. All state changes happen without awaiting, so they are atomic on the
+event loop. A task's queue is built from the stored annotations the first time
+it is used; submits that land while it loads are replayed onto it. The queue
+keeps the case count and redundancy it was built with, so requests that
+disagree on them neither rebuild nor reshape it.
+
+Queues and leases are per process, so two workers could hand out the same
+case: with ``WORKERS`` > 1 dispatching is disabled and requests get 503.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.metrics import metrics
+from config.settings import settings
+
+dispatch_assignments = metrics.counter("dispatch_assignments_total", "Cases handed out by the dispatcher")
+dispatch_expired = metrics.counter("dispatch_leases_expired_total", "Dispatcher leases that expired unsubmitted")
+dispatch_tasks = metrics.gauge("dispatch_tasks", "Tasks with an in-memory dispatch queue")
+
+# Loads (case_id, browser_fingerprint) pairs already stored for a task
+LabelLoader = Callable[[], Awaitable[Iterable[Tuple[int, str]]]]
+
+
+class DispatchUnavailable(Exception):
+    """Dispatching is disabled because leases can't be shared between worker processes"""
+
+
+class Lease:
+    __slots__ = ("lease_id", "case_id", "fingerprint", "expires_at")
+
+    def __init__(self, case_id: int, fingerprint: str, expires_at: float):
+        self.lease_id = uuid.uuid4().hex
+        self.case_id = case_id
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+
+
+class TaskQueue:
+    """Open slots and leases of one task"""
+
+    def __init__(self, total_cases: int, redundancy: int, labels: Iterable[Tuple[int, str]]):
+        self.total_cases = total_cases
+        self.redundancy = redundancy
+        self.annotators: Dict[int, Set[str]] = {}  # Labelled or leased by, per case
+        for case_id, fingerprint in labels:
+            if 0 <= case_id < total_cases:
+                self.annotators.setdefault(case_id, set()).add(fingerprint)
+        self.open_slots: Dict[int, int] = {}
+        for case_id in range(total_cases):
+            slots = redundancy - len(self.annotators.get(case_id, ()))
+            if slots > 0:
+                self.open_slots[case_id] = slots
+        self.remaining = sum(self.open_slots.values())
+        self.first_open = 0  # No open slots below this case id, except reopened cases
+        self.cursors: Dict[str, int] = {}  # Per annotator: every case below was labelled by it or full when passed
+        self.reopened: deque = deque()  # Cases whose slots came back after cursors may have passed them
+        self.leases: Dict[str, Lease] = {}  # By fingerprint
+        self._expiry: List[Tuple[float, int, Lease]] = []
+        self._counter = itertools.count()
+
+    def _push_expiry(self, lease: Lease):
+        heapq.heappush(self._expiry, (lease.expires_at, next(self._counter), lease))
+
+    def _reopen(self, case_id: int, fingerprint: str):
+        self.annotators[case_id].discard(fingerprint)
+        self.open_slots[case_id] = self.open_slots.get(case_id, 0) + 1
+        self.remaining += 1
+        # Abandoned cases go first so the tail of the file isn't starved
+        self.reopened.appendleft(case_id)
+
+    def expire(self, now: float) -> int:
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, _, lease = heapq.heappop(self._expiry)
+            # Renewed or finished leases leave stale heap entries behind
+            if self.leases.get(lease.fingerprint) is not lease or lease.expires_at != expires_at:
+                continue
+            del self.leases[lease.fingerprint]
+            self._reopen(lease.case_id, lease.fingerprint)
+            expired += 1
+        return expired
+
+    def _next_reopened(self, fingerprint: str) -> Optional[int]:
+        # Short in practice: only abandoned leases land here, and full entries are dropped
+        skipped = []
+        case_id = None
+        while self.reopened:
+            candidate = self.reopened.popleft()
+            if self.open_slots.get(candidate, 0) <= 0:
+                continue  # Filled since it was reopened
+            if fingerprint in self.annotators.get(candidate, ()):
+                skipped.append(candidate)
+                continue
+            case_id = candidate
+            break
+        self.reopened.extendleft(reversed(skipped))
+        return case_id
+
+    def _next_in_order(self, fingerprint: str) -> Optional[int]:
+        while self.first_open < self.total_cases and self.open_slots.get(self.first_open, 0) <= 0:
+            self.first_open += 1
+        position = max(self.cursors.get(fingerprint, 0), self.first_open)
+        while position < self.total_cases:
+            if self.open_slots.get(position, 0) > 0 and fingerprint not in self.annotators.get(position, ()):
+                break
+            position += 1
+        self.cursors[fingerprint] = position
+        return position if position < self.total_cases else None
+
+    def reserve(self, fingerprint: str, now: float, lease_seconds: float) -> Optional[Lease]:
+        lease = self.leases.get(fingerprint)
+        if lease is not None:
+            lease.expires_at = now + lease_seconds
+            self._push_expiry(lease)
+            return lease
+
+        case_id = self._next_reopened(fingerprint)
+        if case_id is not None:
+            if self.open_slots[case_id] > 1:
+                # Cursors may be past it, so its remaining slots stay reachable from here
+                self.reopened.appendleft(case_id)
+        else:
+            case_id = self._next_in_order(fingerprint)
+            if case_id is None:
+                return None
+
+        self.open_slots[case_id] -= 1
+        self.remaining -= 1
+        if self.open_slots[case_id] == 0:
+            del self.open_slots[case_id]
+        self.annotators.setdefault(case_id, set()).add(fingerprint)
+        lease = Lease(case_id, fingerprint, now + lease_seconds)
+        self.leases[fingerprint] = lease
+        self._push_expiry(lease)
+        return lease
+
+    def release(self, fingerprint: str, case_id: int) -> bool:
+        lease = self.leases.get(fingerprint)
+        if lease is None or lease.case_id != case_id:
+            return False
+        del self.leases[fingerprint]
+        self._reopen(case_id, fingerprint)
+        return True
+
+    def complete(self, fingerprint: str, case_id: int):
+        lease = self.leases.get(fingerprint)
+        if lease is not None and lease.case_id == case_id:
+            del self.leases[fingerprint]  # The reserved slot becomes the label
+            return
+        annotators = self.annotators.setdefault(case_id, set())
+        if fingerprint in annotators:
+            return  # Revision of an existing label
+        annotators.add(fingerprint)
+        slots = self.open_slots.get(case_id, 0)
+        if slots > 0:
+            self.remaining -= 1
+            if slots == 1:
+                del self.open_slots[case_id]  # Cursors and reopened entries skip it lazily
+            else:
+                self.open_slots[case_id] = slots - 1
+
+
+class Dispatcher:
+    def __init__(self, lease_seconds: float, default_redundancy: int, max_tasks: int, enabled: bool = True):
+        self.enabled = enabled
+        self.lease_seconds = lease_seconds
+        self.default_redundancy = max(1, default_redundancy)
+        self.max_tasks = max(1, max_tasks)
+        self._tasks: "OrderedDict[str, TaskQueue]" = OrderedDict()
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._completed_while_loading: Dict[str, List[Tuple[str, int]]] = {}
+
+    async def _get(self, task_hash: str, total_cases: int, redundancy: int, load: LabelLoader) -> TaskQueue:
+        # The first build fixes a task's case count and redundancy; later requests use them as they are
+        task = self._tasks.get(task_hash)
+        if task is not None:
+            self._tasks.move_to_end(task_hash)
+            return task
+
+        # Concurrent first requests for one task share a single load
+        pending = self._loading.get(task_hash)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        future = asyncio.get_running_loop().create_future()
+        self._loading[task_hash] = future
+        self._completed_while_loading[task_hash] = []
+        try:
+            labels = await load()
+            task = TaskQueue(total_cases, redundancy, labels)
+            # Submits stored during the load may be missing from what it read
+            for fingerprint, case_id in self._completed_while_loading[task_hash]:
+                task.complete(fingerprint, case_id)
+            self._tasks[task_hash] = task
+            while len(self._tasks) > self.max_tasks:
+                self._tasks.popitem(last=False)
+            dispatch_tasks.set(len(self._tasks))
+            future.set_result(task)
+            return task
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._loading[task_hash]
+            del self._completed_while_loading[task_hash]
+
+    async def next_case(self, task_hash: str, fingerprint: str, total_cases: int,
+                        redundancy: Optional[int], load: LabelLoader) -> Tuple[Optional[Lease], int]:
+        """Reserve the annotator's next case; returns (lease or None when done, open slots left)"""
+        if not self.enabled:
+            raise DispatchUnavailable("Case dispatching needs a single worker process (WORKERS=1)")
+        task = await self._get(task_hash, total_cases, redundancy or self.default_redundancy, load)
+        now = time.monotonic()
+        dispatch_expired.inc(task.expire(now))
+        lease = task.reserve(fingerprint, now, self.lease_seconds)
+        if lease is not None:
+            dispatch_assignments.inc()
+        return lease, task.remaining
+
+    def release(self, task_hash: str, fingerprint: str, case_id: int) -> bool:
+        """Give a leased case back without labelling it"""
+        if not self.enabled:
+            raise DispatchUnavailable("Case dispatching needs a single worker process (WORKERS=1)")
+        task = self._tasks.get(task_hash)
+        return task is not None and task.release(fingerprint, case_id)
+
+    def complete(self, task_hash: str, fingerprint: str, case_id: int):
+        """Record a stored label (called on every submit)"""
+        task = self._tasks.get(task_hash)
+        if task is not None:
+            task.complete(fingerprint, case_id)
+        completed = self._completed_while_loading.get(task_hash)
+        if completed is not None:
+            completed.append((fingerprint, case_id))
+
+    def clear(self):
+        """Drop all queues so they are rebuilt from storage (e.g. after a task is retired)"""
+        self._tasks.clear()
+        dispatch_tasks.set(0)
+
+
+# Create dispatcher instance
+dispatcher = Dispatcher(settings.DISPATCH_LEASE_SECONDS, settings.DISPATCH_REDUNDANCY, settings.DISPATCH_MAX_TASKS,
+                        enabled=settings.WORKERS <= 1)
@@ -0,0 +1,94 @@
+"""
+Idempotency keys for retried writes
+
+Clients send an ``Idempotency-Key`` header with each logical submission and
+reuse it on retries. The first request with a key runs normally; replays within
+the TTL get the original result without touching the database, and concurrent
+duplicates wait on the in-flight request instead of writing again. Failed
+requests are forgotten so the client can retry them.
+
+The index is per process and bounded in both age and size.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Tuple
+
+from app.core.metrics import metrics
+from config.settings import settings
+
+idempotent_replays = metrics.counter("idempotent_replays_total", "Requests answered from the idempotency index")
+idempotency_keys = metrics.gauge("idempotency_keys", "Idempotency keys currently remembered")
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request payload"""
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "future", "expires_at")
+
+    def __init__(self, fingerprint: str, future: asyncio.Future, expires_at: float):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.expires_at = expires_at
+
+
+class IdempotencyCache:
+    def __init__(self, ttl_seconds: float, max_keys: int):
+        self.ttl = ttl_seconds
+        self.max_keys = max(1, max_keys)
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+
+    def _purge(self, now: float):
+        # Entries share one TTL, so insertion order is expiry order
+        while self._entries:
+            entry = next(iter(self._entries.values()))
+            if entry.expires_at > now and len(self._entries) <= self.max_keys:
+                break
+            self._entries.popitem(last=False)
+        idempotency_keys.set(len(self._entries))
+
+    async def run(self, key: Hashable, fingerprint: str,
+                  func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run ``func`` once per key; returns (result, replayed).
+
+        ``fingerprint`` identifies the request payload so a key reused for a
+        different request is rejected instead of silently replayed.
+        """
+        now = time.monotonic()
+        self._purge(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.fingerprint != fingerprint:
+                raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+            result = await asyncio.shield(entry.future)
+            idempotent_replays.inc()
+            return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        entry = _Entry(fingerprint, future, now + self.ttl)
+        self._entries[key] = entry
+        self._purge(now)
+        try:
+            result = await func()
+        except BaseException as e:
+            # Only successful results are remembered
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+                idempotency_keys.set(len(self._entries))
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        future.set_result(result)
+        return result, False
+
+    def clear(self):
+        self._entries.clear()
+        idempotency_keys.set(0)
+
+
+# Create idempotency index instance
+idempotency = IdempotencyCache(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_KEYS)
@@ -1,8 +1,10 @@
 """
 Logging configuration using loguru
 """
+import random
 import sys
 from pathlib import Path
+from typing import Any, Callable
 from loguru import logger
 from config.settings import settings
 
@@ -11,12 +13,17 @@ def setup_logger():
     # Remove default handler
     logger.remove()
     
-    # Console handler
+    # JSON output serializes the whole record; the text format is ignored then
+    serialize = settings.LOG_JSON
+    
+    # Console handler, queued so request handlers never block on stdout
     logger.add(
         sys.stdout,
         level=settings.LOG_LEVEL,
         format=settings.LOG_FORMAT,
-        colorize=True
+        colorize=not serialize,
+        serialize=serialize,
+        enqueue=settings.LOG_CONSOLE_ENQUEUE
     )
     
     # File handler with rotation
@@ -25,10 +32,12 @@ def setup_logger():
         log_file,
         level=settings.LOG_LEVEL,
         format=settings.LOG_FORMAT,
+        serialize=serialize,
         rotation=settings.LOG_ROTATION,
         retention=settings.LOG_RETENTION,
         compression="zip",
-        enqueue=True  # Thread-safe
+        enqueue=True,  # Thread-safe
+        delay=True  # Opened on the first message, not on import
     )
     
     # Error file handler
@@ -37,13 +46,31 @@ def setup_logger():
         error_file,
         level="ERROR",
         format=settings.LOG_FORMAT,
+        serialize=serialize,
         rotation=settings.LOG_ROTATION,
         retention=settings.LOG_RETENTION,
         compression="zip",
-        enqueue=True
+        enqueue=True,
+        delay=True
     )
     
     return logger
 
+def should_sample(route: str) -> bool:
+    """Decide whether a verbose log for this route should be emitted"""
+    rate = settings.LOG_SAMPLE_RATES.get(route, settings.LOG_DEBUG_SAMPLE_RATE)
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+def log_payload(route: str, message: str, payload: Callable[[], Any]):
+    """
+    Log a request payload dump at DEBUG level
+    
+    The payload callable is only evaluated when LOG_PAYLOADS is on, the route
+    is sampled and a sink actually accepts DEBUG records.
+    """
+    if not settings.LOG_PAYLOADS or not should_sample(route):
+        return
+    log.opt(lazy=True, depth=1).debug(message, payload)
+
 # Initialize logger
-log = setup_logger()
\ No newline at end of file
+log = setup_logger()
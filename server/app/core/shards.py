@@ -0,0 +1,221 @@
+"""
+Per-task SQLite shards with a catalog-based routing layer
+
+In sharded storage mode every ``file_hash`` lives in its own SQLite file under
+``SHARD_DIR``. A small catalog database maps file hashes to shard files, open
+shards are kept in a bounded LRU, and cross-task queries fan out over all
+shards in parallel. Retiring a task is a file delete.
+
+Drops are fenced in process memory only, so sharded mode runs on a single
+worker process (``Settings.check_workers`` refuses it otherwise).
+"""
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.database import Database
+from app.core.logger import log
+from app.core.metrics import metrics
+
+open_shards = metrics.gauge("db_open_shards", "Shard databases currently held open")
+shard_evictions = metrics.counter("db_shard_evictions_total", "Shards closed by LRU eviction")
+
+
+class CatalogDatabase(Database):
+    """Catalog mapping file hashes to shard files"""
+
+    def _migrations(self):
+        return [
+            (1, [
+                """
+                CREATE TABLE IF NOT EXISTS shards (
+                    file_hash TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                """
+            ]),
+        ]
+
+
+class _Shard:
+    __slots__ = ("database", "refcount", "evicted")
+
+    def __init__(self, database: Database):
+        self.database = database
+        self.refcount = 0
+        self.evicted = False
+
+
+class ShardRouter:
+    def __init__(self, shard_dir: str, max_open: int, slow_log=None):
+        self.shard_dir = Path(shard_dir)
+        self.max_open = max(1, max_open)
+        self.slow_log = slow_log
+        self.catalog = CatalogDatabase(str(self.shard_dir / "catalog.db"), slow_log=slow_log)
+        self._open: "OrderedDict[str, _Shard]" = OrderedDict()
+        self._opening: Dict[str, asyncio.Future] = {}
+        self._dropping: Dict[str, asyncio.Future] = {}
+
+    async def init(self):
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        await self.catalog.init_tables()
+
+    def shard_path(self, file_hash: str) -> Path:
+        # Client-provided hashes are not trusted as file names
+        name = hashlib.sha256(file_hash.encode()).hexdigest()
+        return self.shard_dir / f"{name}.db"
+
+    async def _open_shard(self, file_hash: str) -> _Shard:
+        path = self.shard_path(file_hash)
+        await self.catalog.execute(
+            "INSERT OR IGNORE INTO shards (file_hash, path, created_at) VALUES (?, ?, ?)",
+            (file_hash, str(path), datetime.now().isoformat()),
+            name="catalog_register"
+        )
+        database = Database(str(path), slow_log=self.slow_log)
+        await database.init_tables()
+        return _Shard(database)
+
+    async def exists(self, file_hash: str) -> bool:
+        row = await self.catalog.fetchone(
+            "SELECT 1 FROM shards WHERE file_hash = ?", (file_hash,), name="catalog_lookup"
+        )
+        return row is not None
+
+    async def _get(self, file_hash: str, create: bool) -> Optional[_Shard]:
+        # Every await below can interleave with an open or drop of the same hash, so state is re-read after it
+        known = create
+        while True:
+            dropping = self._dropping.get(file_hash)
+            if dropping is not None:
+                # Never hand out a shard that is being deleted; later writes start a fresh one
+                await asyncio.shield(dropping)
+                continue
+            shard = self._open.get(file_hash)
+            if shard is not None:
+                self._open.move_to_end(file_hash)
+                return shard
+            # Concurrent first requests for one task share a single open
+            pending = self._opening.get(file_hash)
+            if pending is not None:
+                await asyncio.shield(pending)
+                continue
+            if known:
+                break
+            if not await self.exists(file_hash):
+                return None
+            known = True
+
+        future = asyncio.get_running_loop().create_future()
+        self._opening[file_hash] = future
+        try:
+            shard = await self._open_shard(file_hash)
+            self._open[file_hash] = shard
+            future.set_result(shard)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._opening[file_hash]
+
+        await self._evict()
+        open_shards.set(len(self._open))
+        if self._open.get(file_hash) is not shard:
+            # Dropped while evicting others
+            return await self._get(file_hash, create)
+        return shard
+
+    async def _evict(self):
+        """Close least recently used shards beyond the open-handle budget"""
+        while len(self._open) > self.max_open:
+            file_hash, shard = self._open.popitem(last=False)
+            shard.evicted = True
+            shard_evictions.inc()
+            if shard.refcount == 0:
+                await shard.database.close()
+
+    @asynccontextmanager
+    async def acquire(self, file_hash: str, create: bool = True):
+        """Borrow the shard database for a file hash (None if absent and not created)"""
+        shard = await self._get(file_hash, create)
+        if shard is None:
+            yield None
+            return
+        shard.refcount += 1
+        try:
+            yield shard.database
+        finally:
+            shard.refcount -= 1
+            if shard.evicted and shard.refcount == 0:
+                await shard.database.close()
+
+    async def file_hashes(self) -> List[str]:
+        rows = await self.catalog.fetchall("SELECT file_hash FROM shards ORDER BY created_at", name="catalog_list")
+        return [row["file_hash"] for row in rows]
+
+    async def generations(self) -> Dict[str, str]:
+        """Map each shard's file hash to its creation time, which changes when a task is recreated"""
+        rows = await self.catalog.fetchall("SELECT file_hash, created_at FROM shards", name="catalog_list")
+        return {row["file_hash"]: row["created_at"] for row in rows}
+
+    async def fan_out(self, query: str, params: tuple = None, name: str = "unnamed",
+                      concurrency: Optional[int] = None) -> List[Tuple[str, list]]:
+        """Run a read query on every shard in parallel, returning (file_hash, rows) pairs"""
+        semaphore = asyncio.Semaphore(concurrency or max(1, self.max_open // 2))
+
+        async def run_one(file_hash: str):
+            async with semaphore:
+                async with self.acquire(file_hash, create=False) as shard_db:
+                    if shard_db is None:
+                        return file_hash, []
+                    return file_hash, await shard_db.fetchall(query, params, name=name)
+
+        return list(await asyncio.gather(*(run_one(file_hash) for file_hash in await self.file_hashes())))
+
+    async def drop(self, file_hash: str) -> bool:
+        """Retire a task by deleting its shard file"""
+        while file_hash in self._dropping:
+            await asyncio.shield(self._dropping[file_hash])
+        # Mark the hash first so no request reopens the shard while in-flight writes drain
+        done = asyncio.get_running_loop().create_future()
+        self._dropping[file_hash] = done
+        try:
+            pending = self._opening.get(file_hash)
+            if pending is not None:
+                await asyncio.wait([pending])
+            deleted = await self.catalog.execute(
+                "DELETE FROM shards WHERE file_hash = ?", (file_hash,), name="catalog_drop"
+            )
+            shard = self._open.pop(file_hash, None)
+            if shard is not None:
+                shard.evicted = True
+                while shard.refcount > 0:
+                    await asyncio.sleep(0.01)
+                await shard.database.close()
+                open_shards.set(len(self._open))
+
+            path = self.shard_path(file_hash)
+            for suffix in ("", "-wal", "-shm", ".init.lock"):
+                try:
+                    os.remove(f"{path}{suffix}")
+                except FileNotFoundError:
+                    pass
+        finally:
+            del self._dropping[file_hash]
+            done.set_result(None)
+        log.info(f"Dropped shard for file {file_hash}")
+        return deleted > 0
+
+    async def close(self):
+        for shard in self._open.values():
+            await shard.database.close()
+        self._open.clear()
+        open_shards.set(0)
+        await self.catalog.close()
@@ -0,0 +1,84 @@
+"""
+Slow query log with first-seen EXPLAIN QUERY PLAN capture
+"""
+import re
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace so the same statement maps to one plan entry"""
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+def param_shapes(params: Optional[Sequence[Any]]) -> List[str]:
+    """Describe bound parameters by type (and length) without leaking values"""
+    shapes = []
+    for value in params or ():
+        if value is None:
+            shapes.append("null")
+        elif isinstance(value, (str, bytes)):
+            shapes.append(f"{type(value).__name__}[{len(value)}]")
+        else:
+            shapes.append(type(value).__name__)
+    return shapes
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of statements slower than a threshold"""
+
+    def __init__(self, threshold_ms: float, max_entries: int, max_plans: int = 500):
+        self.threshold_ms = threshold_ms
+        self.max_plans = max_plans
+        self._entries = deque(maxlen=max_entries)
+        self._plans: Dict[str, List[str]] = {}
+        self._lock = Lock()
+
+    def is_slow(self, duration_s: float) -> bool:
+        return duration_s * 1000 >= self.threshold_ms
+
+    def needs_plan(self, query: str) -> bool:
+        key = normalize_sql(query)
+        return key not in self._plans and len(self._plans) < self.max_plans
+
+    def record_plan(self, query: str, plan: List[str]):
+        with self._lock:
+            self._plans.setdefault(normalize_sql(query), plan)
+
+    def record(
+        self,
+        name: str,
+        op: str,
+        query: str,
+        params: Optional[Sequence[Any]],
+        duration_s: float,
+        rows: int,
+    ):
+        key = normalize_sql(query)
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "name": name,
+            "op": op,
+            "sql": key,
+            "paramShapes": param_shapes(params),
+            "durationMs": round(duration_s * 1000, 3),
+            "rows": rows,
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Return buffered entries, newest first, with their captured plans"""
+        with self._lock:
+            entries = list(self._entries)
+            plans = dict(self._plans)
+        return [dict(entry, plan=plans.get(entry["sql"])) for entry in reversed(entries)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
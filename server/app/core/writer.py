@@ -0,0 +1,150 @@
+"""
+Group-commit writer for SQLite
+
+All writes of a process funnel through one asyncio task owning one write
+connection. Pending write units are drained in batches and committed in a
+single ``BEGIN IMMEDIATE`` transaction, so concurrent submits share one fsync
+and, across worker processes, SQLite's reserved lock (waited on through
+``busy_timeout``) serializes writers instead of failing them. Each unit runs
+inside its own SAVEPOINT: a failing unit is rolled back and reported to its
+caller without affecting the rest of the batch.
+"""
+import asyncio
+import time
+from typing import Any, List, Optional, Sequence, Tuple
+
+from app.core.logger import log
+from app.core.metrics import metrics
+
+Statement = Tuple[str, Optional[Sequence[Any]], str]  # (sql, params, query name)
+
+write_queue_depth = metrics.gauge("db_write_queue_depth", "Write units waiting for the group-commit writer")
+write_batch_size = metrics.histogram(
+    "db_write_batch_size",
+    "Write units committed per transaction",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+write_commit_duration = metrics.histogram("db_write_commit_seconds", "Duration of group-commit transactions")
+
+
+class _WriteUnit:
+    __slots__ = ("statements", "future")
+
+    def __init__(self, statements: List[Statement], future: asyncio.Future):
+        self.statements = statements
+        self.future = future
+
+
+class GroupCommitWriter:
+    def __init__(self, database, batch_size: int, batch_wait_ms: float):
+        self.database = database
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = max(0.0, batch_wait_ms) / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._conn = None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # A new event loop (e.g. after a test client restart) owns nothing yet
+            self._task = None
+            self._conn = None
+            self._loop = loop
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, statements: List[Statement]) -> List[int]:
+        """Queue a write unit and wait until its transaction has committed"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_WriteUnit(statements, future))
+        write_queue_depth.set(self._queue.qsize())
+        return await future
+
+    def _drain(self, batch: List[_WriteUnit]):
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            self._drain(batch)
+            if self.batch_wait and len(batch) < self.batch_size:
+                await asyncio.sleep(self.batch_wait)
+                self._drain(batch)
+            write_queue_depth.set(self._queue.qsize())
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                log.error(f"Group commit of {len(batch)} write units failed: {e}")
+                await self._reset_connection()
+                for unit in batch:
+                    if not unit.future.done():
+                        unit.future.set_exception(e)
+
+    async def _reset_connection(self):
+        if self._conn is not None:
+            try:
+                await self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    async def _commit(self, batch: List[_WriteUnit]):
+        if self._conn is None:
+            self._conn = await self.database.connect(isolation_level=None)
+        conn = self._conn
+        start = time.perf_counter()
+        results = []
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            for unit in batch:
+                await conn.execute("SAVEPOINT write_unit")
+                try:
+                    rowcounts = []
+                    for sql, params, name in unit.statements:
+                        statement_start = time.perf_counter()
+                        cursor = await conn.execute(sql, params or ())
+                        await self.database.observe(
+                            conn, "execute", sql, params, name,
+                            time.perf_counter() - statement_start, cursor.rowcount
+                        )
+                        rowcounts.append(cursor.rowcount)
+                    await conn.execute("RELEASE write_unit")
+                    results.append((unit, rowcounts, None))
+                except Exception as e:
+                    await conn.execute("ROLLBACK TO write_unit")
+                    await conn.execute("RELEASE write_unit")
+                    results.append((unit, None, e))
+            await conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                await conn.execute("ROLLBACK")
+            raise
+        write_commit_duration.observe(time.perf_counter() - start)
+        write_batch_size.observe(len(batch))
+
+        for unit, rowcounts, error in results:
+            if unit.future.done():
+                continue
+            if error is not None:
+                unit.future.set_exception(error)
+            else:
+                unit.future.set_result(rowcounts)
+
+    async def close(self):
+        """Stop the writer task and close its connection"""
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        await self._reset_connection()
@@ -1,35 +1,65 @@
 """
 Main FastAPI application
 """
+import asyncio
 import os
 from pathlib import Path
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 from config import settings
 from app.core import log, db
+from app.core.dispatcher import dispatcher
+from app.storage import storage
+from app.services import backups, export_jobs, maintenance
 from app.api import api_router
+from app.core.metrics import metrics, MetricsMiddleware
+from app.core.admission import AdmissionController, AdmissionMiddleware
+from app.core.compression import JSONGZipMiddleware
+from app.utils import preload, shutdown_parse_pool
+from app.utils.json_codec import FastJSONResponse
+from app.utils.static_files import StaticSite
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle startup and shutdown events"""
     # Startup
     log.info("Starting annotation backend service...")
+    settings.ensure_directories()
+    settings.check_workers()
     
     # Initialize database
     try:
         await db.init_tables()
-        log.info("Database initialized successfully")
+        await storage.init()
+        await export_jobs.init()
+        await backups.init()
+        await maintenance.init()
+        log.info(f"Database initialized successfully (storage backend: {storage.name})")
     except Exception as e:
         log.error(f"Failed to initialize database: {e}")
         raise
     
+    if not dispatcher.enabled:
+        log.error(f"Case dispatching is disabled: its leases are per process and WORKERS={settings.WORKERS}")
+    
+    # Heavy upload dependencies are otherwise imported by the first upload;
+    # warming up in a thread keeps /health from waiting on it
+    if settings.WARMUP_ON_STARTUP:
+        asyncio.get_running_loop().run_in_executor(None, preload)
+    
     yield
     
     # Shutdown
     log.info("Shutting down annotation backend service...")
+    shutdown_parse_pool()
+    await maintenance.close()
+    await backups.close()
+    await export_jobs.close()
+    await storage.close()
+    await db.close()
+    await log.complete()
 
 # Create FastAPI app
 app = FastAPI(
@@ -38,9 +68,26 @@ app = FastAPI(
     openapi_url=f"{settings.API_PREFIX}/openapi.json",
     docs_url=f"{settings.API_PREFIX}/docs",
     redoc_url=f"{settings.API_PREFIX}/redoc",
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
+# Per-class concurrency budgets and per-annotator rate limits
+# (added first so 429 responses still pass through CORS and metrics)
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=AdmissionController(
+            api_prefix=settings.API_PREFIX,
+            limits=settings.ADMISSION_LIMITS,
+            queue_sizes=settings.ADMISSION_QUEUE_SIZES,
+            queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+            rate=settings.RATE_LIMIT_PER_SECOND,
+            burst=settings.RATE_LIMIT_BURST,
+            costs=settings.RATE_LIMIT_COSTS,
+        ),
+    )
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -51,6 +98,18 @@ app.add_middleware(
     expose_headers=settings.CORS_EXPOSE_HEADERS,
 )
 
+# Compress large JSON responses
+if settings.GZIP_ENABLED:
+    app.add_middleware(
+        JSONGZipMiddleware,
+        minimum_size=settings.GZIP_MIN_SIZE,
+        compresslevel=settings.GZIP_COMPRESSLEVEL
+    )
+
+# Record per-route latency histograms
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, exclude_paths=(settings.METRICS_PATH,))
+
 # Include API routes
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
@@ -60,33 +119,37 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+if settings.METRICS_ENABLED:
+    @app.get(settings.METRICS_PATH, include_in_schema=False)
+    async def metrics_endpoint():
+        """Prometheus scrape endpoint"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Static files serving configuration
 static_dir = Path(__file__).parent.parent / "static"
 static_exists = static_dir.exists() and static_dir.is_dir()
 
 if static_exists:
-    # Production mode: serve static files
-    log.info(f"📁 Serving static files from {static_dir}")
-    
-    # Mount assets directory for static resources
-    assets_dir = static_dir / "assets"
-    if assets_dir.exists():
-        app.mount("/assets", StaticFiles(directory=str(assets_dir)), name="assets")
+    # Production mode: serve static files from a table built once at startup
+    static_site = StaticSite(static_dir)
+    log.info(f"📁 Serving {len(static_site.entries)} static files from {static_dir}")
     
     # Catch-all route for SPA (Single Page Application)
     # This must be defined after all other routes
     @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str):
+    async def serve_spa(full_path: str, request: Request):
         """Serve the frontend SPA for all non-API routes"""
         # Check if it's a static file request
-        file_path = static_dir / full_path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(str(file_path))
+        response = static_site.response(request, full_path)
+        if response is not None:
+            return response
+        if full_path.startswith("assets/"):
+            # A missing bundle must not be answered with HTML
+            raise HTTPException(status_code=404, detail="Not Found")
         
         # For all other routes, return index.html (frontend routing)
-        index_path = static_dir / "index.html"
-        if index_path.exists():
-            return FileResponse(str(index_path))
+        if static_site.index is not None:
+            return static_site.index_response(request)
         
         # If index.html doesn't exist, return API info
         return {
@@ -4,8 +4,14 @@ __all__ = [
     "ActionEnum",
     "AnnotationTypeEnum", 
     "EvaluationTypeEnum",
+    "SheetInfo",
     "FileUploadResponse",
+    "CompleteDataRow",
     "AnnotationSubmitRequest",
+    "DimensionVerdict",
+    "MultiDimensionSubmitRequest",
+    "DispatchRequest",
+    "DispatchReleaseRequest",
     "AnnotationStats",
     "ProgressResponse",
     "AnnotationRecord"
@@ -1,9 +1,9 @@
 """
 Data models for annotation system
 """
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
-from datetime import datetime
+from operator import attrgetter
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Dict, Any, List, Mapping
 from enum import Enum
 
 class ActionEnum(str, Enum):
@@ -22,6 +22,14 @@ class EvaluationTypeEnum(str, Enum):
     comparison = "comparison"
 
 # Request/Response Models
+class SheetInfo(BaseModel):
+    name: str
+    annotationType: AnnotationTypeEnum
+    totalRows: int
+    columns: List[str]
+    isValid: bool
+    errors: Optional[List[str]] = None
+
 class FileUploadResponse(BaseModel):
     fileId: str
     filename: str
@@ -29,6 +37,24 @@ class FileUploadResponse(BaseModel):
     columns: List[str]
     isValid: bool
     errors: Optional[List[str]] = None
+    annotationType: Optional[AnnotationTypeEnum] = None
+    sheets: List[SheetInfo] = []  # Every sheet of a workbook (a CSV is one sheet)
+    dimensions: List[str] = []  # Valid sheets, one dimension each
+
+class CompleteDataRow(BaseModel):
+    """The annotated case as sent by the workspace, shared by every dimension's verdict"""
+    # Label cells may hold numbers; unknown keys from older clients are dropped
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+    file_hash: str = Field(..., min_length=1, max_length=128)
+    filename: str = Field(..., min_length=1, max_length=1024)
+    case_id: int = Field(..., ge=0)
+    account_name: str = Field(..., max_length=256, pattern=r"\S")  # Not blank
+    original_data: Dict[str, Any] = {}
+    annotation_type: Optional[str] = Field(None, max_length=64)
+    evaluation_type: Optional[str] = Field(None, max_length=64)
+    labels: Optional[List[str]] = None
+    metadata: Optional[Dict[str, Any]] = None
 
 class AnnotationSubmitRequest(BaseModel):
     itemId: str
@@ -36,7 +62,29 @@ class AnnotationSubmitRequest(BaseModel):
     humanJudgement: Optional[str] = None
     humanReasoning: Optional[str] = None
     dimension: Optional[str] = None
-    completeDataRow: Optional[Dict[str, Any]] = None
+    completeDataRow: Optional[CompleteDataRow] = None
+
+class DimensionVerdict(BaseModel):
+    dimension: Optional[str] = None
+    action: ActionEnum
+    humanJudgement: Optional[str] = None
+    humanReasoning: Optional[str] = None
+
+class MultiDimensionSubmitRequest(BaseModel):
+    itemId: str
+    verdicts: List[DimensionVerdict] = Field(..., min_length=1, max_length=64)
+    completeDataRow: Optional[CompleteDataRow] = None
+
+class DispatchRequest(BaseModel):
+    fileHash: str
+    dimension: Optional[str] = None
+    totalCases: int = Field(..., ge=1, le=10_000_000)
+    redundancy: Optional[int] = Field(None, ge=1, le=100)
+
+class DispatchReleaseRequest(BaseModel):
+    fileHash: str
+    dimension: Optional[str] = None
+    caseId: int
 
 class AnnotationStats(BaseModel):
     total: int
@@ -54,24 +102,71 @@ class ProgressResponse(BaseModel):
     progress: float
 
 # Database Models
-class AnnotationRecord(BaseModel):
-    id: str
-    task_hash: str
-    file_hash: str
-    filename: str
-    dimension: Optional[str] = None
-    case_id: int
-    browser_fingerprint: str
-    account_name: Optional[str] = None
-    original_data: Dict[str, Any]
-    llm_judgement: Optional[str] = None
-    llm_reasoning: Optional[str] = None
-    human_action: ActionEnum
-    human_judgement: Optional[str] = None
-    human_reasoning: Optional[str] = None
-    annotation_type: Optional[str] = None
-    evaluation_type: Optional[str] = None
-    labels: Optional[List[str]] = None
-    metadata: Optional[Dict[str, Any]] = None
-    created_at: Optional[datetime] = None
-    updated_at: Optional[datetime] = None
\ No newline at end of file
+class AnnotationRecord:
+    """
+    One annotation row as written by the store
+
+    A plain slotted object rather than a pydantic model: it is built from an
+    already validated request on every submit and handed to the writer as is.
+    Slots are the written columns in table order; seq is assigned by the store.
+    """
+    __slots__ = (
+        "id",
+        "task_hash",
+        "file_hash",
+        "filename",
+        "dimension",
+        "case_id",
+        "browser_fingerprint",
+        "account_name",
+        "original_data",  # JSON text
+        "llm_judgement",
+        "llm_reasoning",
+        "human_action",
+        "human_judgement",
+        "human_reasoning",
+        "annotation_type",
+        "evaluation_type",
+        "labels",  # JSON text
+        "metadata",  # JSON text
+        "created_at",
+        "updated_at",
+    )
+
+    def __init__(self, id: str, task_hash: str, file_hash: str, filename: str, dimension: Optional[str],
+                 case_id: int, browser_fingerprint: str, account_name: Optional[str], original_data: str,
+                 llm_judgement: Optional[str], llm_reasoning: Optional[str], human_action: str,
+                 human_judgement: Optional[str], human_reasoning: Optional[str], annotation_type: Optional[str],
+                 evaluation_type: Optional[str], labels: Optional[str], metadata: Optional[str],
+                 created_at: str, updated_at: str):
+        self.id = id
+        self.task_hash = task_hash
+        self.file_hash = file_hash
+        self.filename = filename
+        self.dimension = dimension
+        self.case_id = case_id
+        self.browser_fingerprint = browser_fingerprint
+        self.account_name = account_name
+        self.original_data = original_data
+        self.llm_judgement = llm_judgement
+        self.llm_reasoning = llm_reasoning
+        self.human_action = human_action
+        self.human_judgement = human_judgement
+        self.human_reasoning = human_reasoning
+        self.annotation_type = annotation_type
+        self.evaluation_type = evaluation_type
+        self.labels = labels
+        self.metadata = metadata
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    _column_values = staticmethod(attrgetter(*__slots__))
+
+    def values(self) -> tuple:
+        """Column values in slot order"""
+        return self._column_values(self)
+
+    @classmethod
+    def from_mapping(cls, row: Mapping[str, Any]) -> "AnnotationRecord":
+        """Record of a stored row (e.g. read back from an archive)"""
+        return cls(*(row.get(column) for column in cls.__slots__))
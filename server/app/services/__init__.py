@@ -0,0 +1,63 @@
+from config.settings import settings
+from app.core.database import db
+from .backups import BackupInProgress, BackupManager
+from .csv_export import render_csv, safe_str
+from .export_jobs import ExportJob, ExportJobManager, ExportNotFound, render_changes
+from .maintenance import ArchiveNotFound, MaintenanceInProgress, MaintenanceManager, TaskChanged, TaskExists
+from app.storage import storage
+
+# Create export job manager instance
+export_jobs = ExportJobManager(
+    storage,
+    settings.EXPORT_DIR,
+    settings.EXPORT_CACHE_MAX_BYTES,
+    settings.EXPORT_JOB_TTL_SECONDS
+)
+
+# Create backup manager instance
+backups = BackupManager(
+    db,
+    settings.BACKUP_DIR,
+    settings.BACKUP_INTERVAL_SECONDS,
+    settings.BACKUP_RETENTION,
+    settings.BACKUP_PAGES_PER_STEP,
+    settings.BACKUP_STEP_SLEEP_MS,
+    settings.BACKUP_MAX_RESTARTS
+)
+
+# Create maintenance manager instance
+maintenance = MaintenanceManager(
+    db,
+    storage,
+    settings.MAINTENANCE_ARCHIVE_DIR,
+    settings.MAINTENANCE_INTERVAL_SECONDS,
+    settings.MAINTENANCE_WINDOW,
+    settings.MAINTENANCE_ARCHIVE_AFTER_DAYS,
+    settings.MAINTENANCE_ARCHIVE_FORMAT,
+    settings.MAINTENANCE_ARCHIVE_MAX_TASKS,
+    settings.MAINTENANCE_PAGES_PER_STEP,
+    settings.MAINTENANCE_STEP_SLEEP_MS,
+    settings.MAINTENANCE_MAX_PAGES_PER_RUN,
+    settings.MAINTENANCE_ANALYSIS_LIMIT,
+    settings.MAINTENANCE_CONVERT_AUTO_VACUUM,
+    settings.DB_BUSY_TIMEOUT_MS
+)
+
+__all__ = [
+    "BackupInProgress",
+    "BackupManager",
+    "backups",
+    "ArchiveNotFound",
+    "MaintenanceInProgress",
+    "MaintenanceManager",
+    "TaskChanged",
+    "TaskExists",
+    "maintenance",
+    "render_csv",
+    "safe_str",
+    "ExportJob",
+    "ExportJobManager",
+    "ExportNotFound",
+    "render_changes",
+    "export_jobs"
+]
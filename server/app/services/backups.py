@@ -0,0 +1,327 @@
+"""
+Online snapshots of the annotation databases
+
+Snapshots are taken while the service runs, in a worker thread, with SQLite's
+online backup API copying ``BACKUP_PAGES_PER_STEP`` pages at a time and pausing
+between steps so the disk isn't saturated. In WAL mode a backup step never
+blocks writers, but a write from another connection restarts the copy; when a
+busy database keeps restarting it, the snapshot falls back to ``VACUUM INTO``,
+which copies one consistent read snapshot instead.
+
+Each snapshot is a directory under ``BACKUP_DIR`` holding gzip-compressed,
+integrity-checked copies of every database file (the main database, plus the
+catalog and all shards in sharded mode). Old snapshots are pruned to
+``BACKUP_RETENTION``. A file lock keeps worker processes from snapshotting
+concurrently.
+
+Restore (with the service stopped):
+    python -m app.services.backups list
+    python -m app.services.backups restore <snapshot>
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+from app.core.logger import log
+from app.core.metrics import metrics
+
+backup_duration = metrics.histogram(
+    "backup_duration_seconds", "Duration of database snapshots",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+backup_size = metrics.gauge("backup_last_size_bytes", "Compressed size of the latest snapshot")
+backup_last_success = metrics.gauge("backup_last_success_timestamp", "Unix time of the latest successful snapshot")
+backup_failures = metrics.counter("backup_failures_total", "Failed snapshot attempts")
+
+SNAPSHOT_PREFIX = "snapshot-"
+
+
+class BackupRestarted(Exception):
+    """The online backup kept restarting because of concurrent writes"""
+
+
+class BackupInProgress(Exception):
+    """Another snapshot is already running (in this or another worker)"""
+
+
+def database_files(database) -> Dict[str, Path]:
+    """Every SQLite file of the store: the main database, plus the catalog and shards in sharded mode"""
+    files = {"annotations.db": Path(database.db_path)}
+    router = database.router
+    if router is not None:
+        files["catalog.db"] = Path(router.catalog.db_path)
+        for path in sorted(router.shard_dir.glob("*.db")):
+            if path.name != "catalog.db":
+                files[f"shards/{path.name}"] = path
+    return files
+
+
+def backup_file(source: Path, target: Path, pages_per_step: int, step_sleep: float, max_restarts: int) -> str:
+    """Copy one live SQLite file to ``target``; returns the method used"""
+    source_conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    try:
+        try:
+            remaining_seen = []
+
+            def progress(status, remaining, total):
+                # Remaining pages going up means the copy started over
+                if remaining_seen and remaining > remaining_seen[-1]:
+                    remaining_seen.append(None)
+                    if remaining_seen.count(None) > max_restarts:
+                        raise BackupRestarted(f"Backup of {source.name} restarted {max_restarts} times")
+                remaining_seen.append(remaining)
+
+            target_conn = sqlite3.connect(target)
+            try:
+                source_conn.backup(target_conn, pages=pages_per_step, progress=progress, sleep=step_sleep)
+            finally:
+                target_conn.close()
+            return "backup"
+        except BackupRestarted as e:
+            log.warning(f"{e}, falling back to VACUUM INTO")
+            target.unlink(missing_ok=True)
+            source_conn.execute("VACUUM INTO ?", (str(target),))
+            return "vacuum"
+    finally:
+        source_conn.close()
+
+
+def verify_file(path: Path):
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        raise RuntimeError(f"Snapshot of {path.name} failed integrity check: {result}")
+
+
+def compress_file(path: Path) -> Path:
+    target = path.with_name(path.name + ".gz")
+    with open(path, "rb") as source, gzip.open(target, "wb", compresslevel=6) as compressed:
+        shutil.copyfileobj(source, compressed, 1024 * 1024)
+    path.unlink()
+    return target
+
+
+class BackupManager:
+    def __init__(self, database, backup_dir: str, interval: float, retention: int,
+                 pages_per_step: int, step_sleep_ms: float, max_restarts: int):
+        self.database = database
+        self.backup_dir = Path(backup_dir)
+        self.interval = interval
+        self.retention = max(1, retention)
+        self.pages_per_step = max(1, pages_per_step)
+        self.step_sleep = max(0.0, step_sleep_ms) / 1000
+        self.max_restarts = max_restarts
+        self.running: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._scheduler: Optional[asyncio.Task] = None
+
+    def source_files(self) -> Dict[str, Path]:
+        """Database files to snapshot, by their name inside the snapshot"""
+        return database_files(self.database)
+
+    def list_snapshots(self) -> List[dict]:
+        snapshots = []
+        if not self.backup_dir.exists():
+            return snapshots
+        for path in sorted(self.backup_dir.glob(f"{SNAPSHOT_PREFIX}*"), reverse=True):
+            if not path.is_dir() or path.name.endswith(".tmp"):
+                continue
+            files = [file for file in path.rglob("*") if file.is_file()]
+            snapshots.append({
+                "name": path.name,
+                "createdAt": datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
+                "files": len(files),
+                "size": sum(file.stat().st_size for file in files),
+            })
+        return snapshots
+
+    def _snapshot(self, name: str) -> dict:
+        """Take a snapshot synchronously (runs in a worker thread)"""
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.backup_dir / ".lock", "w")
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise BackupInProgress("Another worker is taking a snapshot")
+
+            start = time.perf_counter()
+            work_dir = self.backup_dir / f"{name}.tmp"
+            shutil.rmtree(work_dir, ignore_errors=True)
+            methods = {}
+            for relative, source in self.source_files().items():
+                if not source.exists():
+                    continue
+                target = work_dir / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                methods[relative] = backup_file(
+                    source, target, self.pages_per_step, self.step_sleep, self.max_restarts
+                )
+                verify_file(target)
+                compress_file(target)
+            os.replace(work_dir, self.backup_dir / name)
+            self._prune()
+
+            duration = time.perf_counter() - start
+            files = [file for file in (self.backup_dir / name).rglob("*") if file.is_file()]
+            size = sum(file.stat().st_size for file in files)
+            backup_duration.observe(duration)
+            backup_size.set(size)
+            backup_last_success.set(time.time())
+            fallbacks = sum(1 for method in methods.values() if method == "vacuum")
+            log.info(f"Snapshot {name} completed in {duration:.1f}s: {len(files)} files, {size} bytes"
+                     + (f", {fallbacks} via VACUUM INTO" if fallbacks else ""))
+            return {"name": name, "files": len(files), "size": size, "durationSeconds": round(duration, 3)}
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _prune(self):
+        snapshots = sorted(path for path in self.backup_dir.glob(f"{SNAPSHOT_PREFIX}*")
+                           if path.is_dir() and not path.name.endswith(".tmp"))
+        for path in snapshots[:-self.retention]:
+            shutil.rmtree(path, ignore_errors=True)
+            log.info(f"Pruned snapshot {path.name}")
+
+    def _claim(self) -> str:
+        if self.running is not None:
+            raise BackupInProgress(f"Snapshot {self.running} is already running")
+        self.running = f"{SNAPSHOT_PREFIX}{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        return self.running
+
+    async def create_snapshot(self, name: Optional[str] = None) -> dict:
+        """Take a snapshot now and wait for it"""
+        name = name or self._claim()
+        try:
+            result = await asyncio.to_thread(self._snapshot, name)
+            self.last_error = None
+            return result
+        except BackupInProgress:
+            raise
+        except Exception as e:
+            backup_failures.inc()
+            self.last_error = str(e)
+            log.error(f"Snapshot {name} failed: {e}")
+            shutil.rmtree(self.backup_dir / f"{name}.tmp", ignore_errors=True)
+            raise
+        finally:
+            self.running = None
+
+    def start_snapshot(self) -> str:
+        """Start a snapshot in the background and return its name"""
+        name = self._claim()
+        self._task = asyncio.get_running_loop().create_task(self._run_quietly(name))
+        return name
+
+    async def _run_quietly(self, name: str):
+        try:
+            await self.create_snapshot(name)
+        except Exception:
+            pass  # Already logged and counted
+
+    def _latest_age(self) -> Optional[float]:
+        snapshots = self.list_snapshots()
+        if not snapshots:
+            return None
+        return time.time() - (self.backup_dir / snapshots[0]["name"]).stat().st_mtime
+
+    async def _schedule_loop(self):
+        while True:
+            # Workers share the directory, so the newest snapshot decides when the next one is due
+            age = await asyncio.to_thread(self._latest_age)
+            wait = self.interval if age is None else max(0.0, self.interval - age)
+            await asyncio.sleep(wait if age is not None else min(wait, 60.0))
+            age = await asyncio.to_thread(self._latest_age)
+            if age is not None and age < self.interval * 0.9:
+                continue
+            try:
+                await self.create_snapshot()
+            except BackupInProgress:
+                pass
+            except Exception:
+                pass  # Already logged; retry on the next interval
+
+    async def init(self):
+        if self.interval > 0:
+            self._scheduler = asyncio.get_running_loop().create_task(self._schedule_loop())
+
+    async def close(self):
+        for task in (self._scheduler, self._task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._scheduler = None
+        self._task = None
+
+
+def restore_snapshot(snapshot_dir: Path, database_path: Path, shard_dir: Optional[Path] = None):
+    """Replace the database files with a snapshot; the service must be stopped"""
+    for compressed in sorted(snapshot_dir.rglob("*.gz")):
+        relative = compressed.relative_to(snapshot_dir).as_posix()[:-len(".gz")]
+        if relative == "annotations.db":
+            target = database_path
+        elif shard_dir is not None and relative == "catalog.db":
+            target = shard_dir / "catalog.db"
+        elif shard_dir is not None and relative.startswith("shards/"):
+            target = shard_dir / relative[len("shards/"):]
+        else:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp = target.with_name(target.name + ".restore")
+        with gzip.open(compressed, "rb") as source, open(temp, "wb") as output:
+            shutil.copyfileobj(source, output, 1024 * 1024)
+        verify_file(temp)
+        for suffix in ("-wal", "-shm"):
+            Path(f"{target}{suffix}").unlink(missing_ok=True)
+        os.replace(temp, target)
+        print(f"Restored {relative} -> {target}")
+
+
+def main():
+    from config.settings import settings
+
+    parser = argparse.ArgumentParser(description="Manage database snapshots")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List snapshots")
+    restore = commands.add_parser("restore", help="Restore a snapshot (stop the service first)")
+    restore.add_argument("snapshot", help="Snapshot name, e.g. snapshot-20240101T000000")
+    args = parser.parse_args()
+
+    backup_dir = Path(settings.BACKUP_DIR)
+    if args.command == "list":
+        for path in sorted(backup_dir.glob(f"{SNAPSHOT_PREFIX}*"), reverse=True):
+            if path.is_dir() and not path.name.endswith(".tmp"):
+                print(path.name)
+        return
+
+    snapshot_dir = backup_dir / args.snapshot
+    if not snapshot_dir.is_dir():
+        sys.exit(f"Snapshot not found: {snapshot_dir}")
+    shard_dir = Path(settings.SHARD_DIR) if settings.STORAGE_MODE == "sharded" else None
+    restore_snapshot(snapshot_dir, Path(settings.DATABASE_PATH), shard_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+CSV rendering of annotation exports
+"""
+import csv
+import io
+
+from app.core.logger import log
+from app.utils import json_codec
+
+
+def safe_str(value):
+    """Convert value to safe string for CSV export"""
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json_codec.dumps(value)
+    # Convert to string and replace problematic characters
+    text = str(value)
+    # Replace common problematic characters that might cause encoding issues
+    text = text.replace("\x00", "")  # Remove null bytes
+    text = text.replace("\r\n", "\n")  # Normalize line endings
+    text = text.replace("\r", "\n")
+    return text
+
+
+def render_csv(rows) -> str:
+    """Render annotation rows (with original_data flattened into columns) as CSV text"""
+    # Prepare CSV data with UTF-8 encoding
+    output = io.StringIO()
+
+    # Define CSV headers
+    fieldnames = [
+        "case_id",
+        "browser_fingerprint",
+        "account_name",
+        "human_action",
+        "human_judgement",
+        "human_reasoning",
+        "llm_judgement",
+        "llm_reasoning",
+        "annotation_type",
+        "evaluation_type",
+        "dimension",
+        "created_at",
+        "updated_at",
+    ]
+
+    # Get all unique keys from original_data
+    all_original_keys = set()
+    for row in rows:
+        try:
+            original_data = json_codec.loads(row["original_data"])
+            all_original_keys.update(original_data.keys())
+        except json_codec.JSONDecodeError:
+            log.warning(
+                f"Could not parse original_data for row id: {row['id']}. Skipping original data keys for this row."
+            )
+            continue  # Continue to the next row if JSON parsing fails
+
+    # Add original data keys to fieldnames, ensure they are sorted for consistent column order
+    fieldnames.extend(sorted(all_original_keys))
+
+    # Use UTF-8 compatible CSV writer
+    # csv.writer automatically handles UTF-8 when using io.StringIO
+    writer = csv.DictWriter(output, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+    writer.writeheader()
+
+    # Write data rows
+    for row in rows:
+        # Parse JSON fields, handling potential errors
+        original_data = {}
+        try:
+            original_data = json_codec.loads(row["original_data"])
+        except json_codec.JSONDecodeError:
+            log.warning(f"Could not parse original_data for row id: {row['id']}. Using empty dict.")
+
+        # Create row dict with safe string handling for all fields
+        row_dict = {
+            "case_id": safe_str(row["case_id"]),
+            "browser_fingerprint": safe_str(row["browser_fingerprint"]),
+            "account_name": safe_str(row["account_name"]),
+            "human_action": safe_str(row["human_action"]),
+            "human_judgement": safe_str(row["human_judgement"]),
+            "human_reasoning": safe_str(row["human_reasoning"]),
+            "llm_judgement": safe_str(row["llm_judgement"]),
+            "llm_reasoning": safe_str(row["llm_reasoning"]),
+            "annotation_type": safe_str(row["annotation_type"]),
+            "evaluation_type": safe_str(row["evaluation_type"]),
+            "dimension": safe_str(row["dimension"]),
+            "created_at": safe_str(row["created_at"]),
+            "updated_at": safe_str(row["updated_at"]),
+        }
+
+        # Add original data fields with safe encoding
+        for key in all_original_keys:
+            value = original_data.get(key, "")
+            row_dict[key] = safe_str(value)
+
+        writer.writerow(row_dict)
+
+    # Get CSV content
+    csv_content = output.getvalue()
+    output.close()
+    return csv_content
@@ -0,0 +1,290 @@
+"""
+Background export jobs with cached artifacts
+
+Rendering an export is expensive, so finished artifacts are kept on disk under
+``EXPORT_DIR``, keyed by ``(task_hash, format, data version)``. The data version
+(row count and highest change sequence) changes whenever a task's rows change,
+so an unchanged task is served straight from its cached file; concurrent
+requests for the same key share one job. Writing an artifact removes the ones
+of strictly older versions of the task (the sequence is in the file name), so
+a slow render of old data never deletes a newer artifact.
+The cache is bounded by ``EXPORT_CACHE_MAX_BYTES`` with least-recently-used
+eviction. Artifacts are written atomically, so worker processes can share the
+directory. Job ids are the artifact file names, so any worker can report and
+serve a finished job from disk; pending jobs are only known to the worker
+rendering them.
+"""
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app.core.logger import log
+from app.core.metrics import export_bytes_total, metrics
+from app.storage import storage
+from app.utils import calculate_task_hash
+
+from .csv_export import render_csv
+
+export_jobs_total = metrics.counter("export_jobs_total", "Export requests by cache outcome", ("outcome",))
+export_cache_bytes = metrics.gauge("export_cache_bytes", "Bytes held in the export artifact cache")
+
+ARTIFACT_SUFFIXES = {"csv": ".csv"}
+
+ArtifactKey = Tuple[str, str, str]  # (task_hash, format, data version)
+
+# Artifact file stem: task hash, highest change sequence and key digest
+JOB_ID_PATTERN = re.compile(r"[0-9a-f]{64}_[0-9]+_[0-9a-f]{32}")
+
+
+class ExportNotFound(Exception):
+    """The task has no annotations to export"""
+
+
+class ExportJob:
+    def __init__(self, job_id: str, key: ArtifactKey, file_hash: Optional[str], dimension: Optional[str],
+                 watermark: Optional[int]):
+        self.id = job_id
+        self.key = key
+        self.watermark = watermark
+        self.file_hash = file_hash
+        self.dimension = dimension
+        self.status = "pending"
+        self.path: Optional[Path] = None
+        self.size: Optional[int] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+        self.finished_monotonic: Optional[float] = None
+        self.done = asyncio.Event()
+
+    @classmethod
+    def from_artifact(cls, job_id: str, format: str, path: Path, size: int) -> "ExportJob":
+        """A finished job found on disk, rendered by another worker (task details are unknown here)"""
+        job = cls(job_id, (job_id.split("_", 1)[0], format, None), None, None, None)
+        job.created_at = datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+        job.finish(path, size)
+        return job
+
+    @property
+    def format(self) -> str:
+        return self.key[1]
+
+    def finish(self, path: Path, size: int):
+        self.status = "completed"
+        self.path = path
+        self.size = size
+        self._mark_done()
+
+    def fail(self, error: str):
+        self.status = "failed"
+        self.error = error
+        self._mark_done()
+
+    def _mark_done(self):
+        self.finished_at = datetime.now().isoformat()
+        self.finished_monotonic = time.monotonic()
+        self.done.set()
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "fileHash": self.file_hash,
+            "dimension": self.dimension,
+            "format": self.format,
+            "dataVersion": self.key[2],
+            "watermark": self.watermark,
+            "size": self.size,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at,
+        }
+
+
+async def render_changes(file_hash: str, dimension: Optional[str], since: int) -> Tuple[bytes, int]:
+    """
+    Render only rows written after change sequence ``since``.
+
+    Returns the CSV payload and the new watermark (the highest sequence included,
+    or ``since`` when nothing changed). Reads go through the (task_hash, seq)
+    index, so the cost follows the number of changes, not the task size.
+    """
+    task_hash = calculate_task_hash(file_hash, dimension)
+    rows = await storage.get_changed_rows(file_hash, task_hash, since)
+    watermark = max((int(row["seq"]) for row in rows), default=since)
+    payload = await asyncio.to_thread(lambda: render_csv(rows).encode("utf-8-sig"))
+    export_bytes_total.inc(len(payload), format="csv")
+    export_jobs_total.inc(outcome="incremental")
+    return payload, watermark
+
+
+def artifact_seq(path: Path) -> Optional[int]:
+    """Highest change sequence of the data in an artifact (None for names without one)"""
+    parts = path.name.split("_")
+    return int(parts[1]) if len(parts) == 3 and parts[1].isdigit() else None
+
+
+class ExportJobManager:
+    def __init__(self, storage, artifact_dir: str, max_bytes: int, job_ttl: float):
+        self.artifact_dir = Path(artifact_dir)
+        self.storage = storage
+        self.max_bytes = max_bytes
+        self.job_ttl = job_ttl
+        self._jobs: Dict[str, ExportJob] = {}
+        self._active: Dict[ArtifactKey, ExportJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._last_access: Dict[Path, float] = {}
+
+    async def init(self):
+        self.artifact_dir.mkdir(parents=True, exist_ok=True)
+        # Partial writes left behind by a crash
+        for leftover in self.artifact_dir.glob("*.tmp"):
+            leftover.unlink(missing_ok=True)
+        await asyncio.to_thread(self._evict, None)
+
+    def artifact_path(self, key: ArtifactKey) -> Path:
+        digest = hashlib.sha256("\0".join(key).encode("utf-8")).hexdigest()[:32]
+        seq = int(key[2].split(":")[1])
+        return self.artifact_dir / f"{key[0]}_{seq}_{digest}{ARTIFACT_SUFFIXES[key[1]]}"
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        job = self._jobs.get(job_id)
+        if job is not None or not JOB_ID_PATTERN.fullmatch(job_id):
+            return job
+        # Jobs finished by another worker are found through their artifact
+        for format, suffix in ARTIFACT_SUFFIXES.items():
+            path = self.artifact_dir / f"{job_id}{suffix}"
+            try:
+                size = path.stat().st_size
+            except FileNotFoundError:
+                continue
+            return ExportJob.from_artifact(job_id, format, path, size)
+        return None
+
+    async def submit(self, file_hash: str, dimension: Optional[str], format: str = "csv") -> ExportJob:
+        """Return a job for the current data of a task, reusing cached or in-flight work"""
+        self._prune_jobs()
+        task_hash = calculate_task_hash(file_hash, dimension)
+        version = await self.storage.get_task_version(file_hash, task_hash)
+        if version is None:
+            raise ExportNotFound("No annotations found for this task")
+        key = (task_hash, format, f"{version['row_count']}:{version['max_seq']}")
+
+        job = self._active.get(key)
+        if job is not None:
+            export_jobs_total.inc(outcome="shared")
+            return job
+
+        path = self.artifact_path(key)
+        job = ExportJob(path.stem, key, file_hash, dimension, version["max_seq"])
+        self._jobs[job.id] = job
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            size = None
+        if size is not None:
+            export_jobs_total.inc(outcome="cached")
+            self._last_access[path] = time.time()
+            job.finish(path, size)
+            return job
+
+        export_jobs_total.inc(outcome="rendered")
+        self._active[key] = job
+        self._tasks[job.id] = asyncio.get_running_loop().create_task(self._run(job))
+        return job
+
+    async def wait(self, job: ExportJob) -> ExportJob:
+        await job.done.wait()
+        return job
+
+    async def _run(self, job: ExportJob):
+        task_hash, format, _ = job.key
+        path = self.artifact_path(job.key)
+        try:
+            job.status = "running"
+            rows = await self.storage.get_export_rows(job.file_hash, task_hash)
+            if not rows:
+                raise ExportNotFound("No annotations found for this task")
+            size = await asyncio.to_thread(self._write_artifact, rows, path)
+            export_bytes_total.inc(size, format=format)
+            self._last_access[path] = time.time()
+            job.finish(path, size)
+            log.info(f"Export artifact ready: task={task_hash}, size={size}")
+            await asyncio.to_thread(self._evict, path)
+        except asyncio.CancelledError:
+            job.fail("Export was cancelled")
+            raise
+        except Exception as e:
+            log.error(f"Export job {job.id} failed: {e}")
+            job.fail(str(e))
+        finally:
+            self._active.pop(job.key, None)
+            self._tasks.pop(job.id, None)
+
+    def _write_artifact(self, rows, path: Path) -> int:
+        payload = render_csv(rows).encode("utf-8-sig")
+        temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "wb") as file:
+            file.write(payload)
+        os.replace(temp_path, path)
+        # Artifacts of older data versions of this task can never be served again; newer ones (written
+        # meanwhile by a faster job here or in another worker) stay
+        seq = artifact_seq(path)
+        for stale in self.artifact_dir.glob(f"{path.name.split('_', 1)[0]}_*{path.suffix}"):
+            stale_seq = artifact_seq(stale)
+            if stale != path and (stale_seq is None or stale_seq < seq):
+                stale.unlink(missing_ok=True)
+                self._last_access.pop(stale, None)
+        return len(payload)
+
+    def _evict(self, keep: Optional[Path]):
+        """Delete least recently used artifacts until the cache fits its budget"""
+        entries = []
+        for path in self.artifact_dir.iterdir():
+            if path.suffix == ".tmp":
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            last_used = max(stat.st_mtime, self._last_access.get(path, 0))
+            entries.append((last_used, path, stat.st_size))
+
+        total = sum(size for _, _, size in entries)
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            path.unlink(missing_ok=True)
+            self._last_access.pop(path, None)
+            total -= size
+            log.debug("Evicted export artifact {}", path.name)
+        export_cache_bytes.set(total)
+
+    def _prune_jobs(self):
+        """Forget finished jobs older than the job TTL"""
+        cutoff = time.monotonic() - self.job_ttl
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_monotonic is not None and job.finished_monotonic < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        for task in list(self._tasks.values()):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks.clear()
+        self._active.clear()
@@ -0,0 +1,537 @@
+"""
+Retention, archival and compaction of the annotation databases
+
+A maintenance run does two things, in a low-traffic window
+(``MAINTENANCE_WINDOW``, local time) and within an I/O budget:
+
+* archival: tasks (``file_hash``) without writes for
+  ``MAINTENANCE_ARCHIVE_AFTER_DAYS`` are streamed into a compressed columnar
+  file under ``MAINTENANCE_ARCHIVE_DIR``, read back and counted, and only then
+  removed from the live store by ``delete_archived_task``: one conditional
+  delete that only matches while the row count and last update still equal the
+  archived ones (shards and throughput rollups stay). A task written to while
+  it is being archived is left alone until the next run.
+* compaction: free pages of every database file are returned to the
+  filesystem with ``PRAGMA incremental_vacuum``, ``MAINTENANCE_PAGES_PER_STEP``
+  pages at a time with a pause between steps and at most
+  ``MAINTENANCE_MAX_PAGES_PER_RUN`` pages per run, then planner statistics
+  are refreshed with ``ANALYZE`` (first run) or ``PRAGMA optimize``, both
+  sampling at most ``MAINTENANCE_ANALYSIS_LIMIT`` rows per index.
+
+Archives are Parquet (zstd) when ``pyarrow`` is installed, otherwise gzip
+JSON lines holding one column-oriented chunk per line. Each archive has a
+``.json`` manifest next to it. Databases created by this version use
+``auto_vacuum = INCREMENTAL``; older ones need a one-time full ``VACUUM`` to
+switch, which runs in the window when ``MAINTENANCE_CONVERT_AUTO_VACUUM`` is
+set.
+
+List and restore archives with the admin API (``/api/admin/archives``). A
+restore writes the whole task in one transaction and leaves the kept rollups
+as they were. Archive, restore, retire and maintenance runs hold one claim
+(a file lock shared by all workers), so they never overlap.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+from app.core.dispatcher import dispatcher
+from app.core.logger import log
+from app.core.metrics import metrics
+from app.models import AnnotationRecord
+from app.services.backups import database_files
+from app.storage.base import ANNOTATION_COLUMNS
+from app.utils.json_codec import dumps_bytes, loads
+
+maintenance_duration = metrics.histogram(
+    "maintenance_duration_seconds", "Duration of maintenance runs",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+maintenance_last_success = metrics.gauge(
+    "maintenance_last_success_timestamp", "Unix time of the latest successful maintenance run"
+)
+maintenance_failures = metrics.counter("maintenance_failures_total", "Failed maintenance runs")
+archived_tasks = metrics.counter("maintenance_archived_tasks_total", "Tasks archived and removed from the live store")
+archived_rows = metrics.counter("maintenance_archived_rows_total", "Annotations written to archives")
+reclaimed_pages = metrics.counter("maintenance_reclaimed_pages_total", "Database pages returned by incremental vacuum")
+
+ARCHIVE_FORMATS = {"parquet": ".parquet", "jsonl": ".jsonl.gz"}
+INTEGER_COLUMNS = {"case_id", "seq"}
+ARCHIVE_BATCH_SIZE = 1000
+INCREMENTAL = 2  # PRAGMA auto_vacuum value
+
+
+class MaintenanceInProgress(Exception):
+    """A maintenance run or archive is already running (in this or another worker)"""
+
+
+class TaskChanged(Exception):
+    """The task was written to while it was being archived"""
+
+
+class TaskExists(Exception):
+    """The archived task is still (or again) in the live store"""
+
+
+class ArchiveNotFound(Exception):
+    """No archive with this name"""
+
+
+def parse_window(spec: str) -> Optional[Tuple[int, int]]:
+    """Parse "HH:MM-HH:MM" into minutes after midnight (None = always open)"""
+    if not spec.strip():
+        return None
+    try:
+        start, end = spec.split("-")
+        minutes = []
+        for part in (start, end):
+            hours, mins = part.strip().split(":")
+            minutes.append(int(hours) * 60 + int(mins))
+    except ValueError:
+        raise ValueError(f"Invalid maintenance window {spec!r}, expected HH:MM-HH:MM")
+    return minutes[0], minutes[1]
+
+
+def in_window(window: Optional[Tuple[int, int]], now: datetime) -> bool:
+    if window is None:
+        return True
+    start, end = window
+    minute = now.hour * 60 + now.minute
+    if start <= end:
+        return start <= minute < end
+    return minute >= start or minute < end  # Window across midnight
+
+
+def archive_format(preferred: str) -> str:
+    """Format actually used for new archives"""
+    if preferred in ("auto", "parquet"):
+        try:
+            import pyarrow  # noqa: F401
+            return "parquet"
+        except ImportError:  # Optional dependency
+            if preferred == "parquet":
+                log.warning("MAINTENANCE_ARCHIVE_FORMAT=parquet but pyarrow is not installed, using jsonl")
+    return "jsonl"
+
+
+class ParquetWriter:
+    def __init__(self, path: Path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([
+            (column, pa.int64() if column in INTEGER_COLUMNS else pa.string()) for column in ANNOTATION_COLUMNS
+        ])
+        self._writer = pq.ParquetWriter(str(path), self.schema, compression="zstd")
+
+    def write(self, rows: List[Dict[str, Any]]):
+        # Each batch becomes one row group
+        self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+class JsonLinesWriter:
+    """Gzip JSON lines, one {column: [values]} chunk per line"""
+
+    def __init__(self, path: Path):
+        self._file = gzip.open(path, "wb", compresslevel=6)
+
+    def write(self, rows: List[Dict[str, Any]]):
+        chunk = {column: [row[column] for row in rows] for column in ANNOTATION_COLUMNS}
+        self._file.write(dumps_bytes(chunk) + b"\n")
+
+    def close(self):
+        self._file.close()
+
+
+def open_writer(fmt: str, path: Path):
+    return ParquetWriter(path) if fmt == "parquet" else JsonLinesWriter(path)
+
+
+def read_archive(path: Path, batch_size: int = ARCHIVE_BATCH_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """Yield the rows of an archive in batches"""
+    if path.name.endswith(ARCHIVE_FORMATS["parquet"]):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(str(path)).iter_batches(batch_size=batch_size):
+            yield batch.to_pylist()
+        return
+    with gzip.open(path, "rb") as file:
+        for line in file:
+            chunk = loads(line)
+            columns = list(chunk)
+            yield [dict(zip(columns, values)) for values in zip(*chunk.values())]
+
+
+def count_archive_rows(path: Path) -> int:
+    if path.name.endswith(ARCHIVE_FORMATS["parquet"]):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(str(path)).metadata.num_rows
+    return sum(len(rows) for rows in read_archive(path))
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compact_file(path: Path, max_pages: int, pages_per_step: int, step_sleep: float,
+                 analysis_limit: int, convert: bool, busy_timeout: float) -> Dict[str, Any]:
+    """Reclaim free pages of one database file and refresh its statistics"""
+    conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None)
+    try:
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        reclaimed, method = 0, None
+        if auto_vacuum == INCREMENTAL:
+            free = free_before
+            while free > 0 and reclaimed < max_pages:
+                # The pragma frees one page per step of the statement, so run it to completion
+                conn.execute(f"PRAGMA incremental_vacuum({min(pages_per_step, max_pages - reclaimed)})").fetchall()
+                remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if remaining >= free:
+                    break
+                reclaimed += free - remaining
+                free = remaining
+                time.sleep(step_sleep)
+            method = "incremental" if reclaimed else None
+        elif convert and free_before > 0:
+            # One-time rebuild; blocks writers for its duration, hence the window
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            reclaimed, method = free_before, "vacuum"
+
+        conn.execute(f"PRAGMA analysis_limit = {int(analysis_limit)}")
+        analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is not None
+        conn.execute("PRAGMA optimize" if analyzed else "ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        return {
+            "freePagesBefore": free_before,
+            "freePagesAfter": conn.execute("PRAGMA freelist_count").fetchone()[0],
+            "reclaimedPages": reclaimed,
+            "method": method,
+            "incremental": auto_vacuum == INCREMENTAL or method == "vacuum",
+        }
+    finally:
+        conn.close()
+
+
+class MaintenanceManager:
+    def __init__(self, database, storage, archive_dir: str, interval: float, window: str,
+                 archive_after_days: float, archive_format: str, archive_max_tasks: int,
+                 pages_per_step: int, step_sleep_ms: float, max_pages_per_run: int,
+                 analysis_limit: int, convert_auto_vacuum: bool, busy_timeout_ms: float):
+        self.database = database
+        self.storage = storage
+        self.archive_dir = Path(archive_dir)
+        self.interval = interval
+        self.window_spec = window
+        self.window = parse_window(window)
+        self.archive_after_days = archive_after_days
+        self.preferred_format = archive_format
+        self.archive_max_tasks = max(1, archive_max_tasks)
+        self.pages_per_step = max(1, pages_per_step)
+        self.step_sleep = max(0.0, step_sleep_ms) / 1000
+        self.max_pages_per_run = max(0, max_pages_per_run)
+        self.analysis_limit = analysis_limit
+        self.convert_auto_vacuum = convert_auto_vacuum
+        self.busy_timeout = busy_timeout_ms / 1000
+        self.running: Optional[str] = None
+        self.last_run: Optional[dict] = None
+        self.last_error: Optional[str] = None
+        self._lock_file = None
+        self._task: Optional[asyncio.Task] = None
+        self._scheduler: Optional[asyncio.Task] = None
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "lastRun": self.last_run,
+            "lastError": self.last_error,
+            "intervalSeconds": self.interval,
+            "window": self.window_spec or None,
+            "inWindow": in_window(self.window, datetime.now()),
+            "archiveAfterDays": self.archive_after_days,
+        }
+
+    # Claiming (one maintenance job at a time, across workers)
+
+    def _claim(self, name: str):
+        if self.running is not None:
+            raise MaintenanceInProgress(f"{self.running} is already running")
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.archive_dir / ".lock", "w")
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock_file.close()
+                raise MaintenanceInProgress("Another worker is running maintenance")
+        self._lock_file = lock_file
+        self.running = name
+
+    def _release(self):
+        if self._lock_file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+        self.running = None
+
+    # Archival
+
+    def list_archives(self) -> List[dict]:
+        archives = []
+        if not self.archive_dir.exists():
+            return archives
+        for path in self.archive_dir.glob("*.json"):
+            try:
+                archives.append(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError) as e:
+                log.warning(f"Unreadable archive manifest {path.name}: {e}")
+        archives.sort(key=lambda manifest: manifest.get("archivedAt", ""), reverse=True)
+        return archives
+
+    async def _task_summary(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        return next((row for row in await self.storage.list_tasks() if row["file_hash"] == file_hash), None)
+
+    async def _archive(self, file_hash: str) -> Optional[dict]:
+        fmt = archive_format(self.preferred_format)
+        name = f"{file_hash}-{datetime.now().strftime('%Y%m%dT%H%M%S')}"
+        path = self.archive_dir / f"{name}{ARCHIVE_FORMATS[fmt]}"
+        temp = path.with_name(path.name + ".tmp")
+        start = time.perf_counter()
+        rows, last_updated, first_created = 0, None, None
+        dimensions, task_hashes = set(), set()
+        writer = await asyncio.to_thread(open_writer, fmt, temp)
+        try:
+            try:
+                async for batch in self.storage.iter_task_rows(file_hash, ARCHIVE_BATCH_SIZE):
+                    await asyncio.to_thread(writer.write, batch)
+                    rows += len(batch)
+                    for row in batch:
+                        dimensions.add(row["dimension"])
+                        task_hashes.add(row["task_hash"])
+                        if last_updated is None or (row["updated_at"] or "") > last_updated:
+                            last_updated = row["updated_at"]
+                        if first_created is None or (row["created_at"] or "") < first_created:
+                            first_created = row["created_at"]
+                    await asyncio.sleep(self.step_sleep)
+            finally:
+                await asyncio.to_thread(writer.close)
+            if rows == 0:
+                temp.unlink(missing_ok=True)
+                return None
+
+            stored = await asyncio.to_thread(count_archive_rows, temp)
+            if stored != rows:
+                raise RuntimeError(f"Archive of {file_hash} holds {stored} rows, expected {rows}")
+            os.replace(temp, path)
+            manifest = {
+                "name": name,
+                "file": path.name,
+                "fileHash": file_hash,
+                "format": fmt,
+                "rows": rows,
+                "dimensions": sorted(dimension or "" for dimension in dimensions),
+                "taskHashes": sorted(task_hashes),
+                "firstCreated": first_created,
+                "lastUpdated": last_updated,
+                "archivedAt": datetime.now().isoformat(),
+                "size": path.stat().st_size,
+                "sha256": await asyncio.to_thread(file_digest, path),
+            }
+            (self.archive_dir / f"{name}.json").write_text(
+                json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8"
+            )
+        except BaseException:
+            temp.unlink(missing_ok=True)
+            raise
+
+        # The archive is on disk; rows go only if nothing was written since they were read
+        if not await self.storage.delete_archived_task(file_hash, rows, last_updated):
+            for stale in (path, self.archive_dir / f"{name}.json"):
+                stale.unlink(missing_ok=True)
+            raise TaskChanged(f"Task {file_hash} changed while it was being archived")
+        # Queues are keyed by task hash, so rebuild them all from storage
+        dispatcher.clear()
+        archived_tasks.inc()
+        archived_rows.inc(rows)
+        log.info(f"Archived task {file_hash}: {rows} rows to {path.name} ({manifest['size']} bytes) "
+                 f"in {time.perf_counter() - start:.1f}s")
+        return manifest
+
+    async def archive_task(self, file_hash: str) -> Optional[dict]:
+        """Archive one task now and remove it from the live store; None if it has no rows"""
+        self._claim(f"archive of {file_hash}")
+        try:
+            return await self._archive(file_hash)
+        finally:
+            self._release()
+
+    async def restore_archive(self, name: str) -> dict:
+        """Load an archive back into the live store, all rows or none"""
+        manifest = next((item for item in self.list_archives() if item.get("name") == name), None)
+        if manifest is None:
+            raise ArchiveNotFound(f"Archive not found: {name}")
+        path = self.archive_dir / manifest["file"]
+        if not path.exists():
+            raise ArchiveNotFound(f"Archive file missing: {manifest['file']}")
+        file_hash = manifest["fileHash"]
+
+        # Claimed like an archive, so the task can't be archived or retired halfway through
+        self._claim(f"restore of {name}")
+        try:
+            if await self._task_summary(file_hash) is not None:
+                raise TaskExists(f"Task {file_hash} is live; retire it before restoring")
+            records = await asyncio.to_thread(
+                lambda: [AnnotationRecord.from_mapping(row) for batch in read_archive(path) for row in batch]
+            )
+            await self.storage.restore_archived_task(file_hash, records)
+        finally:
+            self._release()
+        dispatcher.clear()
+        log.info(f"Restored archive {name}: {len(records)} rows")
+        return {"name": name, "fileHash": file_hash, "rows": len(records)}
+
+    async def retire_task(self, file_hash: str) -> bool:
+        """Permanently delete a task and its rollups; returns whether it existed"""
+        self._claim(f"retire of {file_hash}")
+        try:
+            removed = await self.storage.delete_task(file_hash)
+        finally:
+            self._release()
+        # Queues are keyed by task hash, so rebuild them all from storage
+        dispatcher.clear()
+        return removed
+
+    async def _archive_due(self, force: bool) -> List[dict]:
+        if self.archive_after_days <= 0:
+            return []
+        cutoff = (datetime.now() - timedelta(days=self.archive_after_days)).isoformat()
+        due = sorted(
+            (row for row in await self.storage.list_tasks() if row["last_updated"] and row["last_updated"] < cutoff),
+            key=lambda row: row["last_updated"],
+        )[:self.archive_max_tasks]
+        archived = []
+        for row in due:
+            if not force and not in_window(self.window, datetime.now()):
+                log.info("Maintenance window closed, deferring remaining archives")
+                break
+            try:
+                manifest = await self._archive(row["file_hash"])
+            except TaskChanged as e:
+                log.info(f"{e}, retrying on the next run")
+                continue
+            if manifest is not None:
+                archived.append({"fileHash": manifest["fileHash"], "name": manifest["name"], "rows": manifest["rows"]})
+        return archived
+
+    # Compaction
+
+    async def _compact(self, force: bool) -> List[dict]:
+        results = []
+        budget = self.max_pages_per_run
+        for relative, path in database_files(self.database).items():
+            if not path.exists():
+                continue
+            if not force and not in_window(self.window, datetime.now()):
+                log.info("Maintenance window closed, deferring remaining compaction")
+                break
+            result = await asyncio.to_thread(
+                compact_file, path, budget, self.pages_per_step, self.step_sleep,
+                self.analysis_limit, self.convert_auto_vacuum, self.busy_timeout,
+            )
+            if result["method"] == "incremental":
+                budget = max(0, budget - result["reclaimedPages"])
+            reclaimed_pages.inc(result["reclaimedPages"])
+            results.append({"file": relative, **result})
+        return results
+
+    async def run(self, force: bool = False) -> dict:
+        """Archive due tasks, then compact; ``force`` ignores the window"""
+        self._claim("maintenance run")
+        return await self._run(force)
+
+    async def _run(self, force: bool) -> dict:
+        start = time.perf_counter()
+        try:
+            archived = await self._archive_due(force)
+            compacted = await self._compact(force)
+            duration = time.perf_counter() - start
+            result = {
+                "finishedAt": datetime.now().isoformat(),
+                "durationSeconds": round(duration, 3),
+                "archived": archived,
+                "compacted": compacted,
+            }
+            self.last_run = result
+            self.last_error = None
+            maintenance_duration.observe(duration)
+            maintenance_last_success.set(time.time())
+            reclaimed = sum(item["reclaimedPages"] for item in compacted)
+            log.info(f"Maintenance completed in {duration:.1f}s: {len(archived)} tasks archived, "
+                     f"{reclaimed} pages reclaimed over {len(compacted)} files")
+            return result
+        except Exception as e:
+            maintenance_failures.inc()
+            self.last_error = str(e)
+            log.error(f"Maintenance run failed: {e}")
+            raise
+        finally:
+            self._release()
+
+    def start_run(self, force: bool = True):
+        """Start a run in the background"""
+        self._claim("maintenance run")
+        self._task = asyncio.get_running_loop().create_task(self._run_quietly(force))
+
+    async def _run_quietly(self, force: bool):
+        try:
+            await self._run(force)
+        except Exception:
+            pass  # Already logged and counted
+
+    async def _schedule_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if not in_window(self.window, datetime.now()):
+                continue
+            try:
+                self._claim("maintenance run")
+            except MaintenanceInProgress:
+                continue
+            await self._run_quietly(force=False)
+
+    async def init(self):
+        if self.interval > 0:
+            self._scheduler = asyncio.get_running_loop().create_task(self._schedule_loop())
+
+    async def close(self):
+        for task in (self._scheduler, self._task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._scheduler = None
+        self._task = None
@@ -0,0 +1,26 @@
+from config.settings import settings
+from app.core.database import db
+from .base import StorageBackend, ANNOTATION_COLUMNS, EXPORT_COLUMNS
+from .sqlite_backend import SQLiteBackend
+
+def create_storage(backend: str) -> StorageBackend:
+    """Build the configured storage backend on top of the SQLite store"""
+    sqlite_backend = SQLiteBackend(db)
+    if backend == "sqlite":
+        return sqlite_backend
+    if backend == "duckdb":
+        from .duckdb_backend import DuckDBBackend
+        return DuckDBBackend(sqlite_backend, settings.DUCKDB_PATH, settings.ANALYTICS_SYNC_INTERVAL)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+# Create storage instance
+storage = create_storage(settings.STORAGE_BACKEND)
+
+__all__ = [
+    "StorageBackend",
+    "SQLiteBackend",
+    "ANNOTATION_COLUMNS",
+    "EXPORT_COLUMNS",
+    "create_storage",
+    "storage"
+]
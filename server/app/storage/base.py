@@ -0,0 +1,132 @@
+"""
+Storage backend interface
+
+API modules talk to a StorageBackend instead of issuing SQL themselves, so the
+transactional store (SQLite) and analytical engines (DuckDB) are swappable.
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from app.models import AnnotationRecord
+
+# Groupings of throughput rollups, in output order
+THROUGHPUT_GROUP_BY = ("annotator", "dimension")
+
+# Columns of an annotation record, in table order
+ANNOTATION_COLUMNS = [
+    "id",
+    "task_hash",
+    "file_hash",
+    "filename",
+    "dimension",
+    "case_id",
+    "browser_fingerprint",
+    "account_name",
+    "original_data",
+    "llm_judgement",
+    "llm_reasoning",
+    "human_action",
+    "human_judgement",
+    "human_reasoning",
+    "annotation_type",
+    "evaluation_type",
+    "labels",
+    "metadata",
+    "created_at",
+    "updated_at",
+    "seq",
+]
+
+# Columns supplied by an annotation record (in AnnotationRecord.values() order); seq is assigned by the store on every write
+RECORD_COLUMNS = list(AnnotationRecord.__slots__)
+
+# Columns returned for exports
+EXPORT_COLUMNS = [column for column in ANNOTATION_COLUMNS if column != "metadata"]
+
+
+class StorageBackend(ABC):
+    name = ""
+
+    async def init(self):
+        """Prepare the backend (schema, background sync, ...)"""
+
+    async def close(self):
+        """Release connections and stop background work"""
+
+    # Writes
+
+    @abstractmethod
+    async def upsert_annotation(self, record: AnnotationRecord) -> None:
+        """Insert an annotation, or update the verdict of an existing (task, case, annotator) one;
+        either way the row gets the next change sequence of its task"""
+
+    @abstractmethod
+    async def upsert_annotations(self, records: List[AnnotationRecord]) -> None:
+        """Upsert several annotations of one file atomically (all or none are stored)"""
+
+    @abstractmethod
+    async def delete_task(self, file_hash: str) -> bool:
+        """Delete all annotations of a file; returns whether anything was removed"""
+
+    @abstractmethod
+    async def delete_archived_task(self, file_hash: str, row_count: int, last_updated: Optional[str]) -> bool:
+        """Delete the annotations of an archived file, keeping its throughput rollups, but only if the file
+        still has ``row_count`` rows last updated at ``last_updated``; returns whether they were deleted"""
+
+    @abstractmethod
+    async def restore_archived_task(self, file_hash: str, records: List[AnnotationRecord]) -> None:
+        """Write back every annotation of an archived file atomically, leaving its (kept) rollups unchanged"""
+
+    @abstractmethod
+    async def read_change_log(self, file_hash: Optional[str], since: int, limit: int) -> List[Dict[str, Any]]:
+        """Return change log entries after sequence ``since`` (optionally for one file), oldest first"""
+
+    # Reads
+
+    @abstractmethod
+    async def get_progress(self, file_hash: str, task_hash: str, fingerprint: Optional[str]) -> Dict[str, Any]:
+        """Return annotated case IDs (sorted) and the highest case ID seen for the task"""
+
+    @abstractmethod
+    async def get_case_annotators(self, file_hash: str, task_hash: str) -> List[Tuple[int, str]]:
+        """Return (case_id, browser_fingerprint) of every stored annotation of a task"""
+
+    @abstractmethod
+    async def get_dimensions(self, file_hash: str) -> List[Dict[str, Any]]:
+        """Return per-dimension annotation counts and first/last annotation times"""
+
+    @abstractmethod
+    async def get_stats(self, file_hash: str, dimension: Optional[str]) -> Dict[str, Any]:
+        """Return overall action counts and the per-annotator breakdown"""
+
+    @abstractmethod
+    async def get_export_rows(self, file_hash: str, task_hash: str) -> List[Mapping[str, Any]]:
+        """Return EXPORT_COLUMNS rows of a task ordered by case and creation time"""
+
+    @abstractmethod
+    async def get_changed_rows(self, file_hash: str, task_hash: str, since: int) -> List[Mapping[str, Any]]:
+        """Return EXPORT_COLUMNS rows of a task written after change sequence ``since``, in seq order"""
+
+    @abstractmethod
+    async def get_task_version(self, file_hash: str, task_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the task's row count and highest change sequence (None if it has no rows)"""
+
+    @abstractmethod
+    async def get_throughput(self, file_hash: str, dimension: Optional[str], granularity: str,
+                             start: Optional[datetime], end: Optional[datetime],
+                             group_by: List[str]) -> List[Dict[str, Any]]:
+        """Return rollup counters (ROLLUP_COUNTERS) summed per bucket and group over a time range"""
+
+    @abstractmethod
+    async def search_annotations(self, file_hash: str, dimension: Optional[str], terms: List[str],
+                                 limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Return annotations of a file matching every term, best matches first, with a highlighted snippet"""
+
+    @abstractmethod
+    def iter_task_rows(self, file_hash: str, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield every annotation of a file (ANNOTATION_COLUMNS) in batches, in insertion order"""
+
+    @abstractmethod
+    async def list_tasks(self) -> List[Dict[str, Any]]:
+        """Return one summary per stored file hash"""
@@ -0,0 +1,343 @@
+"""
+DuckDB analytics backend
+
+Keeps a columnar replica of the annotations table in an embedded DuckDB file,
+fed by replaying the SQLite change log (annotation_changes, in seq order:
+upserts and per-file delete tombstones) past the last applied sequence.
+Stats, dimensions and exports run on the replica, so heavy aggregations
+execute in parallel without holding SQLite read connections.
+Writes, progress polling and incremental (``since``) exports stay on SQLite,
+which remains the source of truth; a full export only reads the replica when
+it holds exactly the task's current rows.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from app.core.logger import log
+from app.core.metrics import metrics
+from app.models import AnnotationRecord
+from app.storage.base import ANNOTATION_COLUMNS, StorageBackend
+from app.storage.sqlite_backend import (
+    DIMENSIONS_SQL,
+    EXPORT_SQL,
+    STATS_BY_ANNOTATOR_SQL,
+    STATS_OVERALL_SQL,
+    STATS_TOTAL_CASES_SQL,
+    TASK_VERSION_SQL,
+    SQLiteBackend,
+    stats_where_clause,
+    task_version,
+)
+
+sync_duration = metrics.histogram("analytics_sync_seconds", "Duration of DuckDB replica sync runs")
+sync_rows = metrics.counter("analytics_sync_rows_total", "Rows copied into the DuckDB replica")
+replica_lag = metrics.gauge("analytics_replica_lag_seconds", "Seconds since the last successful replica sync")
+
+CREATE_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS annotations (
+    id VARCHAR PRIMARY KEY,
+    task_hash VARCHAR NOT NULL,
+    file_hash VARCHAR NOT NULL,
+    filename VARCHAR,
+    dimension VARCHAR,
+    case_id BIGINT NOT NULL,
+    browser_fingerprint VARCHAR NOT NULL,
+    account_name VARCHAR,
+    original_data VARCHAR,
+    llm_judgement VARCHAR,
+    llm_reasoning VARCHAR,
+    human_action VARCHAR,
+    human_judgement VARCHAR,
+    human_reasoning VARCHAR,
+    annotation_type VARCHAR,
+    evaluation_type VARCHAR,
+    labels VARCHAR,
+    metadata VARCHAR,
+    created_at VARCHAR,
+    updated_at VARCHAR,
+    seq BIGINT
+)
+"""
+
+# Replay position per change source ('' = the single SQLite database, else a shard's file hash)
+CREATE_SOURCES_SQL = """
+CREATE TABLE IF NOT EXISTS sync_sources (
+    source VARCHAR PRIMARY KEY,
+    generation VARCHAR NOT NULL,
+    seq BIGINT NOT NULL
+)
+"""
+
+
+class DuckDBBackend(StorageBackend):
+    name = "duckdb"
+
+    def __init__(self, source: SQLiteBackend, path: str, sync_interval: float):
+        self.source = source
+        self.path = path
+        self.sync_interval = sync_interval
+        self._conn = None
+        self._write_lock = threading.Lock()
+        self._sync_lock: Optional[asyncio.Lock] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._last_sync: Optional[float] = None
+        self._consistent = False  # Every source fully replayed (no sync running or failed halfway)
+
+    async def init(self):
+        import duckdb  # Optional dependency, only needed for this backend
+
+        if self.path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = duckdb.connect(self.path)
+        self._conn.execute(CREATE_TABLE_SQL)
+        self._conn.execute(CREATE_SOURCES_SQL)
+        self._upgrade_schema()
+        self._sync_lock = asyncio.Lock()
+        await self.sync()
+        if self.sync_interval > 0:
+            self._sync_task = asyncio.get_running_loop().create_task(self._sync_loop())
+
+    async def close(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    # Replica maintenance
+
+    def _execute(self, sql: str, params: list = None):
+        """Run a write statement; DuckDB cursors are per-thread connection handles"""
+        with self._write_lock:
+            cursor = self._conn.cursor()
+            try:
+                cursor.execute(sql, params or [])
+            finally:
+                cursor.close()
+
+    def _upgrade_schema(self):
+        """Add columns introduced after the replica was created and resync it from scratch"""
+        columns = {row["column_name"] for row in self._query(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'annotations'", ()
+        )}
+        if "seq" not in columns:
+            self._execute("ALTER TABLE annotations ADD COLUMN seq BIGINT")
+            self._execute("DELETE FROM sync_sources")
+            log.info("DuckDB replica schema upgraded (seq), resyncing")
+        # Replicas synced by updated_at watermark have no replay positions and are rebuilt
+        self._execute("DROP TABLE IF EXISTS sync_state")
+
+    def _sources(self) -> Dict[str, Tuple[str, int]]:
+        rows = self._query("SELECT source, generation, seq FROM sync_sources", ())
+        return {row["source"]: (row["generation"], int(row["seq"])) for row in rows}
+
+    def _store_position(self, source: str, generation: str, seq: int):
+        self._execute("INSERT OR REPLACE INTO sync_sources (source, generation, seq) VALUES (?, ?, ?)",
+                      [source, generation, seq])
+
+    def _clear_source(self, source: str):
+        if source:
+            self._execute("DELETE FROM annotations WHERE file_hash = ?", [source])
+        else:
+            self._execute("DELETE FROM annotations")
+
+    def _forget_source(self, source: str):
+        self._clear_source(source)
+        self._execute("DELETE FROM sync_sources WHERE source = ?", [source])
+
+    def _apply_batch(self, rows: List[Dict[str, Any]]):
+        import pandas as pd
+
+        frame = pd.DataFrame.from_records(rows, columns=ANNOTATION_COLUMNS)
+        with self._write_lock:
+            cursor = self._conn.cursor()
+            try:
+                cursor.register("sync_batch", frame)
+                cursor.execute(f"INSERT OR REPLACE INTO annotations SELECT {', '.join(ANNOTATION_COLUMNS)} FROM sync_batch")
+                cursor.unregister("sync_batch")
+            finally:
+                cursor.close()
+
+    def _apply_changes(self, entries: List[Dict[str, Any]]) -> int:
+        """Apply change log entries in order; upserts carry the row's current state (skipped once deleted)"""
+        applied = 0
+        upserts: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            if entry["change_op"] == "delete":
+                if upserts:
+                    self._apply_batch(list(upserts.values()))
+                    applied += len(upserts)
+                    upserts = {}
+                self._execute("DELETE FROM annotations WHERE file_hash = ?", [entry["change_file_hash"]])
+            elif entry["id"] is not None:
+                upserts[entry["id"]] = {column: entry[column] for column in ANNOTATION_COLUMNS}
+        if upserts:
+            self._apply_batch(list(upserts.values()))
+            applied += len(upserts)
+        return applied
+
+    async def _sync_source(self, file_hash: Optional[str], generation: str,
+                           position: Optional[Tuple[str, int]]) -> int:
+        source = file_hash or ""
+        copied = 0
+        if position is None or position[0] != generation:
+            # New or recreated log: copy a snapshot, then replay everything committed after its head
+            seq = await self.source.change_log_head(file_hash)
+            await asyncio.to_thread(self._clear_source, source)
+            async for batch in self.source.iter_rows(file_hash):
+                await asyncio.to_thread(self._apply_batch, batch)
+                copied += len(batch)
+            await asyncio.to_thread(self._store_position, source, generation, seq)
+        else:
+            seq = position[1]
+        async for entries in self.source.iter_changes(file_hash, seq):
+            copied += await asyncio.to_thread(self._apply_changes, entries)
+            seq = entries[-1]["change_seq"]
+            await asyncio.to_thread(self._store_position, source, generation, seq)
+        return copied
+
+    async def sync(self) -> int:
+        """Replay changes committed since the last applied sequence into the replica"""
+        async with self._sync_lock:
+            start = time.perf_counter()
+            self._consistent = False
+            sources = await self.source.change_sources()
+            positions = await asyncio.to_thread(self._sources)
+            copied = 0
+            # Dropped shards (retired or archived in any worker) take their change log with them
+            for source in positions.keys() - {file_hash or "" for file_hash in sources}:
+                await asyncio.to_thread(self._forget_source, source)
+            for file_hash, generation in sources.items():
+                copied += await self._sync_source(file_hash, generation, positions.get(file_hash or ""))
+
+            self._consistent = True
+            self._last_sync = time.time()
+            replica_lag.set(0)
+            sync_duration.observe(time.perf_counter() - start)
+            if copied:
+                sync_rows.inc(copied)
+                log.debug("Synced {} rows into DuckDB replica", copied)
+            return copied
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                log.error(f"DuckDB replica sync failed: {e}")
+                if self._last_sync is not None:
+                    replica_lag.set(time.time() - self._last_sync)
+
+    def _query(self, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(sql, list(params))
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    async def query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        """Run a read query on the replica off the event loop"""
+        return await asyncio.to_thread(self._query, sql, params)
+
+    # Writes and OLTP reads go to the source of truth
+
+    async def upsert_annotation(self, record: AnnotationRecord) -> None:
+        await self.source.upsert_annotation(record)
+
+    async def upsert_annotations(self, records: List[AnnotationRecord]) -> None:
+        await self.source.upsert_annotations(records)
+
+    async def delete_task(self, file_hash: str) -> bool:
+        removed = await self.source.delete_task(file_hash)
+        await asyncio.to_thread(self._execute, "DELETE FROM annotations WHERE file_hash = ?", [file_hash])
+        return removed
+
+    async def delete_archived_task(self, file_hash: str, row_count: int, last_updated: Optional[str]) -> bool:
+        removed = await self.source.delete_archived_task(file_hash, row_count, last_updated)
+        if removed:
+            await asyncio.to_thread(self._execute, "DELETE FROM annotations WHERE file_hash = ?", [file_hash])
+        return removed
+
+    async def restore_archived_task(self, file_hash: str, records: List[AnnotationRecord]) -> None:
+        await self.source.restore_archived_task(file_hash, records)
+
+    async def get_progress(self, file_hash: str, task_hash: str, fingerprint: Optional[str]) -> Dict[str, Any]:
+        return await self.source.get_progress(file_hash, task_hash, fingerprint)
+
+    async def get_case_annotators(self, file_hash: str, task_hash: str) -> List[Tuple[int, str]]:
+        # The dispatcher must see every label immediately, so it can't use the lagging replica
+        return await self.source.get_case_annotators(file_hash, task_hash)
+
+    async def list_tasks(self) -> List[Dict[str, Any]]:
+        return await self.source.list_tasks()
+
+    async def read_change_log(self, file_hash: Optional[str], since: int, limit: int) -> List[Dict[str, Any]]:
+        return await self.source.read_change_log(file_hash, since, limit)
+
+    async def iter_task_rows(self, file_hash: str, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        # Archives must hold every row, including ones the replica hasn't synced yet
+        async for rows in self.source.iter_task_rows(file_hash, batch_size):
+            yield rows
+
+    async def get_throughput(self, file_hash: str, dimension: Optional[str], granularity: str,
+                             start: Optional[datetime], end: Optional[datetime],
+                             group_by: List[str]) -> List[Dict[str, Any]]:
+        # Rollups are maintained by SQLite triggers and already pre-aggregated
+        return await self.source.get_throughput(file_hash, dimension, granularity, start, end, group_by)
+
+    async def search_annotations(self, file_hash: str, dimension: Optional[str], terms: List[str],
+                                 limit: int, offset: int) -> List[Dict[str, Any]]:
+        # The full-text index only exists in SQLite
+        return await self.source.search_annotations(file_hash, dimension, terms, limit, offset)
+
+    # Analytical reads run on the replica
+
+    async def get_dimensions(self, file_hash: str) -> List[Dict[str, Any]]:
+        return await self.query(DIMENSIONS_SQL, (file_hash,))
+
+    async def get_stats(self, file_hash: str, dimension: Optional[str]) -> Dict[str, Any]:
+        where_clause, params = stats_where_clause(file_hash, dimension)
+        total_rows, stats_rows, annotator_rows = await asyncio.gather(
+            self.query(STATS_TOTAL_CASES_SQL.format(where_clause=where_clause), params),
+            self.query(STATS_OVERALL_SQL.format(where_clause=where_clause), params),
+            self.query(STATS_BY_ANNOTATOR_SQL.format(where_clause=where_clause), params),
+        )
+        stats = {key: int(value or 0) for key, value in stats_rows[0].items()}
+        stats["total_cases"] = int(total_rows[0]["total"]) if total_rows else 0
+        stats["by_annotator"] = [
+            {key: (int(value) if key in ("total", "agree", "disagree", "skip") else value)
+             for key, value in row.items()}
+            for row in annotator_rows
+        ] if stats["total_annotations"] else []
+        return stats
+
+    async def get_export_rows(self, file_hash: str, task_hash: str) -> List[Mapping[str, Any]]:
+        # A completed sync leaves the replica at one consistent point of each source, so when the task's version
+        # there matches the source it holds exactly the current rows; otherwise export from SQLite
+        async with self._sync_lock:
+            if self._consistent:
+                replica = await self.query(TASK_VERSION_SQL, (task_hash,))
+                source = await self.source.get_task_version(file_hash, task_hash)
+                if task_version(replica[0] if replica else None) == source:
+                    return await self.query(EXPORT_SQL, (task_hash,))
+        return await self.source.get_export_rows(file_hash, task_hash)
+
+    async def get_changed_rows(self, file_hash: str, task_hash: str, since: int) -> List[Mapping[str, Any]]:
+        # Watermarks must never pass a row the caller hasn't seen, and the replica is not a prefix of the
+        # change sequence while it syncs; the (task_hash, seq) index keeps this cheap on SQLite
+        return await self.source.get_changed_rows(file_hash, task_hash, since)
+
+    async def get_task_version(self, file_hash: str, task_hash: str) -> Optional[Dict[str, Any]]:
+        return await self.source.get_task_version(file_hash, task_hash)
@@ -0,0 +1,537 @@
+"""
+SQLite storage backend (transactional store)
+"""
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from app.core.database import ROLLUP_COUNTERS, Database
+from app.models import AnnotationRecord
+from app.storage.base import ANNOTATION_COLUMNS, EXPORT_COLUMNS, RECORD_COLUMNS, StorageBackend
+
+# Writes are serialized (group-commit writer, BEGIN IMMEDIATE), so MAX(seq) + 1 is monotonic per task
+UPSERT_SQL = f"""
+INSERT INTO annotations ({", ".join(RECORD_COLUMNS)}, seq)
+VALUES ({", ".join("?" for _ in RECORD_COLUMNS)},
+        (SELECT COALESCE(MAX(seq), 0) + 1 FROM annotations WHERE task_hash = ?))
+ON CONFLICT(task_hash, case_id, browser_fingerprint) DO UPDATE SET
+    human_action = excluded.human_action,
+    human_judgement = excluded.human_judgement,
+    human_reasoning = excluded.human_reasoning,
+    updated_at = excluded.updated_at,
+    seq = excluded.seq
+"""
+
+# Logs the row as stored after the upsert, so updates keep the original annotation id
+CHANGE_LOG_SQL = """
+INSERT INTO annotation_changes (
+    op, annotation_id, task_hash, file_hash, dimension, case_id,
+    browser_fingerprint, account_name, human_action, human_judgement,
+    human_reasoning, task_seq, changed_at
+)
+SELECT
+    CASE WHEN created_at = updated_at THEN 'insert' ELSE 'update' END,
+    id, task_hash, file_hash, dimension, case_id,
+    browser_fingerprint, account_name, human_action, human_judgement,
+    human_reasoning, seq, updated_at
+FROM annotations
+WHERE task_hash = ? AND case_id = ? AND browser_fingerprint = ?
+"""
+
+CHANGE_LOG_COLUMNS = [
+    "seq", "op", "annotation_id", "task_hash", "file_hash", "dimension", "case_id",
+    "browser_fingerprint", "account_name", "human_action", "human_judgement",
+    "human_reasoning", "task_seq", "changed_at",
+]
+
+# Covered by the unique (task_hash, case_id, browser_fingerprint) index
+CASE_ANNOTATORS_SQL = """
+SELECT case_id, browser_fingerprint
+FROM annotations
+WHERE task_hash = ?
+"""
+
+DIMENSIONS_SQL = """
+SELECT DISTINCT
+    dimension,
+    COUNT(*) as annotation_count,
+    MIN(created_at) as first_annotation,
+    MAX(created_at) as last_annotation
+FROM annotations
+WHERE file_hash = ?
+GROUP BY dimension
+ORDER BY annotation_count DESC, dimension
+"""
+
+STATS_TOTAL_CASES_SQL = """
+SELECT COUNT(DISTINCT case_id) as total
+FROM annotations
+{where_clause}
+"""
+
+STATS_OVERALL_SQL = """
+SELECT
+    COUNT(*) as total_annotations,
+    COUNT(DISTINCT case_id) as annotated_cases,
+    COALESCE(SUM(CASE WHEN human_action = 'agree' THEN 1 ELSE 0 END), 0) as agreed,
+    COALESCE(SUM(CASE WHEN human_action = 'disagree' THEN 1 ELSE 0 END), 0) as disagreed,
+    COALESCE(SUM(CASE WHEN human_action = 'skip' THEN 1 ELSE 0 END), 0) as skipped
+FROM annotations
+{where_clause}
+"""
+
+STATS_BY_ANNOTATOR_SQL = """
+SELECT
+    browser_fingerprint,
+    account_name,
+    COUNT(*) as total,
+    COALESCE(SUM(CASE WHEN human_action = 'agree' THEN 1 ELSE 0 END), 0) as agree,
+    COALESCE(SUM(CASE WHEN human_action = 'disagree' THEN 1 ELSE 0 END), 0) as disagree,
+    COALESCE(SUM(CASE WHEN human_action = 'skip' THEN 1 ELSE 0 END), 0) as skip
+FROM annotations
+{where_clause}
+GROUP BY browser_fingerprint, account_name
+ORDER BY total DESC, browser_fingerprint
+"""
+
+EXPORT_SQL = f"""
+SELECT {", ".join(EXPORT_COLUMNS)}
+FROM annotations
+WHERE task_hash = ?
+ORDER BY case_id, created_at
+"""
+
+CHANGED_ROWS_SQL = f"""
+SELECT {", ".join(EXPORT_COLUMNS)}
+FROM annotations
+WHERE task_hash = ? AND seq > ?
+ORDER BY seq
+"""
+
+TASK_VERSION_SQL = """
+SELECT COUNT(*) as row_count, MAX(seq) as max_seq
+FROM annotations
+WHERE task_hash = ?
+"""
+
+TASK_SUMMARY_SQL = """
+SELECT
+    file_hash,
+    COUNT(*) as annotation_count,
+    COUNT(DISTINCT dimension) as dimension_count,
+    MAX(updated_at) as last_updated
+FROM annotations
+GROUP BY file_hash
+"""
+
+# Change log entries in commit order, joined to the row each insert/update now holds (NULL once deleted)
+REPLICA_CHANGES_SQL = f"""
+SELECT c.seq as change_seq, c.op as change_op, c.file_hash as change_file_hash,
+       {", ".join(f"a.{column}" for column in ANNOTATION_COLUMNS)}
+FROM annotation_changes c
+LEFT JOIN annotations a ON a.id = c.annotation_id
+WHERE c.seq > ?
+ORDER BY c.seq
+LIMIT ?
+"""
+
+REPLICA_ROWS_SQL = f"""
+SELECT rowid as row_key, {", ".join(ANNOTATION_COLUMNS)}
+FROM annotations
+WHERE rowid > ?
+ORDER BY rowid
+LIMIT ?
+"""
+
+# Checked and deleted in one statement, so no write can land between the check and the delete
+ARCHIVE_DELETE_SQL = """
+DELETE FROM annotations
+WHERE file_hash = ?
+  AND (SELECT COUNT(*) FROM annotations WHERE file_hash = ?) = ?
+  AND (SELECT MAX(updated_at) FROM annotations WHERE file_hash = ?) IS ?
+"""
+
+DELETE_CHANGE_LOG_SQL = """
+INSERT INTO annotation_changes (op, file_hash, changed_at)
+SELECT 'delete', ?, ? WHERE changes() > 0
+"""
+
+# Trigger-maintained tables of a file saved across an archive restore, with their scratch copies
+RESTORED_ROLLUP_TABLES = [("annotation_rollups", "restore_rollups"), ("annotator_activity", "restore_activity")]
+
+# Keyset pages over the file_hash index, which carries the rowid
+TASK_ROWS_SQL = f"""
+SELECT rowid as row_key, {", ".join(ANNOTATION_COLUMNS)}
+FROM annotations
+WHERE file_hash = ? AND rowid > ?
+ORDER BY rowid
+LIMIT ?
+"""
+
+# Summed from pre-aggregated buckets; the primary key covers the range scan
+THROUGHPUT_SQL = f"""
+SELECT bucket{{group_columns}},
+    {", ".join(f"SUM({column}) as {column}" for column in ROLLUP_COUNTERS)}
+FROM annotation_rollups
+{{where_clause}}
+GROUP BY bucket{{group_keys}}
+ORDER BY bucket{{group_keys}}
+"""
+
+# Grouping dimensions of throughput queries and their columns
+THROUGHPUT_GROUPS = {
+    "annotator": ("browser_fingerprint", "browser_fingerprint, MAX(account_name) as account_name"),
+    "dimension": ("dimension", "dimension"),
+}
+
+SEARCH_COLUMNS = ["original_text", "human_reasoning", "llm_reasoning", "human_judgement", "llm_judgement"]
+
+# The trigram tokenizer cannot index terms shorter than this; they are matched by scanning
+MIN_INDEXED_TERM = 3
+
+SEARCH_SQL = """
+SELECT
+    a.id, a.task_hash, a.dimension, a.case_id, a.account_name,
+    a.human_action, a.human_judgement, a.updated_at,
+    {snippet}
+FROM annotations_fts
+JOIN annotations a ON a.rowid = annotations_fts.rowid
+WHERE {where_clause}
+ORDER BY {order_by}
+LIMIT ? OFFSET ?
+"""
+
+SNIPPET_LENGTH = 32  # Characters of context in fallback snippets
+
+
+def search_clauses(terms: List[str]) -> Tuple[Optional[str], List[str]]:
+    """Split search terms into an FTS5 MATCH expression and short terms that need a scan"""
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_TERM]
+    short = [term for term in terms if len(term) < MIN_INDEXED_TERM]
+    # Quoting makes every term a literal phrase, so user input can't inject FTS5 syntax
+    match = " AND ".join('"' + term.replace('"', '""') + '"' for term in indexed) or None
+    return match, short
+
+
+def fallback_snippet(row: Mapping[str, Any], term: str) -> Optional[str]:
+    """Highlight the first occurrence of a term when no MATCH ran to produce snippet()"""
+    needle = term.lower()
+    for column in SEARCH_COLUMNS:
+        text = row[f"fts_{column}"] or ""
+        index = text.lower().find(needle)
+        if index < 0:
+            continue
+        start = max(0, index - SNIPPET_LENGTH)
+        end = min(len(text), index + len(term) + SNIPPET_LENGTH)
+        return ("…" if start > 0 else "") + text[start:index] + "[" + text[index:index + len(term)] + "]" \
+            + text[index + len(term):end] + ("…" if end < len(text) else "")
+    return None
+
+
+def stats_where_clause(file_hash: str, dimension: Optional[str]):
+    """Stats are scoped by file, optionally narrowed to one dimension"""
+    if dimension:
+        return "WHERE file_hash = ? AND dimension = ?", (file_hash, dimension)
+    return "WHERE file_hash = ?", (file_hash,)
+
+
+def bucket_key(moment: datetime, granularity: str) -> str:
+    """Rollup bucket containing a moment (matches rollup_bucket_sql)"""
+    if granularity == "hour":
+        return moment.strftime("%Y-%m-%dT%H:00:00")
+    return moment.strftime("%Y-%m-%d")
+
+
+def throughput_where_clause(granularity: str, file_hash: str, dimension: Optional[str],
+                            start: Optional[datetime], end: Optional[datetime]):
+    """Rollups of one granularity in every bucket overlapping [start, end)"""
+    conditions, params = ["granularity = ?", "file_hash = ?"], [granularity, file_hash]
+    if start is not None:
+        conditions.append("bucket >= ?")
+        params.append(bucket_key(start, granularity))
+    if end is not None:
+        conditions.append("bucket <= ?")
+        params.append(bucket_key(end - timedelta(microseconds=1), granularity))
+    if dimension is not None:
+        conditions.append("dimension = ?")
+        params.append(dimension)
+    return "WHERE " + " AND ".join(conditions), tuple(params)
+
+
+def task_version(row: Optional[Mapping[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not row or not row["row_count"]:
+        return None
+    return {"row_count": int(row["row_count"]), "max_seq": int(row["max_seq"] or 0)}
+
+
+def upsert_statements(records: List[AnnotationRecord]) -> list:
+    """Upsert and change log statements of annotations, for one write unit"""
+    statements = []
+    for record in records:
+        key = (record.task_hash, record.case_id, record.browser_fingerprint)
+        statements.append((UPSERT_SQL, record.values() + (record.task_hash,), "annotation_upsert"))
+        statements.append((CHANGE_LOG_SQL, key, "annotation_change_log"))
+    return statements
+
+
+class SQLiteBackend(StorageBackend):
+    name = "sqlite"
+
+    def __init__(self, database: Database):
+        self.db = database
+
+    async def upsert_annotation(self, record: AnnotationRecord) -> None:
+        await self.upsert_annotations([record])
+
+    async def upsert_annotations(self, records: List[AnnotationRecord]) -> None:
+        file_hashes = {record.file_hash for record in records}
+        if len(file_hashes) != 1:
+            raise ValueError("Annotations written together must belong to one file")
+        # One write unit: a single savepoint inside the group-commit transaction
+        async with self.db.for_file(file_hashes.pop(), create=True) as task_db:
+            await task_db.execute_many(upsert_statements(records))
+
+    async def restore_archived_task(self, file_hash: str, records: List[AnnotationRecord]) -> None:
+        if any(record.file_hash != file_hash for record in records):
+            raise ValueError("Restored annotations must belong to the archived file")
+        # The rollups were kept when the task was archived, so the insert triggers' additions are undone by
+        # putting the file's rollups back as they were, all in the same write unit as the rows
+        statements = [
+            (f"CREATE TEMP TABLE {temp} AS SELECT * FROM {table} WHERE file_hash = ?", (file_hash,), "restore_rollups")
+            for table, temp in RESTORED_ROLLUP_TABLES
+        ]
+        statements += upsert_statements(records)
+        for table, temp in RESTORED_ROLLUP_TABLES:
+            statements += [
+                (f"DELETE FROM {table} WHERE file_hash = ?", (file_hash,), "restore_rollups"),
+                (f"INSERT INTO {table} SELECT * FROM temp.{temp}", None, "restore_rollups"),
+                (f"DROP TABLE temp.{temp}", None, "restore_rollups"),
+            ]
+        async with self.db.for_file(file_hash, create=True) as task_db:
+            await task_db.execute_many(statements)
+
+    async def delete_task(self, file_hash: str) -> bool:
+        if self.db.router is not None:
+            return await self.db.router.drop(file_hash)
+        deleted, *_ = await self.db.execute_many([
+            ("DELETE FROM annotations WHERE file_hash = ?", (file_hash,), "admin_retire_task"),
+            (DELETE_CHANGE_LOG_SQL, (file_hash, datetime.now().isoformat()), "annotation_change_log"),
+            *(
+                (f"DELETE FROM {table} WHERE file_hash = ?", (file_hash,), "admin_retire_task")
+                for table in ("annotation_rollups", "annotator_activity")
+            ),
+        ])
+        return deleted > 0
+
+    async def delete_archived_task(self, file_hash: str, row_count: int, last_updated: Optional[str]) -> bool:
+        # Unlike retiring, the shard (if any) and its rollups stay, so throughput history survives archiving
+        async with self.db.for_file(file_hash) as task_db:
+            deleted, _ = await task_db.execute_many([
+                (
+                    ARCHIVE_DELETE_SQL,
+                    (file_hash, file_hash, row_count, file_hash, last_updated),
+                    "archive_delete_task"
+                ),
+                (DELETE_CHANGE_LOG_SQL, (file_hash, datetime.now().isoformat()), "annotation_change_log"),
+            ])
+        return deleted > 0
+
+    async def read_change_log(self, file_hash: Optional[str], since: int, limit: int) -> List[Dict[str, Any]]:
+        if file_hash is None:
+            if self.db.router is not None:
+                raise ValueError("file_hash is required in sharded storage mode")
+            sql = f"SELECT {', '.join(CHANGE_LOG_COLUMNS)} FROM annotation_changes WHERE seq > ? ORDER BY seq LIMIT ?"
+            params = (since, limit)
+        else:
+            sql = (f"SELECT {', '.join(CHANGE_LOG_COLUMNS)} FROM annotation_changes "
+                   "WHERE file_hash = ? AND seq > ? ORDER BY seq LIMIT ?")
+            params = (file_hash, since, limit)
+        async with self.db.for_file(file_hash) as task_db:
+            rows = await task_db.fetchall(sql, params, name="change_log_tail")
+        return [dict(row) for row in rows]
+
+    async def get_progress(self, file_hash: str, task_hash: str, fingerprint: Optional[str]) -> Dict[str, Any]:
+        if fingerprint:
+            sql = """
+            SELECT
+                COUNT(DISTINCT case_id) as annotated_rows,
+                GROUP_CONCAT(DISTINCT case_id) as case_ids
+            FROM annotations
+            WHERE task_hash = ? AND browser_fingerprint = ?
+            """
+            params = (task_hash, fingerprint)
+        else:
+            sql = """
+            SELECT
+                COUNT(DISTINCT case_id) as annotated_rows,
+                GROUP_CONCAT(DISTINCT case_id) as case_ids
+            FROM annotations
+            WHERE task_hash = ?
+            """
+            params = (task_hash,)
+
+        max_case_sql = """
+        SELECT MAX(case_id) as max_case_id
+        FROM annotations
+        WHERE task_hash = ?
+        """
+        async with self.db.for_file(file_hash) as task_db:
+            result = await task_db.fetchone(sql, params, name="progress_annotated")
+            max_result = await task_db.fetchone(max_case_sql, (task_hash,), name="progress_max_case")
+
+        case_ids_str = result["case_ids"] if result and result["case_ids"] else ""
+        return {
+            "annotated_rows": result["annotated_rows"] if result else 0,
+            "case_ids": sorted(int(case_id) for case_id in case_ids_str.split(",")) if case_ids_str else [],
+            "max_case_id": max_result["max_case_id"] if max_result else None,
+        }
+
+    async def get_case_annotators(self, file_hash: str, task_hash: str) -> List[Tuple[int, str]]:
+        async with self.db.for_file(file_hash) as task_db:
+            rows = await task_db.fetchall(CASE_ANNOTATORS_SQL, (task_hash,), name="dispatch_case_annotators")
+        return [(row["case_id"], row["browser_fingerprint"]) for row in rows]
+
+    async def get_dimensions(self, file_hash: str) -> List[Dict[str, Any]]:
+        async with self.db.for_file(file_hash) as task_db:
+            rows = await task_db.fetchall(DIMENSIONS_SQL, (file_hash,), name="analytics_dimensions")
+        return [dict(row) for row in rows]
+
+    async def get_stats(self, file_hash: str, dimension: Optional[str]) -> Dict[str, Any]:
+        where_clause, params = stats_where_clause(file_hash, dimension)
+        async with self.db.for_file(file_hash) as task_db:
+            total_result = await task_db.fetchone(
+                STATS_TOTAL_CASES_SQL.format(where_clause=where_clause), params, name="stats_total_cases"
+            )
+            stats_result = await task_db.fetchone(
+                STATS_OVERALL_SQL.format(where_clause=where_clause), params, name="stats_overall"
+            )
+            annotator_rows = []
+            if stats_result and stats_result["total_annotations"]:
+                annotator_rows = await task_db.fetchall(
+                    STATS_BY_ANNOTATOR_SQL.format(where_clause=where_clause), params, name="stats_by_annotator"
+                )
+
+        stats = dict(stats_result) if stats_result else {
+            "total_annotations": 0, "annotated_cases": 0, "agreed": 0, "disagreed": 0, "skipped": 0
+        }
+        stats["total_cases"] = total_result["total"] if total_result else 0
+        stats["by_annotator"] = [dict(row) for row in annotator_rows]
+        return stats
+
+    async def get_export_rows(self, file_hash: str, task_hash: str) -> List[Mapping[str, Any]]:
+        async with self.db.for_file(file_hash) as task_db:
+            return await task_db.fetchall(EXPORT_SQL, (task_hash,), name="export_rows")
+
+    async def get_changed_rows(self, file_hash: str, task_hash: str, since: int) -> List[Mapping[str, Any]]:
+        async with self.db.for_file(file_hash) as task_db:
+            return await task_db.fetchall(CHANGED_ROWS_SQL, (task_hash, since), name="export_changed_rows")
+
+    async def get_task_version(self, file_hash: str, task_hash: str) -> Optional[Dict[str, Any]]:
+        async with self.db.for_file(file_hash) as task_db:
+            row = await task_db.fetchone(TASK_VERSION_SQL, (task_hash,), name="export_task_version")
+        return task_version(row)
+
+    async def get_throughput(self, file_hash: str, dimension: Optional[str], granularity: str,
+                             start: Optional[datetime], end: Optional[datetime],
+                             group_by: List[str]) -> List[Dict[str, Any]]:
+        keys = "".join(f", {THROUGHPUT_GROUPS[group][0]}" for group in group_by)
+        columns = "".join(f", {THROUGHPUT_GROUPS[group][1]}" for group in group_by)
+        where_clause, params = throughput_where_clause(granularity, file_hash, dimension, start, end)
+        sql = THROUGHPUT_SQL.format(group_columns=columns, group_keys=keys, where_clause=where_clause)
+        async with self.db.for_file(file_hash) as task_db:
+            rows = await task_db.fetchall(sql, params, name="analytics_throughput")
+        return [dict(row) for row in rows]
+
+    async def search_annotations(self, file_hash: str, dimension: Optional[str], terms: List[str],
+                                 limit: int, offset: int) -> List[Dict[str, Any]]:
+        match, short_terms = search_clauses(terms)
+        conditions = ["a.file_hash = ?"]
+        params: list = [file_hash]
+        if dimension:
+            conditions.append("a.dimension = ?")
+            params.append(dimension)
+        if match is not None:
+            conditions.insert(0, "annotations_fts MATCH ?")
+            params.insert(0, match)
+            snippet = "snippet(annotations_fts, -1, '[', ']', '…', 24) AS snippet"
+            order_by = "annotations_fts.rank"
+        else:
+            snippet = ", ".join(f"annotations_fts.{column} AS fts_{column}" for column in SEARCH_COLUMNS)
+            order_by = "a.updated_at DESC"
+        haystack = " || char(10) || ".join(
+            f"COALESCE(annotations_fts.{column}, '')" for column in SEARCH_COLUMNS
+        )
+        for term in short_terms:
+            conditions.append(f"instr(lower({haystack}), lower(?)) > 0")
+            params.append(term)
+
+        sql = SEARCH_SQL.format(snippet=snippet, where_clause=" AND ".join(conditions), order_by=order_by)
+        async with self.db.for_file(file_hash) as task_db:
+            rows = await task_db.fetchall(sql, tuple(params) + (limit, offset), name="annotation_search")
+
+        if match is not None:
+            return [dict(row) for row in rows]
+        hits = []
+        for row in rows:
+            hit = {key: row[key] for key in row.keys() if not key.startswith("fts_")}
+            hit["snippet"] = fallback_snippet(row, short_terms[0])
+            hits.append(hit)
+        return hits
+
+    async def list_tasks(self) -> List[Dict[str, Any]]:
+        if self.db.router is not None:
+            results = await self.db.router.fan_out(TASK_SUMMARY_SQL, name="admin_task_summary")
+            rows = [row for _, shard_rows in results for row in shard_rows]
+        else:
+            rows = await self.db.fetchall(TASK_SUMMARY_SQL, name="admin_task_summary")
+        return [dict(row) for row in rows]
+
+    async def iter_task_rows(self, file_hash: str, batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        async with self.db.for_file(file_hash) as task_db:
+            last_key = 0
+            while True:
+                rows = await task_db.fetchall(TASK_ROWS_SQL, (file_hash, last_key, batch_size), name="task_rows")
+                if not rows:
+                    break
+                last_key = rows[-1]["row_key"]
+                yield [{column: row[column] for column in ANNOTATION_COLUMNS} for row in rows]
+                if len(rows) < batch_size:
+                    break
+
+    async def change_sources(self) -> Dict[Optional[str], str]:
+        """Independent change logs: None for the single database, or each shard's file hash,
+        mapped to a generation that changes whenever the log starts over"""
+        if self.db.router is not None:
+            return await self.db.router.generations()
+        return {None: ""}
+
+    async def change_log_head(self, file_hash: Optional[str]) -> int:
+        async with self.db.for_file(file_hash) as task_db:
+            row = await task_db.fetchone("SELECT COALESCE(MAX(seq), 0) as head FROM annotation_changes",
+                                         name="change_log_head")
+        return int(row["head"])
+
+    async def iter_rows(self, file_hash: Optional[str], batch_size: int = 5000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield batches of every annotation row in one change source"""
+        async with self.db.for_file(file_hash) as task_db:
+            last_key = 0
+            while True:
+                rows = await task_db.fetchall(REPLICA_ROWS_SQL, (last_key, batch_size), name="replica_rows")
+                if not rows:
+                    break
+                last_key = rows[-1]["row_key"]
+                yield [{column: row[column] for column in ANNOTATION_COLUMNS} for row in rows]
+                if len(rows) < batch_size:
+                    break
+
+    async def iter_changes(self, file_hash: Optional[str], since: int,
+                           batch_size: int = 5000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield batches of change log entries after sequence ``since`` of one change source, in commit order"""
+        async with self.db.for_file(file_hash) as task_db:
+            while True:
+                rows = await task_db.fetchall(REPLICA_CHANGES_SQL, (since, batch_size), name="sync_changes")
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+                since = rows[-1]["change_seq"]
+                if len(rows) < batch_size:
+                    break
@@ -1,9 +1,22 @@
 from .hash import calculate_file_hash, calculate_task_hash
-from .file_parser import parse_uploaded_file, validate_file_columns
+from .file_parser import (
+    detect_annotation_type, detect_evaluation_type, infer_column_roles, parse_uploaded_file, parse_workbook,
+    preload, shutdown_parse_pool, suggest_dimensions, validate_file_columns
+)
+from .preview import preview_csv, preview_xlsx
 
 __all__ = [
     "calculate_file_hash",
     "calculate_task_hash", 
+    "detect_annotation_type",
+    "detect_evaluation_type",
+    "infer_column_roles",
     "parse_uploaded_file",
+    "parse_workbook",
+    "preload",
+    "preview_csv",
+    "preview_xlsx",
+    "shutdown_parse_pool",
+    "suggest_dimensions",
     "validate_file_columns"
 ]
\ No newline at end of file
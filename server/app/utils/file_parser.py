@@ -1,24 +1,71 @@
 """
 File parsing utilities for Excel and CSV files
+
+pandas (and openpyxl through it) is imported on first use: only uploads need
+it, and importing it dominates application startup.
+
+Workbooks may hold one sheet per dimension. ``parse_workbook`` reads every
+sheet, in parallel worker processes when there are several of them (parsing is
+CPU-bound, so threads would serialize on the GIL).
 """
-import pandas as pd
-from typing import List, Dict, Any, Tuple
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
 from app.core.logger import log
+from app.models import AnnotationTypeEnum, EvaluationTypeEnum
+from config.settings import settings
+
+EXCEL_EXTENSIONS = ['.xlsx', '.xls']
+
+# Columns recognised by name, and keywords marking LLM verdict columns (as in annotations.extract_case)
+CONTENT_ROLES = {"id", "case_id", "question", "answer", "answer1", "answer2", "dialog", "dialog1", "dialog2", "history"}
+JUDGEMENT_KEYWORDS = ['judgement', 'judgment', '判断', 'score', '评分']
+REASONING_KEYWORDS = ['reasoning', 'reason', '理由']
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def _records(df) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Rows (NaN as None) and column names of a DataFrame"""
+    import pandas as pd
+    
+    df = df.where(pd.notnull(df), None)
+    return df.to_dict(orient='records'), df.columns.tolist()
+
+def list_sheets(file_path: str) -> List[str]:
+    """Sheet names of a workbook, in workbook order"""
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(file_path, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+def parse_sheet(file_path: str, sheet: Union[str, int] = 0) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Parse one sheet of a workbook (runs in parse worker processes)"""
+    import pandas as pd
+    
+    return _records(pd.read_excel(file_path, sheet_name=sheet, engine='openpyxl'))
 
 def parse_uploaded_file(file_path: str, filename: str) -> Tuple[List[Dict[str, Any]], List[str]]:
     """
-    Parse Excel or CSV file and return data and columns
+    Parse Excel (first sheet) or CSV file and return data and columns
     
     Returns:
         Tuple of (data_rows, column_names)
     """
+    import pandas as pd
+    
     try:
         file_ext = Path(filename).suffix.lower()
         
-        if file_ext in ['.xlsx', '.xls']:
-            # Read Excel file
-            df = pd.read_excel(file_path, engine='openpyxl')
+        if file_ext in EXCEL_EXTENSIONS:
+            data, columns = parse_sheet(file_path)
+            log.info(f"Parsed file {filename}: {len(data)} rows, {len(columns)} columns")
+            return data, columns
         elif file_ext == '.csv':
             # Try different encodings
             for encoding in ['utf-8', 'gbk', 'gb2312', 'utf-16']:
@@ -32,14 +79,8 @@ def parse_uploaded_file(file_path: str, filename: str) -> Tuple[List[Dict[str, A
         else:
             raise ValueError(f"Unsupported file type: {file_ext}")
         
-        # Convert NaN to None
-        df = df.where(pd.notnull(df), None)
-        
-        # Get column names
-        columns = df.columns.tolist()
-        
-        # Convert to list of dicts
-        data = df.to_dict(orient='records')
+        # NaN as None, rows as dicts
+        data, columns = _records(df)
         
         log.info(f"Parsed file {filename}: {len(data)} rows, {len(columns)} columns")
         
@@ -49,6 +90,117 @@ def parse_uploaded_file(file_path: str, filename: str) -> Tuple[List[Dict[str, A
         log.error(f"Error parsing file {filename}: {e}")
         raise
 
+def parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Worker processes for sheet parsing, started on first use (None when disabled or single-core)"""
+    global _parse_pool
+    workers = min(settings.UPLOAD_PARSE_WORKERS, os.cpu_count() or 1)
+    if workers <= 1:
+        return None
+    if _parse_pool is None:
+        # spawn, not fork: the server process has an event loop and writer threads
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=preload
+        )
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+async def parse_workbook(file_path: str, filename: str) -> List[Tuple[str, List[Dict[str, Any]], List[str]]]:
+    """
+    Parse every sheet of a workbook (a CSV is a single sheet named after the file)
+    
+    Returns:
+        List of (sheet_name, data_rows, column_names) in workbook order
+    """
+    if Path(filename).suffix.lower() not in EXCEL_EXTENSIONS:
+        data, columns = await asyncio.to_thread(parse_uploaded_file, file_path, filename)
+        return [(Path(filename).stem, data, columns)]
+    
+    try:
+        sheets = await asyncio.to_thread(list_sheets, file_path)
+        pool = parse_pool() if len(sheets) > 1 else None
+        if pool is None:
+            parsed = [await asyncio.to_thread(parse_sheet, file_path, sheet) for sheet in sheets]
+        else:
+            loop = asyncio.get_running_loop()
+            parsed = await asyncio.gather(*(
+                loop.run_in_executor(pool, parse_sheet, file_path, sheet) for sheet in sheets
+            ))
+    except Exception as e:
+        log.error(f"Error parsing file {filename}: {e}")
+        raise
+    
+    log.info(f"Parsed workbook {filename}: {len(sheets)} sheets, {sum(len(data) for data, _ in parsed)} rows")
+    return [(sheet, data, columns) for sheet, (data, columns) in zip(sheets, parsed)]
+
+def preload():
+    """Import the parsing dependencies ahead of the first upload"""
+    import pandas  # noqa: F401
+    import openpyxl  # noqa: F401
+
+def infer_column_roles(columns: List[str]) -> Dict[str, str]:
+    """Role of each column: a content role (question, answer1, dialog, ...), judgement, reasoning or other"""
+    roles = {}
+    for column in columns:
+        name = str(column).strip().lower()
+        if name in CONTENT_ROLES:
+            roles[column] = "id" if name == "case_id" else name
+        elif any(keyword in name for keyword in REASONING_KEYWORDS):
+            roles[column] = "reasoning"
+        elif any(keyword in name for keyword in JUDGEMENT_KEYWORDS):
+            roles[column] = "judgement"
+        else:
+            roles[column] = "other"
+    return roles
+
+def suggest_dimensions(roles: Dict[str, str], default_name: str) -> List[Dict[str, Optional[str]]]:
+    """
+    Dimensions from judgement/reasoning column pairs sharing a prefix
+    
+    e.g. "逻辑性 score" and "逻辑性 reasoning" give dimension "逻辑性"; plain
+    "score" and "reasoning" columns give one dimension called default_name.
+    """
+    def prefix(column: str, keywords: List[str]) -> str:
+        lowered = column.lower()
+        for keyword in keywords:
+            position = lowered.find(keyword)
+            if position >= 0:
+                return column[:position].strip(" _-:：()（）")
+        return column
+    
+    dimensions: Dict[str, Dict[str, Optional[str]]] = {}
+    for column, role in roles.items():
+        if role == "judgement":
+            name = prefix(column, JUDGEMENT_KEYWORDS)
+            dimensions.setdefault(name, {"name": name or default_name, "judgementColumn": column,
+                                         "reasoningColumn": None})
+    for column, role in roles.items():
+        if role == "reasoning":
+            name = prefix(column, REASONING_KEYWORDS)
+            if name in dimensions and dimensions[name]["reasoningColumn"] is None:
+                dimensions[name]["reasoningColumn"] = column
+    return list(dimensions.values())
+
+def detect_evaluation_type(columns: List[str]) -> EvaluationTypeEnum:
+    """Comparison when there are two answers (or dialogs) side by side"""
+    columns_lower = {str(col).lower() for col in columns}
+    if {"answer1", "answer2"} <= columns_lower or {"dialog1", "dialog2"} <= columns_lower:
+        return EvaluationTypeEnum.comparison
+    return EvaluationTypeEnum.rule_based
+
+def detect_annotation_type(columns: List[str]) -> AnnotationTypeEnum:
+    """Single- or multi-turn, from the columns validate_file_columns expects"""
+    columns_lower = {str(col).lower() for col in columns}
+    if columns_lower & {"dialog", "dialog1", "dialog2", "history"}:
+        return AnnotationTypeEnum.multi_turn
+    return AnnotationTypeEnum.single_turn
+
 def validate_file_columns(columns: List[str], annotation_type: str) -> Tuple[bool, List[str]]:
     """
     Validate if file has required columns for the annotation type
@@ -0,0 +1,84 @@
+"""
+File responses with HTTP Range support
+"""
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single ``bytes=start-end`` range into inclusive offsets.
+
+    Returns None for headers we don't handle (multiple ranges, other units),
+    which are answered with the full file; raises ValueError if unsatisfiable.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("Range not satisfiable")
+    return first, last
+
+
+async def _read_range(path: str, start: int, end: int):
+    async with await anyio.open_file(path, "rb") as file:
+        await file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def range_file_response(request: Request, path: str, media_type: str,
+                        headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve a file, answering single-range requests with 206 Partial Content"""
+    stat = os.stat(path)
+    headers = dict(headers or {})
+    headers["Accept-Ranges"] = "bytes"
+    full = FileResponse(path, media_type=media_type, headers=headers, stat_result=stat, method=request.method)
+
+    range_header = request.headers.get("range")
+    if not range_header or request.method != "GET":
+        return full
+    # If-Range: only honour the range when the client's copy is still current
+    if_range = request.headers.get("if-range")
+    if if_range and if_range not in (full.headers["etag"], full.headers["last-modified"]):
+        return full
+
+    try:
+        byte_range = parse_range(range_header, stat.st_size)
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{stat.st_size}"})
+    if byte_range is None:
+        return full
+
+    start, end = byte_range
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat.st_size}",
+        "Content-Length": str(end - start + 1),
+        "ETag": full.headers["etag"],
+        "Last-Modified": full.headers["last-modified"],
+    })
+    return StreamingResponse(_read_range(path, start, end), status_code=206, media_type=media_type, headers=headers)
@@ -2,18 +2,20 @@
 Hash utility functions
 """
 import hashlib
+from functools import lru_cache
 from typing import BinaryIO
 
-def calculate_file_hash(file: BinaryIO) -> str:
+def calculate_file_hash(file: BinaryIO, chunk_size: int = 4096) -> str:
     """Calculate SHA256 hash of a file"""
     sha256_hash = hashlib.sha256()
     # Read file in chunks
-    for chunk in iter(lambda: file.read(4096), b""):
+    for chunk in iter(lambda: file.read(chunk_size), b""):
         sha256_hash.update(chunk)
     # Reset file pointer
     file.seek(0)
     return sha256_hash.hexdigest()
 
+@lru_cache(maxsize=4096)  # Called on every submit with the same few tasks
 def calculate_task_hash(file_hash: str, dimension: str = None) -> str:
     """Calculate task hash from file hash and dimension"""
     if dimension:
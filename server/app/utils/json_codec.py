@@ -0,0 +1,64 @@
+"""
+JSON encoding with an optional fast backend
+
+``orjson`` is used when it is installed (``pip install orjson``) unless
+``JSON_BACKEND=stdlib``; otherwise everything goes through the standard
+library. Both backends produce the same compact, non-ASCII-escaped text, so
+stored blobs and responses don't depend on which one wrote them.
+
+Only encoding is switched: for the long, mostly non-ASCII strings stored in
+``original_data`` the stdlib parser is faster than orjson (see the ``json``
+group of ``benchmarks.micro``), so ``loads`` always uses it.
+"""
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.core.logger import log
+from config.settings import settings
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+if settings.JSON_BACKEND == "stdlib":
+    orjson = None
+elif settings.JSON_BACKEND == "orjson" and orjson is None:
+    log.warning("JSON_BACKEND=orjson but orjson is not installed, using the standard library")
+
+backend = "orjson" if orjson is not None else "stdlib"
+
+JSONDecodeError = json.JSONDecodeError
+loads = json.loads
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _stdlib_dumps(value: Any, sort_keys: bool) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys)
+
+
+def dumps_bytes(value: Any, sort_keys: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=_ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+        except TypeError:
+            pass  # Values orjson rejects (e.g. integers beyond 64 bits) fall back to the stdlib
+    return _stdlib_dumps(value, sort_keys).encode("utf-8")
+
+
+def dumps(value: Any, sort_keys: bool = False) -> str:
+    """Serialize to JSON text"""
+    if orjson is not None:
+        return dumps_bytes(value, sort_keys).decode("utf-8")
+    return _stdlib_dumps(value, sort_keys)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the configured backend"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,194 @@
+"""
+Upload previews: header, column roles and a few sample rows
+
+Setting up a task only needs the schema, so previews never parse the whole
+file and never import pandas:
+
+* CSV is read with the csv module until the sample is full
+* xlsx sheets are streamed from the zip archive with iterparse, stopping after
+  the sample rows; shared strings are read only up to the highest index the
+  sample uses (openpyxl's read-only mode loads the whole table first)
+
+Cell values are the raw stored ones: numbers stay numbers and dates appear as
+Excel serial numbers, which is enough to pick columns.
+"""
+import csv
+import io
+import itertools
+import posixpath
+import zipfile
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+import xml.etree.ElementTree as ET
+
+CSV_ENCODINGS = ['utf-8-sig', 'gbk', 'gb2312', 'utf-16']
+
+# Long dialogs exceed the csv module's default 128KB field limit
+csv.field_size_limit(max(csv.field_size_limit(), 64 * 1024 * 1024))
+
+Sample = Tuple[List[str], List[Dict[str, Any]]]  # (columns, sample rows)
+
+
+class _SharedString(int):
+    """Index into the shared strings table, resolved after the sample is read"""
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _number(text: str) -> Any:
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            value = float(text)
+        except ValueError:
+            return text
+        return int(value) if value.is_integer() and "e" not in text.lower() else value
+
+
+def _records(header: List[Any], rows: List[List[Any]]) -> Sample:
+    columns = [str(column) if column is not None else f"Unnamed: {index}" for index, column in enumerate(header)]
+    return columns, [
+        {column: (row[index] if index < len(row) else None) for index, column in enumerate(columns)}
+        for row in rows
+    ]
+
+
+def preview_csv(file: BinaryIO, rows: int) -> Sample:
+    """Header and first rows of a CSV, trying the same encodings as the full parse"""
+    for encoding in CSV_ENCODINGS:
+        file.seek(0)
+        text = io.TextIOWrapper(file, encoding=encoding, newline="")
+        try:
+            reader = csv.reader(text)
+            header = next(reader, [])
+            sample = list(itertools.islice(reader, rows))
+        except UnicodeError:
+            continue
+        finally:
+            text.detach()  # Leave the upload's file open
+        values = [[_number(value) if value != "" else None for value in row] for row in sample]
+        return _records(header, values)
+    raise ValueError("Unable to decode CSV file with common encodings")
+
+
+def _column_index(ref: str) -> int:
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - 64
+    return index - 1
+
+
+def _text(element) -> str:
+    """Text of an inline or shared string, without phonetic runs"""
+    parts = []
+    for child in element:
+        name = _local(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(grandchild.text or "" for grandchild in child if _local(grandchild.tag) == "t")
+    return "".join(parts)
+
+
+def _cell_value(cell) -> Any:
+    cell_type = cell.get("t", "n")
+    if cell_type == "inlineStr":
+        inline = next((child for child in cell if _local(child.tag) == "is"), None)
+        return _text(inline) if inline is not None else None
+    raw = next((child.text for child in cell if _local(child.tag) == "v"), None)
+    if raw is None:
+        return None
+    if cell_type == "s":
+        return _SharedString(int(raw))
+    if cell_type == "b":
+        return raw == "1"
+    if cell_type in ("str", "e"):
+        return raw
+    return _number(raw)
+
+
+def _sheet_rows(archive: zipfile.ZipFile, path: str, limit: int) -> List[List[Any]]:
+    """First ``limit`` non-empty rows of a worksheet, stopping the parse there"""
+    rows = []
+    with archive.open(path) as stream:
+        for _, element in ET.iterparse(stream, events=("end",)):
+            if _local(element.tag) != "row":
+                continue
+            values: Dict[int, Any] = {}
+            for position, cell in enumerate(child for child in element if _local(child.tag) == "c"):
+                ref = cell.get("r")
+                values[_column_index(ref) if ref else position] = _cell_value(cell)
+            element.clear()
+            if values:
+                row = [None] * (max(values) + 1)
+                for index, value in values.items():
+                    row[index] = value
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+    return rows
+
+
+def _shared_strings(archive: zipfile.ZipFile, path: Optional[str], last_index: int) -> List[str]:
+    """Shared strings up to ``last_index``"""
+    strings: List[str] = []
+    if path is None or last_index < 0:
+        return strings
+    with archive.open(path) as stream:
+        for _, element in ET.iterparse(stream, events=("end",)):
+            if _local(element.tag) == "si":
+                strings.append(_text(element))
+                element.clear()
+                if len(strings) > last_index:
+                    break
+    return strings
+
+
+def _workbook_parts(archive: zipfile.ZipFile) -> Tuple[List[Tuple[str, str]], Optional[str]]:
+    """(sheet name, worksheet path) in workbook order, and the shared strings path"""
+    rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    targets, shared_strings = {}, None
+    for rel in rels:
+        target = rel.get("Target", "")
+        path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+        targets[rel.get("Id")] = path
+        if rel.get("Type", "").endswith("/sharedStrings"):
+            shared_strings = path
+    workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+    sheets = []
+    for element in workbook.iter():
+        if _local(element.tag) == "sheet":
+            rel_id = next(value for key, value in element.attrib.items() if _local(key) == "id")
+            sheets.append((element.get("name"), targets[rel_id]))
+    return sheets, shared_strings
+
+
+def preview_xlsx(file: BinaryIO, rows: int) -> List[Tuple[str, List[str], List[Dict[str, Any]]]]:
+    """(sheet name, columns, sample rows) of every sheet of an xlsx workbook"""
+    file.seek(0)
+    try:
+        archive = zipfile.ZipFile(file)
+    except zipfile.BadZipFile:
+        raise ValueError("Not an xlsx workbook")
+    with archive:
+        sheets, shared_strings_path = _workbook_parts(archive)
+        sheet_rows = [(name, _sheet_rows(archive, path, rows + 1)) for name, path in sheets]
+
+        # Strings are numbered in first-use order, so a sample only needs a prefix of the table
+        indexes = [value for _, sheet in sheet_rows for row in sheet for value in row
+                   if isinstance(value, _SharedString)]
+        strings = _shared_strings(archive, shared_strings_path, max(indexes, default=-1))
+
+    previews = []
+    for name, sheet in sheet_rows:
+        resolved = [
+            [strings[value] if isinstance(value, _SharedString) and value < len(strings) else value for value in row]
+            for row in sheet
+        ]
+        columns, sample = _records(resolved[0], resolved[1:]) if resolved else ([], [])
+        previews.append((name, columns, sample))
+    return previews
@@ -0,0 +1,184 @@
+"""
+Static serving of the built frontend
+
+The ``static/`` directory is scanned once at startup: every file gets a strong
+content-hash ETag, its cache policy and any precompressed ``.br``/``.gz``
+siblings, so requests are answered from that table without touching the
+filesystem metadata. ``index.html`` is held in memory (with compressed copies)
+because every client-side route falls back to it.
+
+Files under ``assets/`` carry content hashes in their names (Vite output) and
+are cached as immutable for a year; everything else must be revalidated, which
+costs a 304 thanks to the ETag.
+
+Precompressed variants are produced at build time:
+    python -m app.utils.static_files ./static
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # Optional dependency: only gzip variants without it
+    brotli = None
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+HASHED_DIR = "assets/"
+INDEX = "index.html"
+
+# Encodings we can serve, most preferred first, with their file suffixes
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".mjs", ".css", ".json", ".svg", ".txt", ".xml", ".map", ".wasm", ".ico"}
+MIN_COMPRESS_SIZE = 1024
+
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}"""
+    accepted = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+class StaticEntry:
+    __slots__ = ("path", "media_type", "etag", "cache_control", "stat", "variants")
+
+    def __init__(self, path: Path, relative: str, digest: str):
+        self.path = str(path)
+        self.media_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+        self.etag = f'"{digest}"'
+        self.cache_control = IMMUTABLE_CACHE if relative.startswith(HASHED_DIR) else REVALIDATE_CACHE
+        self.stat = os.stat(path)
+        self.variants: Dict[str, tuple] = {}  # coding -> (path, stat)
+
+
+class StaticSite:
+    def __init__(self, static_dir: Path):
+        self.static_dir = static_dir
+        self.entries: Dict[str, StaticEntry] = {}
+        self.index: Optional[bytes] = None
+        self.index_etag = ""
+        self.index_variants: Dict[str, bytes] = {}
+        self.scan()
+
+    def scan(self):
+        """Index every file of the static directory (call again after a redeploy)"""
+        entries = {}
+        for path in self.static_dir.rglob("*"):
+            if not path.is_file() or path.suffix in (".br", ".gz"):
+                continue
+            relative = path.relative_to(self.static_dir).as_posix()
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()[:32]
+            entry = StaticEntry(path, relative, digest)
+            for coding, suffix in ENCODINGS:
+                variant = path.with_name(path.name + suffix)
+                if variant.is_file() and variant.stat().st_mtime >= entry.stat.st_mtime:
+                    entry.variants[coding] = (str(variant), os.stat(variant))
+            entries[relative] = entry
+        self.entries = entries
+
+        index_path = self.static_dir / INDEX
+        if index_path.is_file():
+            self.index = index_path.read_bytes()
+            self.index_etag = entries[INDEX].etag
+            self.index_variants = {"gzip": gzip.compress(self.index, compresslevel=9)}
+            if brotli is not None:
+                self.index_variants["br"] = brotli.compress(self.index)
+        else:
+            self.index = None
+
+    @staticmethod
+    def _negotiate(request: Request, available) -> Optional[str]:
+        accepted = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for coding, _ in ENCODINGS:
+            if coding in available and accepted.get(coding, 0) > 0:
+                return coding
+        return None
+
+    def _not_modified(self, etag: str, cache_control: str) -> Response:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+    def index_response(self, request: Request) -> Response:
+        coding = self._negotiate(request, self.index_variants)
+        etag = self.index_etag if coding is None else f'{self.index_etag[:-1]}-{coding}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return self._not_modified(etag, REVALIDATE_CACHE)
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE, "Vary": "Accept-Encoding"}
+        if coding is None:
+            return Response(self.index, media_type="text/html", headers=headers)
+        headers["Content-Encoding"] = coding
+        return Response(self.index_variants[coding], media_type="text/html", headers=headers)
+
+    def response(self, request: Request, relative: str) -> Optional[Response]:
+        """Response for a static file, or None if the path isn't one"""
+        if relative == INDEX and self.index is not None:
+            return self.index_response(request)
+        entry = self.entries.get(relative)
+        if entry is None:
+            return None
+
+        coding = self._negotiate(request, entry.variants)
+        # Each encoding is a different representation, so it gets its own strong ETag
+        etag = entry.etag if coding is None else f'{entry.etag[:-1]}-{coding}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return self._not_modified(etag, entry.cache_control)
+        headers = {"ETag": etag, "Cache-Control": entry.cache_control}
+        if entry.variants:
+            headers["Vary"] = "Accept-Encoding"
+        path, stat = entry.path, entry.stat
+        if coding is not None:
+            path, stat = entry.variants[coding]
+            headers["Content-Encoding"] = coding
+        return FileResponse(path, media_type=entry.media_type, headers=headers, stat_result=stat)
+
+
+def precompress(static_dir: Path) -> int:
+    """Write .gz (and .br with brotli installed) next to every compressible file; returns files written"""
+    written = 0
+    for path in static_dir.rglob("*"):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        data = path.read_bytes()
+        if len(data) < MIN_COMPRESS_SIZE:
+            continue
+        variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(data)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(data):
+                path.with_name(path.name + suffix).write_bytes(compressed)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1] if len(sys.argv) > 1 else "static")
+    if not target.is_dir():
+        sys.exit(f"Not a directory: {target}")
+    print(f"Wrote {precompress(target)} compressed files under {target}"
+          + ("" if brotli is not None else " (gzip only, install brotli for .br)"))
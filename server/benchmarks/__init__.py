@@ -0,0 +1,5 @@
+"""
+Benchmark suites for the annotation backend
+
+Run from the server directory, e.g. ``python -m benchmarks.load_test``.
+"""
@@ -0,0 +1,78 @@
+"""
+Shared helpers for benchmark reporting
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Summarize latencies (seconds) into millisecond statistics"""
+    values = sorted(latencies)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "meanMs": round(sum(values) / len(values) * 1000, 3),
+        "p50Ms": round(percentile(values, 50) * 1000, 3),
+        "p95Ms": round(percentile(values, 95) * 1000, 3),
+        "p99Ms": round(percentile(values, 99) * 1000, 3),
+        "maxMs": round(values[-1] * 1000, 3),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment_info() -> Dict[str, Any]:
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpuCount": os.cpu_count(),
+        "commit": git_revision(),
+    }
+
+
+def write_report(suite: str, config: Dict[str, Any], results: Any, output: Optional[str] = None) -> Path:
+    """Write a benchmark report as JSON and return its path"""
+    report = {
+        "suite": suite,
+        "timestamp": datetime.now().isoformat(),
+        "environment": environment_info(),
+        "config": config,
+        "results": results,
+    }
+    if output:
+        path = Path(output)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        commit = report["environment"]["commit"] or "nogit"
+        path = RESULTS_DIR / f"{suite}-{commit}-{stamp}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
@@ -0,0 +1,53 @@
+"""
+Compare two benchmark reports
+
+Usage (from the server directory):
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def flatten(value: Any, prefix: str = "") -> Dict[str, float]:
+    """Flatten nested report results into dotted metric names"""
+    flat = {}
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            key = item.get("name", index) if isinstance(item, dict) else index
+            flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        flat[prefix] = float(value)
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Highlight changes above this percentage")
+    args = parser.parse_args()
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    candidate = json.loads(Path(args.candidate).read_text(encoding="utf-8"))
+    print(f"baseline:  {baseline['environment'].get('commit')} ({baseline['timestamp']})")
+    print(f"candidate: {candidate['environment'].get('commit')} ({candidate['timestamp']})\n")
+
+    old = flatten(baseline["results"])
+    new = flatten(candidate["results"])
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        delta = ((after - before) / before * 100) if before else 0.0
+        marker = "  <<" if abs(delta) >= args.threshold else ""
+        print(f"{key:<55} {before:>12.3f} {after:>12.3f} {delta:>+8.1f}%{marker}")
+
+
+if __name__ == "__main__":
+    main()
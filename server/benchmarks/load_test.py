@@ -0,0 +1,289 @@
+"""
+End-to-end load test for the annotation API
+
+Spins up the FastAPI app in-process against a temporary SQLite file, seeds it
+with synthetic annotations and drives a weighted mix of requests at a fixed
+concurrency. Per-endpoint throughput and latency percentiles are printed and
+stored as JSON under ``benchmarks/results`` for comparison across commits.
+
+Usage (from the server directory):
+    python -m benchmarks.load_test --rows 5000 --dimensions 3 --annotators 10 \
+        --requests 2000 --concurrency 32 --mix submit=50,progress=25,stats=15,export=5,upload=5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import summarize_latencies, write_report
+
+DEFAULT_MIX = "submit=50,progress=25,stats=15,export=5,upload=5"
+OPERATIONS = ("submit", "progress", "stats", "export", "upload")
+FILE_HASH = "bench" + "0" * 59
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def random_text(rng: random.Random, size: int) -> str:
+    alphabet = string.ascii_letters + " " * 8
+    return "".join(rng.choices(alphabet, k=size))
+
+
+def make_original_data(rng: random.Random, case_id: int, data_size: int) -> dict:
+    half = max(1, data_size // 2)
+    return {
+        "question": f"Q{case_id} " + random_text(rng, half),
+        "answer": random_text(rng, half),
+        "judgement": rng.choice(["good", "bad"]),
+        "reasoning": random_text(rng, 64),
+    }
+
+
+def dimension_names(count: int) -> list:
+    return [f"dim{i}" for i in range(count)]
+
+
+def seed_database(args, db_path: str, rng: random.Random):
+    """Bulk-insert synthetic annotations directly through sqlite3"""
+    from app.utils.hash import calculate_task_hash
+
+    dimensions = dimension_names(args.dimensions)
+    base_time = datetime.now() - timedelta(days=7)
+    conn = sqlite3.connect(db_path)
+    rows = []
+    for dimension in dimensions:
+        task_hash = calculate_task_hash(FILE_HASH, dimension)
+        seq = 0
+        for case_id in range(args.rows):
+            original = json.dumps(make_original_data(rng, case_id, args.data_size), ensure_ascii=False)
+            for annotator in range(args.annotators):
+                if rng.random() >= args.seed_fraction:
+                    continue
+                stamp = (base_time + timedelta(seconds=len(rows))).isoformat()
+                seq += 1
+                rows.append((
+                    str(uuid.UUID(int=rng.getrandbits(128))), task_hash, FILE_HASH, "bench.csv", dimension,
+                    case_id, f"fp{annotator}", f"annotator{annotator}", original, "good", "llm reasoning",
+                    rng.choice(["agree", "disagree", "skip"]), None, None, "single-turn", "rule-based",
+                    None, None, stamp, stamp, seq,
+                ))
+    conn.executemany(
+        """
+        INSERT INTO annotations (
+            id, task_hash, file_hash, filename, dimension, case_id,
+            browser_fingerprint, account_name, original_data,
+            llm_judgement, llm_reasoning, human_action,
+            human_judgement, human_reasoning, annotation_type,
+            evaluation_type, labels, metadata, created_at, updated_at, seq
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def make_upload_csv(rng: random.Random, rows: int, data_size: int) -> bytes:
+    lines = ["question,answer,judgement,reasoning"]
+    for case_id in range(rows):
+        data = make_original_data(rng, case_id, data_size)
+        lines.append(",".join(f'"{data[key]}"' for key in ("question", "answer", "judgement", "reasoning")))
+    return "\n".join(lines).encode("utf-8")
+
+
+class Workload:
+    def __init__(self, args, rng: random.Random):
+        self.args = args
+        self.rng = rng
+        self.dimensions = dimension_names(args.dimensions)
+        self.upload_body = make_upload_csv(rng, args.upload_rows, args.data_size)
+
+    async def submit(self, client):
+        case_id = self.rng.randrange(self.args.rows)
+        annotator = self.rng.randrange(self.args.annotators)
+        payload = {
+            "itemId": str(case_id),
+            "action": self.rng.choice(["agree", "disagree", "skip"]),
+            "humanJudgement": None,
+            "humanReasoning": None,
+            "dimension": self.rng.choice(self.dimensions),
+            "completeDataRow": {
+                "file_hash": FILE_HASH,
+                "filename": "bench.csv",
+                "case_id": case_id,
+                "account_name": f"annotator{annotator}",
+                "original_data": make_original_data(self.rng, case_id, self.args.data_size),
+                "annotation_type": "single-turn",
+                "evaluation_type": "rule-based",
+            },
+        }
+        return await client.post(
+            "/api/projects/bench/annotations",
+            json=payload,
+            headers={"X-Browser-Fingerprint": f"fp{annotator}"},
+        )
+
+    async def progress(self, client):
+        params = {"file_hash": FILE_HASH, "dimension": self.rng.choice(self.dimensions)}
+        if self.rng.random() < 0.5:
+            params["fingerprint"] = f"fp{self.rng.randrange(self.args.annotators)}"
+        return await client.get("/api/progress", params=params)
+
+    async def stats(self, client):
+        params = {"file_hash": FILE_HASH}
+        if self.rng.random() < 0.5:
+            params["dimension"] = self.rng.choice(self.dimensions)
+        return await client.get("/api/analytics/stats", params=params)
+
+    async def export(self, client):
+        params = {"file_hash": FILE_HASH, "dimension": self.rng.choice(self.dimensions)}
+        return await client.get("/api/export", params=params)
+
+    async def upload(self, client):
+        files = {"file": ("bench.csv", self.upload_body, "text/csv")}
+        return await client.post("/api/upload", files=files)
+
+
+async def drive(args, client, workload: Workload, rng: random.Random):
+    weights = parse_mix(args.mix)
+    names = list(weights)
+    schedule = rng.choices(names, weights=[weights[name] for name in names], k=args.requests)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    rejected = defaultdict(int)
+    cursor = iter(schedule)
+
+    async def worker():
+        for name in cursor:
+            start = time.perf_counter()
+            try:
+                response = await getattr(workload, name)(client)
+                status = response.status_code
+            except Exception:
+                status = None
+            latencies[name].append(time.perf_counter() - start)
+            if status == 429:
+                # Shed by admission control, not a failure of the endpoint
+                rejected[name] += 1
+            elif status is None or status >= 400:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in names:
+        summary = summarize_latencies(latencies[name])
+        summary["errors"] = errors[name]
+        summary["rejected"] = rejected[name]
+        summary["throughputRps"] = round(len(latencies[name]) / elapsed, 2) if elapsed else 0.0
+        endpoints[name] = summary
+    return {
+        "elapsedSeconds": round(elapsed, 3),
+        "totalRequests": args.requests,
+        "throughputRps": round(args.requests / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+async def run(args):
+    import httpx
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="annotation-bench-")
+    db_path = os.path.join(workdir, "annotations.db")
+
+    # Settings are read at import time, so configure the environment first
+    os.environ["DATABASE_PATH"] = db_path
+    os.environ["LOG_PATH"] = os.path.join(workdir, "logs")
+    os.environ["EXPORT_DIR"] = os.path.join(workdir, "exports")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ["DEBUG"] = "false"
+
+    from app.core import db
+    from app.main import app
+    from app.services import export_jobs
+    from app.storage import storage
+
+    await db.init_tables()
+    seeded = seed_database(args, db_path, rng)
+    await storage.init()
+    await export_jobs.init()
+    print(f"Seeded {seeded} annotations into {db_path}")
+
+    workload = Workload(args, rng)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        # Warm up connections and import paths before measuring
+        for name in parse_mix(args.mix):
+            await getattr(workload, name)(client)
+        results = await drive(args, client, workload, rng)
+
+    # No lifespan runs under ASGITransport, so release pooled connections here
+    await export_jobs.close()
+    await storage.close()
+    await db.close()
+
+    results["seededAnnotations"] = seeded
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="Cases per dimension")
+    parser.add_argument("--dimensions", type=int, default=3, help="Dimensions per file")
+    parser.add_argument("--annotators", type=int, default=10, help="Distinct annotators")
+    parser.add_argument("--data-size", type=int, default=1024, help="Approximate original_data size in bytes")
+    parser.add_argument("--seed-fraction", type=float, default=0.5,
+                        help="Fraction of (case, dimension, annotator) combinations pre-annotated")
+    parser.add_argument("--upload-rows", type=int, default=500, help="Rows in the uploaded CSV")
+    parser.add_argument("--requests", type=int, default=1000, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted operation mix")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for reproducible runs")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/...)")
+    args = parser.parse_args()
+    parse_mix(args.mix)
+
+    results = asyncio.run(run(args))
+
+    print(f"\n{'endpoint':<10} {'count':>7} {'err':>5} {'429':>5} {'rps':>9} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}")
+    for name, summary in results["endpoints"].items():
+        print(
+            f"{name:<10} {summary['count']:>7} {summary['errors']:>5} {summary.get('rejected', 0):>5} "
+            f"{summary['throughputRps']:>9} "
+            f"{summary.get('p50Ms', 0):>9} {summary.get('p95Ms', 0):>9} {summary.get('p99Ms', 0):>9}"
+        )
+    print(f"\nTotal: {results['totalRequests']} requests in {results['elapsedSeconds']}s "
+          f"({results['throughputRps']} req/s)")
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    path = write_report("load_test", config, results, args.output)
+    print(f"Report written to {path}")
+
+
+if __name__ == "__main__":
+    main()
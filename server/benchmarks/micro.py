@@ -0,0 +1,329 @@
+"""
+Micro-benchmarks for ingestion, hashing and serialization hot paths
+
+Each case is timed over several repeats (min/median wall time) and then run
+once more under tracemalloc to capture peak Python memory. Results are stored
+as JSON under ``benchmarks/results`` for comparison across commits.
+
+Usage (from the server directory):
+    python -m benchmarks.micro                 # all groups
+    python -m benchmarks.micro --group parse --group hash --rows 20000
+    python -m benchmarks.micro --group submit  # per-submit validation and record building
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import random
+import statistics
+import string
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import write_report
+
+GROUPS = ("parse", "hash", "export", "json", "submit")
+
+
+class Case:
+    def __init__(self, group: str, name: str, func: Callable[[], object], size: int = 0):
+        self.group = group
+        self.name = name
+        self.func = func
+        self.size = size  # Bytes or rows processed per call, for throughput
+
+    def run(self, repeat: int) -> Dict[str, object]:
+        self.func()  # Warm-up (imports, caches)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            self.func()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        self.func()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        median = statistics.median(timings)
+        result = {
+            "name": f"{self.group}.{self.name}",
+            "minMs": round(min(timings) * 1000, 3),
+            "medianMs": round(median * 1000, 3),
+            "peakMemoryKb": round(peak / 1024, 1),
+        }
+        if self.size:
+            result["unitsPerSecond"] = round(self.size / median, 1) if median else 0.0
+        return result
+
+
+def random_text(rng: random.Random, size: int) -> str:
+    alphabet = string.ascii_letters + " " * 8 + "标注数据评测"
+    return "".join(rng.choices(alphabet, k=size))
+
+
+def make_records(rng: random.Random, rows: int, columns: int, cell_size: int) -> List[Dict[str, str]]:
+    names = ["question", "answer", "judgement", "reasoning"] + [f"extra_{i}" for i in range(max(0, columns - 4))]
+    return [{name: random_text(rng, cell_size) for name in names[:columns]} for _ in range(rows)]
+
+
+def write_csv(path: str, records: List[Dict[str, str]], encoding: str):
+    with open(path, "w", newline="", encoding=encoding, errors="ignore") as handle:
+        writer = csv.DictWriter(handle, fieldnames=list(records[0]))
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def write_xlsx(path: str, records: List[Dict[str, str]]):
+    import pandas as pd
+    pd.DataFrame(records).to_excel(path, index=False, engine="openpyxl")
+
+
+def preview(func, path: str):
+    with open(path, "rb") as handle:
+        return func(handle, 5)
+
+
+def parse_cases(args, rng: random.Random, workdir: str) -> List[Case]:
+    from app.utils.file_parser import parse_uploaded_file
+    from app.utils.preview import preview_csv, preview_xlsx
+
+    long_records = make_records(rng, args.rows, 6, args.cell_size)
+    wide_records = make_records(rng, max(1, args.rows // 20), 120, args.cell_size)
+    layouts = {"long": long_records, "wide": wide_records}
+
+    cases = []
+    for layout, records in layouts.items():
+        for encoding in ("utf-8", "gbk"):
+            path = os.path.join(workdir, f"{layout}-{encoding}.csv")
+            write_csv(path, records, encoding)
+            cases.append(Case(
+                "parse", f"csv_{encoding}_{layout}",
+                lambda path=path: parse_uploaded_file(path, "data.csv"),
+                size=len(records),
+            ))
+            # Upload preview: header and 5 rows, independent of file size
+            cases.append(Case(
+                "parse", f"preview_csv_{encoding}_{layout}",
+                lambda path=path: preview(preview_csv, path),
+            ))
+        path = os.path.join(workdir, f"{layout}.xlsx")
+        write_xlsx(path, records)
+        cases.append(Case(
+            "parse", f"xlsx_{layout}",
+            lambda path=path: parse_uploaded_file(path, "data.xlsx"),
+            size=len(records),
+        ))
+        cases.append(Case(
+            "parse", f"preview_xlsx_{layout}",
+            lambda path=path: preview(preview_xlsx, path),
+        ))
+    return cases
+
+
+def hash_cases(args, rng: random.Random) -> List[Case]:
+    from app.utils.hash import calculate_file_hash
+
+    payload = rng.randbytes(args.hash_mb * 1024 * 1024)
+    cases = []
+    for chunk_size in (4096, 65536, 1024 * 1024):
+        cases.append(Case(
+            "hash", f"sha256_chunk_{chunk_size}",
+            lambda chunk_size=chunk_size: calculate_file_hash(io.BytesIO(payload), chunk_size),
+            size=len(payload),
+        ))
+    return cases
+
+
+def export_rows(rng: random.Random, rows: int, cell_size: int) -> List[Dict[str, object]]:
+    records = make_records(rng, rows, 6, cell_size)
+    return [
+        {
+            "id": f"id-{index}",
+            "case_id": index,
+            "browser_fingerprint": f"fp{index % 10}",
+            "account_name": f"annotator{index % 10}",
+            "original_data": json.dumps(record, ensure_ascii=False),
+            "llm_judgement": "good",
+            "llm_reasoning": random_text(rng, cell_size),
+            "human_action": "agree",
+            "human_judgement": None,
+            "human_reasoning": random_text(rng, cell_size // 2),
+            "annotation_type": "single-turn",
+            "evaluation_type": "rule-based",
+            "dimension": "dim0",
+            "created_at": "2024-01-01T00:00:00",
+            "updated_at": "2024-01-01T00:00:00",
+        }
+        for index, record in enumerate(records)
+    ]
+
+
+def export_cases(args, rng: random.Random) -> List[Case]:
+    from app.services import render_csv, safe_str
+
+    rows = export_rows(rng, args.rows, args.cell_size)
+    values = [value for row in rows for value in row.values()]
+    return [
+        Case("export", "safe_str", lambda: [safe_str(value) for value in values], size=len(values)),
+        Case("export", "render_csv", lambda: render_csv(rows), size=len(rows)),
+        Case("export", "render_csv_encode", lambda: render_csv(rows).encode("utf-8-sig"), size=len(rows)),
+    ]
+
+
+def progress_payload(case_count: int) -> Dict[str, object]:
+    return {
+        "totalRows": case_count,
+        "annotatedRows": case_count,
+        "annotatedCaseIds": list(range(case_count)),
+        "progress": 100.0,
+    }
+
+
+def stats_payload(rng: random.Random, annotators: int) -> Dict[str, object]:
+    return {
+        "total": 100000, "completed": 90000, "agreed": 60000, "disagreed": 20000, "skipped": 10000,
+        "agreementRate": 66.67,
+        "byAnnotator": [
+            {
+                "fingerprint": f"fp{index:08d}", "account": f"标注员{index}", "name": f"标注员{index}",
+                "total": rng.randint(0, 5000), "agree": rng.randint(0, 3000),
+                "disagree": rng.randint(0, 1000), "skip": rng.randint(0, 500),
+            }
+            for index in range(annotators)
+        ],
+    }
+
+
+def json_cases(args, rng: random.Random) -> List[Case]:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from app.models import AnnotationStats, ProgressResponse
+    from app.utils import json_codec
+
+    cases = []
+    for cell_size in (256, 4096, 65536):
+        original = make_records(rng, 1, 6, cell_size)[0]
+        text = json.dumps(original, ensure_ascii=False)
+        cases.append(Case(
+            "json", f"dumps_original_data_{cell_size}",
+            lambda original=original: json.dumps(original, ensure_ascii=False),
+            size=1,
+        ))
+        cases.append(Case(
+            "json", f"codec_dumps_original_data_{cell_size}",
+            lambda original=original: json_codec.dumps(original),
+            size=1,
+        ))
+        cases.append(Case("json", f"loads_original_data_{cell_size}", lambda text=text: json.loads(text), size=1))
+
+    # Response rendering: FastAPI's default path (validate against the response
+    # model, jsonable_encoder, stdlib JSONResponse) vs the codec response
+    responses = (
+        ("progress_100k", ProgressResponse, progress_payload(100_000)),
+        ("stats_1k_annotators", AnnotationStats, stats_payload(rng, 1000)),
+    )
+    for name, model, payload in responses:
+        cases.append(Case(
+            "json", f"default_response_{name}",
+            lambda model=model, payload=payload: JSONResponse(
+                jsonable_encoder(model.model_validate(payload))
+            ).body,
+            size=1,
+        ))
+        cases.append(Case(
+            "json", f"codec_response_{name}",
+            lambda payload=payload: json_codec.FastJSONResponse(payload).body,
+            size=1,
+        ))
+    return cases
+
+
+def submit_bodies(rng: random.Random, count: int, cell_size: int) -> List[bytes]:
+    """Request bodies shaped like the workspace's single-dimension submits"""
+    bodies = []
+    for index, record in enumerate(make_records(rng, count, 4, cell_size)):
+        record.update({"llm_judgement": "good", "llm_reasoning": random_text(rng, cell_size)})
+        bodies.append(json.dumps({
+            "itemId": str(index), "action": "agree", "humanJudgement": None, "humanReasoning": None,
+            "dimension": "dim0",
+            "completeDataRow": {
+                "file_hash": "f" * 64, "filename": "cases.xlsx", "case_id": index, "original_data": record,
+                "annotation_type": "single-turn", "evaluation_type": "rule-based", "account_name": "annotator",
+                "labels": ["a", "b"], "metadata": {"project_id": "p", "item_id": str(index)},
+            },
+        }, ensure_ascii=False).encode("utf-8"))
+    return bodies
+
+
+def submit_cases(args, rng: random.Random) -> List[Case]:
+    from app.api.annotations import build_record, extract_case, payload_fingerprint
+    from app.models import AnnotationSubmitRequest
+
+    bodies = submit_bodies(rng, 1000, args.cell_size)
+    # FastAPI parses the body with json.loads and validates the resulting dict
+    submissions = [AnnotationSubmitRequest.model_validate(json.loads(body)) for body in bodies]
+    now = "2024-01-01T00:00:00"
+    return [
+        Case("submit", "validate_request", lambda: [
+            AnnotationSubmitRequest.model_validate(json.loads(body)) for body in bodies
+        ], size=len(bodies)),
+        Case("submit", "build_record", lambda: [
+            build_record(extract_case(submission.completeDataRow), submission.dimension, submission.action.value,
+                         submission.humanJudgement, submission.humanReasoning, "fp", now).values()
+            for submission in submissions
+        ], size=len(bodies)),
+        Case("submit", "payload_fingerprint", lambda: [
+            payload_fingerprint("p", body) for body in bodies
+        ], size=len(bodies)),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--group", action="append", choices=GROUPS, help="Groups to run (default: all)")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows for long sheets and exports")
+    parser.add_argument("--cell-size", type=int, default=200, help="Characters per cell")
+    parser.add_argument("--hash-mb", type=int, default=16, help="Payload size for hashing")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per case")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/...)")
+    args = parser.parse_args()
+    groups = args.group or list(GROUPS)
+
+    workdir = tempfile.mkdtemp(prefix="annotation-micro-")
+    os.environ.setdefault("LOG_PATH", os.path.join(workdir, "logs"))
+    os.environ.setdefault("DATABASE_PATH", os.path.join(workdir, "annotations.db"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    rng = random.Random(args.seed)
+    builders = {
+        "parse": lambda: parse_cases(args, rng, workdir),
+        "hash": lambda: hash_cases(args, rng),
+        "export": lambda: export_cases(args, rng),
+        "json": lambda: json_cases(args, rng),
+        "submit": lambda: submit_cases(args, rng),
+    }
+
+    results = []
+    print(f"{'case':<40} {'min ms':>10} {'median ms':>10} {'peak KiB':>10}")
+    for group in groups:
+        for case in builders[group]():
+            result = case.run(args.repeat)
+            results.append(result)
+            print(f"{result['name']:<40} {result['minMs']:>10} {result['medianMs']:>10} {result['peakMemoryKb']:>10}")
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    path = write_report("micro", config, results, args.output)
+    print(f"\nReport written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Cold-start benchmark for the annotation API
+
+Two measurements, each in fresh interpreters against a temporary data
+directory:
+
+* import profile: ``python -X importtime -c "import app.main"``, reported as
+  the slowest modules by cumulative and self time
+* time to healthy: launch uvicorn and poll ``/health`` until it answers,
+  measured from process spawn
+
+The run fails (exit code 1) when the median time to healthy exceeds
+``--budget-ms``, so it can guard against heavy imports creeping back into the
+startup path. Results are stored as JSON under ``benchmarks/results``.
+
+Usage (from the server directory):
+    python -m benchmarks.startup --runs 5 --budget-ms 1500
+"""
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import write_report
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+IMPORTTIME_PATTERN = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+# Imports that should stay off the startup path
+LAZY_MODULES = ("pandas", "openpyxl", "duckdb", "pyarrow")
+
+
+def server_env(workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_PATH": os.path.join(workdir, "annotations.db"),
+        "LOG_PATH": os.path.join(workdir, "logs"),
+        "EXPORT_DIR": os.path.join(workdir, "exports"),
+        "BACKUP_DIR": os.path.join(workdir, "backups"),
+        "BACKUP_INTERVAL_SECONDS": "0",
+        "MAINTENANCE_ARCHIVE_DIR": os.path.join(workdir, "archives"),
+        "MAINTENANCE_INTERVAL_SECONDS": "0",
+        "LOG_LEVEL": "WARNING",
+        "PYTHONPATH": str(SERVER_DIR),
+    })
+    return env
+
+
+def import_profile(env: Dict[str, str]) -> List[Dict[str, object]]:
+    """Per-module import times (microseconds) of importing app.main"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=SERVER_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append({
+                "module": name,
+                "depth": len(indent) // 2,
+                "selfMs": round(int(self_us) / 1000, 2),
+                "cumulativeMs": round(int(cumulative_us) / 1000, 2),
+            })
+    return modules
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_healthy(env: Dict[str, str], timeout: float) -> float:
+    """Seconds from spawning uvicorn until /health returns 200"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {process.returncode} before becoming healthy")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"Server not healthy after {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="Budget for median time to healthy")
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to report")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for one start")
+    parser.add_argument("--output", help="Report path (default: benchmarks/results/...)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="annotation-startup-")
+    env = server_env(workdir)
+
+    modules = import_profile(env)
+    total = next((m["cumulativeMs"] for m in modules if m["module"] == "app.main"), None)
+    eager = sorted({m["module"].split(".")[0] for m in modules} & set(LAZY_MODULES))
+    slowest = sorted(modules, key=lambda m: m["cumulativeMs"], reverse=True)[:args.top]
+    app_modules = sorted(
+        (m for m in modules if m["module"].startswith(("app", "config"))),
+        key=lambda m: m["selfMs"], reverse=True,
+    )[:args.top]
+
+    print(f"import app.main: {total} ms")
+    print(f"\n{'slowest imports (cumulative)':<50} {'cum ms':>10} {'self ms':>10}")
+    for module in slowest:
+        print(f"{module['module']:<50} {module['cumulativeMs']:>10} {module['selfMs']:>10}")
+    print(f"\n{'application modules (self)':<50} {'cum ms':>10} {'self ms':>10}")
+    for module in app_modules:
+        print(f"{module['module']:<50} {module['cumulativeMs']:>10} {module['selfMs']:>10}")
+    if eager:
+        print(f"\nWARNING: imported at startup but expected lazily: {', '.join(eager)}")
+
+    timings = [time_to_healthy(env, args.timeout) * 1000 for _ in range(args.runs)]
+    median = statistics.median(timings)
+    within_budget = median <= args.budget_ms
+    print(f"\ntime to healthy: min {min(timings):.0f} ms, median {median:.0f} ms, "
+          f"max {max(timings):.0f} ms (budget {args.budget_ms:.0f} ms: {'ok' if within_budget else 'EXCEEDED'})")
+
+    results = {
+        "importAppMainMs": total,
+        "eagerHeavyModules": eager,
+        "slowestImports": slowest,
+        "appModules": app_modules,
+        "timeToHealthyMs": [round(value, 1) for value in timings],
+        "timeToHealthyMedianMs": round(median, 1),
+        "budgetMs": args.budget_ms,
+        "withinBudget": within_budget,
+    }
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    path = write_report("startup", config, results, args.output)
+    print(f"\nReport written to {path}")
+    sys.exit(0 if within_budget else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Configuration settings for the annotation backend service
 """
 from pydantic_settings import BaseSettings
 from pathlib import Path
+from typing import Optional
 import os
 
 class Settings(BaseSettings):
@@ -11,6 +12,9 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Annotation Backend Service"
     VERSION: str = "1.0.0"
     DEBUG: bool = True
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WORKERS: int = 1  # >1 starts multiple worker processes (reload and dispatching are disabled, sharding refused)
     
     # CORS Settings
     CORS_ORIGINS: list = ["*"]  # In production, specify exact origins
@@ -22,6 +26,27 @@ class Settings(BaseSettings):
     # Database Settings
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "./data/annotations.db")
     DATABASE_URL: str = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+    DB_BUSY_TIMEOUT_MS: int = 5000  # How long to wait on locks held by other workers
+    DB_READ_POOL_SIZE: int = 4  # Read-only connections kept open per worker
+    DB_WRITE_BATCH_SIZE: int = 64  # Max write units per group commit
+    DB_WRITE_BATCH_WAIT_MS: float = 0.0  # Extra wait to grow a batch (0 = commit as soon as idle)
+    
+    # Storage mode: "single" keeps everything in DATABASE_PATH, "sharded" gives
+    # every file_hash its own SQLite file under SHARD_DIR
+    STORAGE_MODE: str = "single"
+    SHARD_DIR: str = "./data/shards"
+    SHARD_MAX_OPEN: int = 32  # Open shard handles kept in the LRU
+    
+    # Storage backend serving analytics/export reads: "sqlite" or "duckdb"
+    # (a columnar replica synced from SQLite, requires the duckdb package)
+    STORAGE_BACKEND: str = "sqlite"
+    DUCKDB_PATH: str = "./data/analytics.duckdb"
+    ANALYTICS_SYNC_INTERVAL: float = 5.0  # Seconds between incremental replica syncs
+    
+    # Slow query log (ring buffer dumped by /api/admin/slow-queries)
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_SIZE: int = 200
     
     # Logging Settings
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -30,18 +55,94 @@ class Settings(BaseSettings):
     LOG_ROTATION: str = "10 MB"
     LOG_RETENTION: str = "30 days"
     LOG_FORMAT: str = "{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}"
+    LOG_JSON: bool = False  # Emit structured JSON records instead of text lines
+    LOG_CONSOLE_ENQUEUE: bool = True  # Write console logs from a background queue
+    LOG_PAYLOADS: bool = False  # Dump full request payloads at DEBUG level
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0  # Fraction of verbose debug logs kept per route
+    LOG_SAMPLE_RATES: dict = {}  # Per-route overrides, e.g. {"submit": 0.01}
+    
+    # Export Settings
+    EXPORT_DIR: str = "./data/exports"
+    EXPORT_CACHE_MAX_BYTES: int = 1024 * 1024 * 1024  # Artifact cache budget (1GB)
+    EXPORT_JOB_TTL_SECONDS: float = 3600.0  # How long finished jobs stay queryable
+    
+    # Backup Settings
+    BACKUP_DIR: str = "./data/backups"
+    BACKUP_INTERVAL_SECONDS: float = 3600.0  # Scheduled snapshot interval (0 disables the scheduler)
+    BACKUP_RETENTION: int = 24  # Snapshots kept
+    BACKUP_PAGES_PER_STEP: int = 1024  # Pages copied per online backup step
+    BACKUP_STEP_SLEEP_MS: float = 10.0  # Pause between steps, keeps I/O off the request path
+    BACKUP_MAX_RESTARTS: int = 3  # Restarts caused by concurrent writes before using VACUUM INTO
+    
+    # Maintenance Settings
+    MAINTENANCE_INTERVAL_SECONDS: float = 3600.0  # How often the scheduler checks for work (0 disables it)
+    MAINTENANCE_WINDOW: str = "02:00-05:00"  # Local low-traffic window for scheduled runs ("" = any time)
+    MAINTENANCE_ARCHIVE_DIR: str = "./data/archives"
+    MAINTENANCE_ARCHIVE_AFTER_DAYS: float = 30.0  # Tasks without writes this long are archived (0 disables archival)
+    MAINTENANCE_ARCHIVE_FORMAT: str = "auto"  # "parquet" (needs pyarrow), "jsonl" (gzip column chunks) or "auto"
+    MAINTENANCE_ARCHIVE_MAX_TASKS: int = 10  # Tasks archived per run
+    MAINTENANCE_PAGES_PER_STEP: int = 256  # Free pages reclaimed per incremental vacuum step
+    MAINTENANCE_STEP_SLEEP_MS: float = 50.0  # Pause between vacuum steps and archive batches
+    MAINTENANCE_MAX_PAGES_PER_RUN: int = 65536  # I/O budget of one run (256MB of 4KB pages)
+    MAINTENANCE_ANALYSIS_LIMIT: int = 1000  # Rows sampled per index by ANALYZE / PRAGMA optimize
+    MAINTENANCE_CONVERT_AUTO_VACUUM: bool = False  # Rebuild older databases once (full VACUUM) to enable incremental vacuum
+    
+    # Idempotency Settings
+    IDEMPOTENCY_TTL_SECONDS: float = 600.0  # How long replays of a submission are recognised
+    IDEMPOTENCY_MAX_KEYS: int = 10000  # Keys remembered per worker
+    
+    # Dispatch Settings
+    DISPATCH_LEASE_SECONDS: float = 300.0  # How long a handed-out case stays reserved for its annotator
+    DISPATCH_REDUNDANCY: int = 1  # Labels wanted per case, unless a request asks for another count
+    DISPATCH_MAX_TASKS: int = 256  # Task queues kept in memory per worker
+    
+    # Admission Control Settings
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LIMITS: dict = {"submit": 64, "read": 32, "export": 2, "upload": 2}  # Concurrent requests per class
+    ADMISSION_QUEUE_SIZES: dict = {"submit": 256, "read": 128, "export": 4, "upload": 4}  # Waiting requests per class
+    ADMISSION_QUEUE_TIMEOUT: float = 10.0  # Max seconds a request waits for a slot before 429
+    RATE_LIMIT_PER_SECOND: float = 20.0  # Token refill per browser fingerprint (0 = disabled)
+    RATE_LIMIT_BURST: float = 60.0
+    RATE_LIMIT_COSTS: dict = {"submit": 1, "read": 1, "export": 10, "upload": 10}
+    
+    # Admin Settings
+    ADMIN_TOKEN: Optional[str] = None  # Admin endpoints require it in X-Admin-Token; unset disables them
+    
+    # JSON Settings
+    JSON_BACKEND: str = "auto"  # "auto" uses orjson when installed, "stdlib" forces the json module
+    
+    # Compression Settings
+    GZIP_ENABLED: bool = True  # Gzip JSON API responses for clients that accept it
+    GZIP_MIN_SIZE: int = 1024  # Smaller responses are sent uncompressed
+    GZIP_COMPRESSLEVEL: int = 5
+    
+    # Startup Settings
+    WARMUP_ON_STARTUP: bool = False  # Import upload dependencies in the background after startup
+    
+    # Metrics Settings
+    METRICS_ENABLED: bool = True
+    METRICS_PATH: str = "/metrics"
     
     # File Upload Settings
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
     ALLOWED_EXTENSIONS: list = [".xlsx", ".xls", ".csv"]
+    UPLOAD_PARSE_WORKERS: int = 4  # Processes parsing workbook sheets in parallel (0 = one by one in a thread)
     
     class Config:
         env_file = ".env"
         case_sensitive = True
+    
+    def ensure_directories(self):
+        """Create the log and data directories (called at startup, not on import)"""
+        Path(self.LOG_PATH).mkdir(parents=True, exist_ok=True)
+        Path(self.DATABASE_PATH).parent.mkdir(parents=True, exist_ok=True)
 
-# Create settings instance
-settings = Settings()
+    def check_workers(self):
+        """Reject settings that need state shared between worker processes"""
+        if self.WORKERS > 1 and self.STORAGE_MODE == "sharded":
+            # Drops are fenced in process memory; another worker may still hold the deleted shard open
+            raise ValueError("STORAGE_MODE=sharded needs WORKERS=1: retiring a task deletes shard files "
+                             "other workers may still have open")
 
-# Ensure directories exist
-Path(settings.LOG_PATH).mkdir(parents=True, exist_ok=True)
-Path(settings.DATABASE_PATH).parent.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+# Create settings instance
+settings = Settings()
\ No newline at end of file
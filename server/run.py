@@ -12,10 +12,19 @@ if __name__ == "__main__":
     import uvicorn
     from config import settings
     
+    try:
+        settings.check_workers()
+    except ValueError as e:
+        sys.exit(str(e))
+    
+    # Auto-reload only works with a single process
+    multi_worker = settings.WORKERS > 1
+    
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=settings.DEBUG,
+        host=settings.HOST,
+        port=settings.PORT,
+        reload=settings.DEBUG and not multi_worker,
+        workers=settings.WORKERS if multi_worker else None,
         log_level=settings.LOG_LEVEL.lower()
-    )
\ No newline at end of file
+    )
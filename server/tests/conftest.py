@@ -0,0 +1,35 @@
+import pytest
+
+from app.core.database import Database
+from app.core.shards import ShardRouter
+from app.storage import SQLiteBackend
+
+BACKENDS = ["sqlite", "duckdb"]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(params=["single", "sharded"])
+def database(request, tmp_path):
+    database = Database(str(tmp_path / "annotations.db"))
+    if request.param == "sharded":
+        database.router = ShardRouter(str(tmp_path / "shards"), max_open=4)
+    return database
+
+
+@pytest.fixture(params=BACKENDS)
+async def storage(request, database, tmp_path):
+    """A storage backend over a fresh database; call ``settle(storage)`` before replica reads"""
+    await database.init_tables()
+    backend = SQLiteBackend(database)
+    if request.param == "duckdb":
+        pytest.importorskip("duckdb")
+        from app.storage.duckdb_backend import DuckDBBackend
+        backend = DuckDBBackend(backend, str(tmp_path / "analytics.duckdb"), sync_interval=0)
+    await backend.init()
+    yield backend
+    await backend.close()
+    await database.close()
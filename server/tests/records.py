@@ -0,0 +1,28 @@
+"""
+Annotation records and helpers shared by the tests
+"""
+import json
+from datetime import datetime
+
+from app.models import AnnotationRecord
+from app.storage.duckdb_backend import DuckDBBackend
+
+FILE = "file-a"
+TASK = "task-a"
+BASE = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def record(case_id: int, annotator: str, action: str = "agree", *, file_hash: str = FILE, task_hash: str = TASK,
+           dimension: str = "accuracy", at: datetime = BASE, judgement: str = None) -> AnnotationRecord:
+    stamp = at.isoformat()
+    return AnnotationRecord(
+        f"{task_hash}-{case_id}-{annotator}", task_hash, file_hash, "data.xlsx", dimension, case_id,
+        annotator, f"user {annotator}", json.dumps({"question": f"q{case_id}"}), "yes", "llm says yes",
+        action, judgement, None, "binary", "standard", None, None, stamp, stamp,
+    )
+
+
+async def settle(storage):
+    """Bring the DuckDB replica up to date before reading from it"""
+    if isinstance(storage, DuckDBBackend):
+        await storage.sync()
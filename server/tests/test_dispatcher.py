@@ -0,0 +1,99 @@
+"""
+Case dispatcher over stored annotations
+"""
+import asyncio
+
+import pytest
+
+from app.core.dispatcher import Dispatcher, DispatchUnavailable
+
+from .records import FILE, TASK, record
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def dispatcher():
+    return Dispatcher(lease_seconds=300, default_redundancy=1, max_tasks=8)
+
+
+def loader(storage, calls=None):
+    async def load():
+        if calls is not None:
+            calls.append(1)
+        return await storage.get_case_annotators(FILE, TASK)
+    return load
+
+
+async def test_concurrent_annotators_get_distinct_cases(storage, dispatcher):
+    await storage.upsert_annotation(record(0, "fp0"))
+    load = loader(storage)
+
+    leases = await asyncio.gather(*(dispatcher.next_case(TASK, f"fp{n}", 4, None, load) for n in range(1, 5)))
+
+    assigned = [lease.case_id for lease, _ in leases if lease is not None]
+    assert sorted(assigned) == [1, 2, 3]
+    assert sum(lease is None for lease, _ in leases) == 1
+    # Asking again renews the same lease instead of taking another case
+    lease, remaining = await dispatcher.next_case(TASK, "fp1", 4, None, load)
+    assert lease is leases[0][0]
+    assert remaining == 0
+
+
+async def test_mismatched_parameters_do_not_rebuild(storage, dispatcher):
+    calls = []
+    load = loader(storage, calls)
+
+    first, _ = await dispatcher.next_case(TASK, "fp1", 3, 1, load)
+    # Clients that disagree on the case count or redundancy share the first queue
+    second, _ = await dispatcher.next_case(TASK, "fp2", 5, 2, load)
+    again, _ = await dispatcher.next_case(TASK, "fp1", 4, None, load)
+    third, remaining = await dispatcher.next_case(TASK, "fp3", 3, 3, load)
+
+    assert len(calls) == 1
+    assert again is first
+    assert [first.case_id, second.case_id, third.case_id] == [0, 1, 2]
+    assert remaining == 0
+    lease, _ = await dispatcher.next_case(TASK, "fp4", 5, 2, load)
+    assert lease is None
+
+
+async def test_expired_lease_goes_to_the_next_annotator(storage):
+    dispatcher = Dispatcher(lease_seconds=0, default_redundancy=1, max_tasks=8)
+    load = loader(storage)
+
+    abandoned, _ = await dispatcher.next_case(TASK, "fp1", 2, None, load)
+    taken, _ = await dispatcher.next_case(TASK, "fp2", 2, None, load)
+
+    assert taken.case_id == abandoned.case_id == 0
+
+
+async def test_submits_during_load_are_replayed(storage, dispatcher):
+    loading = asyncio.Event()
+    resume = asyncio.Event()
+
+    async def slow_load():
+        labels = await storage.get_case_annotators(FILE, TASK)
+        loading.set()
+        await resume.wait()
+        return labels
+
+    pending = asyncio.create_task(dispatcher.next_case(TASK, "fp1", 2, None, slow_load))
+    await loading.wait()
+    # Stored after the load read the labels
+    await storage.upsert_annotation(record(0, "fp2"))
+    dispatcher.complete(TASK, "fp2", 0)
+    resume.set()
+
+    lease, remaining = await pending
+    assert lease.case_id == 1
+    assert remaining == 0
+
+
+async def test_disabled_dispatcher_refuses(storage):
+    dispatcher = Dispatcher(lease_seconds=300, default_redundancy=1, max_tasks=8, enabled=False)
+
+    with pytest.raises(DispatchUnavailable):
+        await dispatcher.next_case(TASK, "fp1", 2, None, loader(storage))
+    with pytest.raises(DispatchUnavailable):
+        dispatcher.release(TASK, "fp1", 0)
@@ -0,0 +1,102 @@
+"""
+Export artifact cache: versions, concurrent renders and artifacts vanishing before they are served
+"""
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api import export as export_api
+from app.services.export_jobs import ExportJobManager
+from app.utils import calculate_task_hash
+
+from .records import FILE, record, settle
+
+pytestmark = pytest.mark.anyio
+
+DIMENSION = "accuracy"
+TASK_HASH = calculate_task_hash(FILE, DIMENSION)
+
+
+def task_record(case_id: int, annotator: str = "fp1", action: str = "agree"):
+    return record(case_id, annotator, action, task_hash=TASK_HASH, dimension=DIMENSION)
+
+
+@pytest.fixture
+async def exports(storage, tmp_path):
+    manager = ExportJobManager(storage, str(tmp_path / "exports"), max_bytes=10 ** 8, job_ttl=600)
+    await manager.init()
+    yield manager
+    await manager.close()
+
+
+async def export(exports, storage):
+    await settle(storage)
+    return await exports.wait(await exports.submit(FILE, DIMENSION))
+
+
+async def test_unchanged_task_is_served_from_cache(storage, exports):
+    await storage.upsert_annotations([task_record(1), task_record(2)])
+    first = await export(exports, storage)
+    second = await export(exports, storage)
+    assert first.status == second.status == "completed"
+    assert second.id == first.id
+    assert second.path == first.path
+
+
+async def test_newer_artifact_survives_a_slower_older_render(storage, exports):
+    await storage.upsert_annotation(task_record(1))
+    old_job = await export(exports, storage)
+    old_rows = await storage.get_export_rows(FILE, TASK_HASH)
+
+    await storage.upsert_annotation(task_record(2))
+    new_job = await export(exports, storage)
+    assert new_job.path != old_job.path
+    assert not old_job.path.exists()  # Superseded by the newer version
+
+    # A render of the old version (in another worker, say) finishing last
+    exports._write_artifact(old_rows, old_job.path)
+    assert new_job.path.exists()
+
+    await storage.upsert_annotation(task_record(3))
+    newest = await export(exports, storage)
+    assert not old_job.path.exists()
+    assert not new_job.path.exists()
+    assert newest.path.exists()
+
+
+async def test_other_worker_finds_finished_job(storage, exports, tmp_path):
+    await storage.upsert_annotation(task_record(1))
+    job = await export(exports, storage)
+
+    other = ExportJobManager(storage, str(tmp_path / "exports"), max_bytes=10 ** 8, job_ttl=600)
+    found = other.get(job.id)
+    assert found.status == "completed"
+    assert found.path == job.path
+    assert found.size == job.size
+    assert other.get("not-a-job") is None
+
+
+async def test_export_rerenders_artifact_deleted_before_serving(storage, exports, monkeypatch):
+    await storage.upsert_annotations([task_record(1), task_record(2, action="skip")])
+    await settle(storage)
+    wait = exports.wait
+    vanished = []
+
+    async def wait_then_lose_artifact(job):
+        job = await wait(job)
+        if not vanished:
+            job.path.unlink()  # Evicted or superseded between rendering and serving
+            vanished.append(job.id)
+        return job
+
+    monkeypatch.setattr(exports, "wait", wait_then_lose_artifact)
+    monkeypatch.setattr(export_api, "export_jobs", exports)
+    app = FastAPI()
+    app.include_router(export_api.router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/export", params={"file_hash": FILE, "dimension": DIMENSION})
+
+    assert vanished
+    assert response.status_code == 200
+    assert response.text.count("\n") == 3  # Header and two rows
+    assert response.headers["x-export-watermark"] == "2"
@@ -0,0 +1,105 @@
+"""
+Archiving and restoring tasks through the maintenance manager
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.services.maintenance import (
+    MaintenanceInProgress,
+    MaintenanceManager,
+    TaskExists,
+    open_writer,
+    read_archive,
+)
+
+from .records import BASE, FILE, TASK, record, settle
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def maintenance(database, storage, tmp_path):
+    return MaintenanceManager(
+        database, storage, str(tmp_path / "archives"), interval=0, window="", archive_after_days=30,
+        archive_format="jsonl", archive_max_tasks=10, pages_per_step=256, step_sleep_ms=0,
+        max_pages_per_run=65536, analysis_limit=1000, convert_auto_vacuum=False, busy_timeout_ms=5000,
+    )
+
+
+async def submissions(storage) -> int:
+    buckets = await storage.get_throughput(FILE, None, "day", None, None, [])
+    return sum(bucket["submissions"] for bucket in buckets)
+
+
+async def seed(storage):
+    await storage.upsert_annotations([record(1, "fp1"), record(2, "fp2")])
+    await storage.upsert_annotation(record(1, "fp1", "skip", at=BASE + timedelta(minutes=3)))
+
+
+async def test_archive_then_restore_keeps_rollup_totals(storage, maintenance):
+    await seed(storage)
+    assert await submissions(storage) == 3
+
+    manifest = await maintenance.archive_task(FILE)
+    assert manifest["rows"] == 2
+    assert await storage.list_tasks() == []
+    assert await submissions(storage) == 3
+
+    result = await maintenance.restore_archive(manifest["name"])
+    assert result["rows"] == 2
+    assert await submissions(storage) == 3
+    await settle(storage)
+    rows = await storage.get_export_rows(FILE, TASK)
+    assert [(row["case_id"], row["human_action"]) for row in rows] == [(1, "skip"), (2, "agree")]
+
+    # Submits after the restore count as usual
+    await storage.upsert_annotation(record(3, "fp1", at=BASE + timedelta(minutes=5)))
+    assert await submissions(storage) == 4
+
+
+async def test_failed_restore_leaves_nothing_behind(storage, maintenance):
+    await seed(storage)
+    manifest = await maintenance.archive_task(FILE)
+    path = maintenance.archive_dir / manifest["file"]
+    rows = [row for batch in read_archive(path) for row in batch]
+    rows[-1]["human_action"] = "bogus"  # Fails the CHECK constraint after the first row is written
+    writer = open_writer("jsonl", path)
+    writer.write(rows)
+    writer.close()
+
+    with pytest.raises(Exception):
+        await maintenance.restore_archive(manifest["name"])
+    assert await storage.list_tasks() == []
+    assert await submissions(storage) == 3
+    assert maintenance.running is None
+
+    rows[-1]["human_action"] = "agree"
+    writer = open_writer("jsonl", path)
+    writer.write(rows)
+    writer.close()
+    assert (await maintenance.restore_archive(manifest["name"]))["rows"] == 2
+
+
+async def test_restore_is_claimed_and_refuses_live_tasks(storage, maintenance):
+    await seed(storage)
+    manifest = await maintenance.archive_task(FILE)
+
+    maintenance._claim("retire of something")
+    try:
+        with pytest.raises(MaintenanceInProgress):
+            await maintenance.restore_archive(manifest["name"])
+    finally:
+        maintenance._release()
+
+    await storage.upsert_annotation(record(9, "fp3"))
+    with pytest.raises(TaskExists):
+        await maintenance.restore_archive(manifest["name"])
+
+
+async def test_retire_purges_rows_and_rollups(storage, maintenance):
+    await seed(storage)
+    assert await maintenance.retire_task(FILE) is True
+    assert await maintenance.retire_task(FILE) is False
+    assert await storage.list_tasks() == []
+    assert await submissions(storage) == 0
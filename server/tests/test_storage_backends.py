@@ -0,0 +1,219 @@
+"""
+Behaviour shared by every storage backend
+
+Each test runs against SQLite and the DuckDB replica, in single-file and
+sharded storage modes; replica reads are taken after an explicit sync.
+"""
+from datetime import timedelta
+
+import pytest
+
+from app.storage.duckdb_backend import DuckDBBackend
+
+from .records import BASE, FILE, TASK, record, settle
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_upsert_then_revise_keeps_one_row(storage):
+    await storage.upsert_annotation(record(1, "fp1", "agree"))
+    await storage.upsert_annotation(record(1, "fp1", "disagree", at=BASE + timedelta(minutes=1), judgement="no"))
+    await settle(storage)
+
+    rows = await storage.get_export_rows(FILE, TASK)
+    assert len(rows) == 1
+    assert rows[0]["human_action"] == "disagree"
+    assert rows[0]["human_judgement"] == "no"
+    assert rows[0]["id"] == f"{TASK}-1-fp1"
+    assert rows[0]["created_at"] == BASE.isoformat()
+    assert rows[0]["seq"] == 2
+
+
+async def test_batch_upsert_rejects_mixed_files(storage):
+    with pytest.raises(ValueError):
+        await storage.upsert_annotations([record(1, "fp1"), record(2, "fp1", file_hash="file-b")])
+
+
+async def test_progress(storage):
+    await storage.upsert_annotations([record(3, "fp1"), record(1, "fp1"), record(3, "fp2"), record(7, "fp2")])
+
+    everyone = await storage.get_progress(FILE, TASK, None)
+    assert everyone == {"annotated_rows": 3, "case_ids": [1, 3, 7], "max_case_id": 7}
+    mine = await storage.get_progress(FILE, TASK, "fp1")
+    assert mine["annotated_rows"] == 2
+    assert mine["case_ids"] == [1, 3]
+    assert (await storage.get_progress(FILE, "other-task", None))["case_ids"] == []
+
+
+async def test_stats(storage):
+    await storage.upsert_annotations([
+        record(1, "fp1", "agree"),
+        record(2, "fp1", "disagree"),
+        record(1, "fp2", "skip", dimension="fluency"),
+    ])
+    await settle(storage)
+
+    stats = await storage.get_stats(FILE, None)
+    assert stats["total_annotations"] == 3
+    assert stats["annotated_cases"] == 2
+    assert (stats["agreed"], stats["disagreed"], stats["skipped"]) == (1, 1, 1)
+    assert [(row["browser_fingerprint"], row["total"]) for row in stats["by_annotator"]] == [("fp1", 2), ("fp2", 1)]
+
+    fluency = await storage.get_stats(FILE, "fluency")
+    assert fluency["total_annotations"] == 1
+    assert fluency["skipped"] == 1
+
+    empty = await storage.get_stats("missing-file", None)
+    assert empty["total_annotations"] == 0
+    assert empty["by_annotator"] == []
+
+
+async def test_dimensions(storage):
+    await storage.upsert_annotations([
+        record(1, "fp1", dimension="accuracy"),
+        record(2, "fp1", dimension="accuracy", at=BASE + timedelta(hours=1)),
+        record(1, "fp2", dimension="fluency"),
+    ])
+    await settle(storage)
+
+    dimensions = await storage.get_dimensions(FILE)
+    assert [(row["dimension"], row["annotation_count"]) for row in dimensions] == [("accuracy", 2), ("fluency", 1)]
+    assert dimensions[0]["first_annotation"] == BASE.isoformat()
+    assert dimensions[0]["last_annotation"] == (BASE + timedelta(hours=1)).isoformat()
+
+
+async def test_export_is_ordered_and_versioned(storage):
+    await storage.upsert_annotations([record(2, "fp1"), record(1, "fp2"), record(1, "fp1", at=BASE - timedelta(minutes=1))])
+    await storage.upsert_annotation(record(9, "fp1", task_hash="task-b"))
+    await settle(storage)
+
+    rows = await storage.get_export_rows(FILE, TASK)
+    assert [(row["case_id"], row["browser_fingerprint"]) for row in rows] == [(1, "fp1"), (1, "fp2"), (2, "fp1")]
+    assert "metadata" not in rows[0].keys()
+    assert await storage.get_task_version(FILE, TASK) == {"row_count": 3, "max_seq": 3}
+
+    await storage.upsert_annotation(record(2, "fp1", "skip"))
+    await settle(storage)
+    changed = await storage.get_changed_rows(FILE, TASK, 3)
+    assert [(row["case_id"], row["human_action"], row["seq"]) for row in changed] == [(2, "skip", 4)]
+
+
+async def test_delete_task(storage):
+    await storage.upsert_annotations([record(1, "fp1"), record(2, "fp1")])
+    await storage.upsert_annotation(record(1, "fp1", file_hash="file-b", task_hash="task-b"))
+    await settle(storage)
+
+    assert await storage.delete_task(FILE) is True
+    assert await storage.delete_task(FILE) is False
+    await settle(storage)
+
+    assert await storage.get_export_rows(FILE, TASK) == []
+    assert (await storage.get_stats(FILE, None))["total_annotations"] == 0
+    assert (await storage.get_progress(FILE, TASK, None))["case_ids"] == []
+    assert [row["file_hash"] for row in await storage.list_tasks()] == ["file-b"]
+    assert len(await storage.get_export_rows("file-b", "task-b")) == 1
+
+
+async def test_row_committed_late_with_older_timestamp_reaches_replica(storage):
+    # A submit stamped before the last synced row but committed after that sync
+    await storage.upsert_annotation(record(1, "fp1", at=BASE + timedelta(minutes=5)))
+    await settle(storage)
+    await storage.upsert_annotation(record(2, "fp2", at=BASE))
+    await storage.upsert_annotation(record(1, "fp1", "skip", at=BASE + timedelta(minutes=1)))
+    await settle(storage)
+
+    rows = await storage.get_export_rows(FILE, TASK)
+    assert [(row["case_id"], row["human_action"]) for row in rows] == [(1, "skip"), (2, "agree")]
+    assert (await storage.get_stats(FILE, None))["total_annotations"] == 2
+
+
+async def test_delete_and_recreate_between_syncs(storage):
+    await storage.upsert_annotations([record(1, "fp1"), record(2, "fp1")])
+    await settle(storage)
+    await storage.delete_task(FILE)
+    await storage.upsert_annotation(record(3, "fp2"))
+    await settle(storage)
+
+    rows = await storage.get_export_rows(FILE, TASK)
+    assert [(row["case_id"], row["browser_fingerprint"]) for row in rows] == [(3, "fp2")]
+
+
+async def test_replica_follows_deletes_made_elsewhere(storage):
+    if not isinstance(storage, DuckDBBackend):
+        pytest.skip("replica only")
+    await storage.upsert_annotations([record(1, "fp1"), record(2, "fp1")])
+    await settle(storage)
+    # Retired through the source (another worker, or an archive), bypassing the replica
+    await storage.source.delete_task(FILE)
+    await storage.source.upsert_annotation(record(4, "fp3", file_hash="file-b", task_hash="task-b"))
+    await settle(storage)
+
+    assert await storage.get_export_rows(FILE, TASK) == []
+    assert len(await storage.get_export_rows("file-b", "task-b")) == 1
+
+
+async def test_replica_resumes_from_stored_position(storage, tmp_path):
+    if not isinstance(storage, DuckDBBackend):
+        pytest.skip("replica only")
+    await storage.upsert_annotation(record(1, "fp1"))
+    await settle(storage)
+    await storage.close()
+    await storage.source.upsert_annotation(record(2, "fp1"))
+
+    reopened = DuckDBBackend(storage.source, storage.path, sync_interval=0)
+    await reopened.init()
+    try:
+        assert [row["case_id"] for row in await reopened.get_export_rows(FILE, TASK)] == [1, 2]
+        assert await reopened.sync() == 0
+    finally:
+        await reopened.close()
+
+
+async def test_delete_archived_task_only_when_unchanged(storage):
+    await storage.upsert_annotations([record(1, "fp1"), record(2, "fp1", at=BASE + timedelta(minutes=2))])
+    await settle(storage)
+    last_updated = (BASE + timedelta(minutes=2)).isoformat()
+
+    # A write after the rows were read for the archive
+    await storage.upsert_annotation(record(3, "fp2", at=BASE + timedelta(minutes=1)))
+    assert await storage.delete_archived_task(FILE, 2, last_updated) is False
+    await settle(storage)
+    assert len(await storage.get_export_rows(FILE, TASK)) == 3
+
+    assert await storage.delete_archived_task(FILE, 3, last_updated) is True
+    await settle(storage)
+    assert await storage.get_export_rows(FILE, TASK) == []
+    assert await storage.list_tasks() == []
+    # Throughput history outlives the archived rows
+    throughput = await storage.get_throughput(FILE, None, "day", None, None, [])
+    assert sum(bucket["submissions"] for bucket in throughput) == 3
+
+
+async def test_incremental_export_across_interrupted_sync(storage, monkeypatch):
+    await storage.upsert_annotation(record(1, "fp1"))
+    await settle(storage)
+    await storage.upsert_annotation(record(2, "fp1"))
+    await storage.upsert_annotation(record(1, "fp1", "skip", at=BASE + timedelta(minutes=1)))
+
+    if isinstance(storage, DuckDBBackend):
+        # A sync that applies one change and then fails leaves the replica part way through the log
+        iter_changes = storage.source.iter_changes
+
+        async def one_change(file_hash, since, batch_size=5000):
+            async for entries in iter_changes(file_hash, since, batch_size=1):
+                yield entries
+                raise RuntimeError("sync interrupted")
+
+        monkeypatch.setattr(storage.source, "iter_changes", one_change)
+        with pytest.raises(RuntimeError):
+            await storage.sync()
+        monkeypatch.undo()
+
+    changed = await storage.get_changed_rows(FILE, TASK, 1)
+    assert [(row["case_id"], row["human_action"], row["seq"]) for row in changed] == [(2, "agree", 2), (1, "skip", 3)]
+    assert await storage.get_task_version(FILE, TASK) == {"row_count": 2, "max_seq": 3}
+    rows = [dict(row) for row in await storage.get_export_rows(FILE, TASK)]
+    assert [(row["case_id"], row["human_action"]) for row in rows] == [(1, "skip"), (2, "agree")]
+
+    await settle(storage)
+    assert [dict(row) for row in await storage.get_export_rows(FILE, TASK)] == rows
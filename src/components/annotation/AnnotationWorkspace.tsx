@@ -14,6 +14,7 @@ import { AuxiliaryInfo } from "./AuxiliaryInfo";
 import { useSubmitAnnotation } from "@/hooks/useApi";
 import { useToast } from "@/hooks/use-toast";
 import { Dimension } from "@/types/api";
+import { randomId } from "@/lib/utils";
 
 interface AnnotationWorkspaceProps {
   file: File;
@@ -302,7 +303,8 @@ export const AnnotationWorkspace = ({
 
     try {
       console.log("提交维度标注数据:", submission);
-      await submitAnnotation.mutateAsync({ projectId, submission });
+      // 每次提交生成一个幂等key，自动重试时保持不变
+      await submitAnnotation.mutateAsync({ projectId, submission, idempotencyKey: randomId() });
       
       // 成功后逻辑
       if (isMultiDimension) {
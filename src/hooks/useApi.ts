@@ -164,10 +164,13 @@ export const useSubmitAnnotation = () => {
   const { toast } = useToast();
   
   return useMutation({
-    mutationFn: ({ projectId, submission }: { 
+    mutationFn: ({ projectId, submission, idempotencyKey }: { 
       projectId: string; 
-      submission: AnnotationSubmitRequest 
-    }) => api.submitAnnotation(projectId, submission),
+      submission: AnnotationSubmitRequest;
+      idempotencyKey?: string;
+    }) => api.submitAnnotation(projectId, submission, idempotencyKey),
+    // 网络错误时重试；携带Idempotency-Key的重试不会重复写入
+    retry: 3,
     onSuccess: (response, variables) => {
       if (response.success) {
         queryClient.invalidateQueries({ 
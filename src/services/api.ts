@@ -107,13 +107,16 @@ class ApiService {
 
   async submitAnnotation(
     projectId: string, 
-    submission: AnnotationSubmitRequest
+    submission: AnnotationSubmitRequest,
+    idempotencyKey?: string
   ): Promise<ApiResponse<AnnotationItem>> {
     const response = await fetch(`${API_BASE_URL}/projects/${projectId}/annotations`, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-Browser-Fingerprint': localStorage.getItem('browser_fingerprint') || 'unknown'
+        'X-Browser-Fingerprint': localStorage.getItem('browser_fingerprint') || 'unknown',
+        // 重试时复用同一个key，服务端直接返回首次结果
+        ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {})
       },
       body: JSON.stringify(submission),
     });
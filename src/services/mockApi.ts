@@ -237,7 +237,8 @@ class MockApiService {
   // 提交完整的标注数据行（人类专家标注完成后插入数据库）
   async submitAnnotation(
     projectId: string, 
-    submission: AnnotationSubmitRequest & { completeDataRow?: any }
+    submission: AnnotationSubmitRequest & { completeDataRow?: any },
+    _idempotencyKey?: string
   ): Promise<ApiResponse<AnnotationItem>> {
     console.log('Mock API - submitAnnotation 收到的内容:', { projectId, submission });
     await new Promise(resolve => setTimeout(resolve, 1000));